@@ -1,4 +1,109 @@
-from assertViewer.assertGUI import *
-from assertViewer.assertGUIBeamGeometry import *
-from assertViewer.assertGUIChannelMonitoring import *
-from assertViewer.assertGUIParticleMonitoring import *
+# Submodules are only imported when one of their names is first used, so importing
+# the package (or a light module such as assertFrameBuffer) does not pull in pydm,
+# pyqtgraph or pyrogue.
+import importlib
+
+_LAZY = {
+    'runReceiverDisplay'              : 'assertGUI',
+    'assertGUI'                       : 'assertGUI',
+    'runBeamDisplay'                  : 'assertGUIBeamGeometry',
+    'assertGUIBeamGeometry'           : 'assertGUIBeamGeometry',
+    'runChannelDisplay'               : 'assertGUIChannelMonitoring',
+    'assertGUIChannelMonitoring'      : 'assertGUIChannelMonitoring',
+    'runParticleDisplay'              : 'assertGUIParticleMonitoring',
+    'assertGUIParticleMonitoring'     : 'assertGUIParticleMonitoring',
+    'runTrajectoryDisplay'            : 'assertGUITrajectory',
+    'assertGUITrajectory'             : 'assertGUITrajectory',
+    'FrameRingBuffer'                 : 'assertFrameBuffer',
+    'AsicSignalCache'                 : 'assertSignalCache',
+    'RefreshScheduler'                : 'assertRefresh',
+    'LocalCurve'                      : 'assertPlotting',
+    'ui_panels'                       : 'assertPlotting',
+    'PHASES'                          : 'assertInstrumentation',
+    'PhaseStats'                      : 'assertInstrumentation',
+    'Instrumentation'                 : 'assertInstrumentation',
+    'InstrumentationReporter'         : 'assertInstrumentation',
+    'ChannelHistogramEngine'          : 'assertHistogram',
+    'ChannelHistory'                  : 'assertHistogram',
+    'compute_plane_profiles'          : 'assertBeamGeometry',
+    'pair_planes'                     : 'assertBeamGeometry',
+    'profile_drift'                   : 'assertBeamGeometry',
+    'BeamProfileAccumulator'          : 'assertBeamGeometry',
+    'PAIR_ENERGY'                     : 'assertParticles',
+    'FANO_FACTOR'                     : 'assertParticles',
+    'SILICON_DENSITY'                 : 'assertParticles',
+    'MIP_PAIRS'                       : 'assertParticles',
+    'ParticleCalibration'             : 'assertParticles',
+    'convert_counts'                  : 'assertParticles',
+    'ParticleResultCache'             : 'assertParticles',
+    'ParticleAccumulator'             : 'assertParticles',
+    'fit_lines'                       : 'assertTrajectory',
+    'fit_tracks'                      : 'assertTrajectory',
+    'FILE_MAGIC'                      : 'assertRecorder',
+    'INDEX_MAGIC'                     : 'assertRecorder',
+    'CHUNK_MAGIC'                     : 'assertRecorder',
+    'FILE_VERSION'                    : 'assertRecorder',
+    'FILE_HEADER'                     : 'assertRecorder',
+    'CHUNK_HEADER'                    : 'assertRecorder',
+    'CODEC_RAW'                       : 'assertRecorder',
+    'CODEC_ZLIB'                      : 'assertRecorder',
+    'INDEX_DTYPE'                     : 'assertRecorder',
+    'record_dtype'                    : 'assertRecorder',
+    'index_path'                      : 'assertRecorder',
+    'FrameRecorder'                   : 'assertRecorder',
+    'LiveRecorder'                    : 'assertRecorder',
+    'runRecorder'                     : 'assertRecorder',
+    'benchmark_recorder'              : 'assertRecorder',
+    'AsicSampleProcessorEmulator'     : 'assertSampleProcessor',
+    'RecordFileReader'                : 'assertReplay',
+    'PlaybackClock'                   : 'assertReplay',
+    'ReplayRoot'                      : 'assertReplay',
+    'runReplay'                       : 'assertReplay',
+    'StripSimulator'                  : 'assertSimulation',
+    'SimulationRoot'                  : 'assertSimulation',
+    'runSimulation'                   : 'assertSimulation',
+    'percentiles'                     : 'assertBenchmark',
+    'rss_bytes'                       : 'assertBenchmark',
+    'cpu_seconds'                     : 'assertBenchmark',
+    'microbenchmarks'                 : 'assertBenchmark',
+    'benchmark_display'               : 'assertBenchmark',
+    'run_benchmark_suite'             : 'assertBenchmark',
+    'summary_line'                    : 'assertBenchmark',
+    'PANEL_LAYOUTS'                   : 'assertBenchmark',
+    'benchmark_panels'                : 'assertBenchmark',
+    'run_panel_benchmarks'            : 'assertBenchmark',
+    'panel_summary_line'              : 'assertBenchmark',
+    'parse_servers'                   : 'assertConnection',
+    'server_address'                  : 'assertConnection',
+    'RogueConnection'                 : 'assertConnection',
+    'get_connection'                  : 'assertConnection',
+    'rogue_connection'                : 'assertConnection',
+    'close_connections'               : 'assertConnection',
+    'BackgroundWorker'                : 'assertWorker',
+    'shared_signal_cache'             : 'assertSignalCache',
+    'DISPLAYS'                        : 'assertLauncher',
+    'LAYOUTS'                         : 'assertLauncher',
+    'display_class'                   : 'assertLauncher',
+    'build_window'                    : 'assertLauncher',
+    'runMultiDisplay'                 : 'assertLauncher',
+    'DetectorGeometry'                : 'assertGeometry',
+    'geometry_from_macros'            : 'assertGeometry',
+    'PLACEHOLDER'                     : 'assertPanels',
+    'image_panel'                     : 'assertPanels',
+    'waveform_plot_panel'             : 'assertPanels',
+    'plot_panel'                      : 'assertPanels',
+    'SensorPanels'                    : 'assertPanels',
+    'sensor_panels'                   : 'assertPanels',
+}
+
+__all__ = list(_LAZY)
+
+def __getattr__(name):
+    if name not in _LAZY:
+        raise AttributeError(f"module 'assertViewer' has no attribute '{name}'")
+    value = getattr(importlib.import_module(f'assertViewer.{_LAZY[name]}'), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY))
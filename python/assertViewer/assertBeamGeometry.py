@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+#-----------------------------------------------------------------------------
+# Title      : Vectorized beam position and width reconstruction
+#-----------------------------------------------------------------------------
+
+import numpy as np
+
+def compute_plane_profiles(counts, valid=None, threshold=None, window=None, nsigma=3.0):
+    # Beam position and width on every sensor plane in one pass.
+    #   counts    : (planes, channels) ADC counts, one row per sensor plane, or
+    #               (events, planes, channels) to process many events at once
+    #   valid     : optional mask of planes that hold data, counts without the channel axis
+    #   threshold : charge above the plane baseline (median) that is ignored as noise,
+    #               by default nsigma times the robust (MAD) noise of each plane
+    #   window    : optional number of strips on each side of the peak used as the cluster
+    # Strip positions are 1-based, as in the displays. Returns a dict of arrays shaped like
+    # counts without the channel axis:
+    #   peak     : strip with the maximum counts
+    #   centroid : charge-weighted mean position
+    #   width    : charge-weighted RMS width
+    #   mean     : Gaussian fit of the peak and its two neighbours (centroid if not possible)
+    #   sigma    : width of that Gaussian fit (RMS width if not possible)
+    #   charge   : summed charge above the baseline
+    #   valid    : planes with a usable measurement
+    counts = np.atleast_2d(np.asarray(counts, dtype=np.float64))
+    lead   = counts.shape[:-1]
+    counts = counts.reshape(-1, counts.shape[-1])
+    planes, channels = counts.shape
+    strips = np.arange(1, channels+1, dtype=np.float64)
+    rows   = np.arange(planes)
+
+    if valid is None:
+        valid = np.ones(planes, dtype=bool)
+    valid = np.asarray(valid, dtype=bool).reshape(planes).copy()
+
+    # Charge above the baseline of each plane
+    baseline = np.median(counts, axis=1)
+    if threshold is None:
+        threshold = nsigma * 1.4826 * np.median(np.abs(counts - baseline[:,None]), axis=1)
+    threshold = np.broadcast_to(np.asarray(threshold, dtype=np.float64), (planes,))
+    charge = np.clip(counts - baseline[:,None] - threshold[:,None], 0.0, None)
+
+    peak = np.argmax(counts, axis=1)
+    if window is not None:
+        dist = np.abs(np.arange(channels)[None,:] - peak[:,None])
+        charge = np.where(dist <= window, charge, 0.0)
+
+    total = charge.sum(axis=1)
+    valid &= total > 0
+    safe  = np.where(total > 0, total, 1.0)
+
+    centroid = (charge*strips).sum(axis=1) / safe
+    width    = np.sqrt((charge*(strips[None,:] - centroid[:,None])**2).sum(axis=1) / safe)
+
+    # Three-point Gaussian fit: a parabola through the log of the peak and its neighbours
+    left  = np.clip(peak-1, 0, channels-1)
+    right = np.clip(peak+1, 0, channels-1)
+    a, b, c = charge[rows,left], charge[rows,peak], charge[rows,right]
+    inner = (peak > 0) & (peak < channels-1) & (a > 0) & (b > 0) & (c > 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        la, lb, lc = np.log(a), np.log(b), np.log(c)
+        denom = la - 2*lb + lc
+        fit   = inner & (denom < 0)
+        mean  = np.where(fit, strips[peak] + 0.5*(la - lc)/denom, centroid)
+        sigma = np.where(fit, np.sqrt(-1.0/denom), width)
+
+    nan = np.full(planes, np.nan)
+    return {'peak'     : strips[peak].reshape(lead),
+            'centroid' : np.where(valid, centroid, nan).reshape(lead),
+            'width'    : np.where(valid, width, nan).reshape(lead),
+            'mean'     : np.where(valid, mean, nan).reshape(lead),
+            'sigma'    : np.where(valid, sigma, nan).reshape(lead),
+            'charge'   : total.reshape(lead),
+            'valid'    : valid.reshape(lead)}
+
+def pair_planes(profiles, key='mean', xPlanes=None, yPlanes=None):
+    # Beam spot per plane pair: by default even planes measure x, odd planes measure y,
+    # otherwise xPlanes/yPlanes give the plane of each pair (DetectorGeometry).
+    # Returns (x, y, valid) arrays with one entry per pair (per event).
+    values = profiles[key]
+    valid  = profiles['valid']
+    if xPlanes is None:
+        return values[...,0::2], values[...,1::2], valid[...,0::2] & valid[...,1::2]
+    return values[...,xPlanes], values[...,yPlanes], valid[...,xPlanes] & valid[...,yPlanes]
+
+def profile_drift(window, total):
+    # Where the recent beam differs from the beam since the last reset: the window
+    # profile minus the total profile, each normalized to unit sum per plane pair.
+    # Positive where the beam spends more time lately, zero for a steady beam.
+    def normalized(image):
+        entries = image.sum(axis=(-2, -1), keepdims=True)
+        return image / np.where(entries > 0, entries, 1.0)
+    return normalized(window) - normalized(total)
+
+class BeamProfileAccumulator(object):
+    def __init__(self, pairs=4, channels=64, window=None):
+        # 2D occupancy (x strip, y strip) of the beam spot for every plane pair.
+        # window is the number of frames after which old entries have faded to 1/e,
+        # None keeps everything since the last reset.
+        self._channels = channels
+        self._hist = np.zeros((pairs, channels, channels), dtype=np.float64)
+        self._pairs = np.arange(pairs)
+        self.entries = 0
+        self.set_window(window)
+
+    @property
+    def image(self):
+        return self._hist
+
+    def set_window(self, window):
+        self._window = window
+        self._decay  = np.exp(-1.0/window) if window else 1.0
+
+    def reset(self):
+        self._hist[:] = 0
+        self.entries = 0
+
+    def fill(self, x, y, valid):
+        # One beam spot per plane pair, all pairs filled at once
+        if self._decay != 1.0:
+            self._hist *= self._decay
+        xi = np.rint(np.nan_to_num(x)).astype(np.intp) - 1
+        yi = np.rint(np.nan_to_num(y)).astype(np.intp) - 1
+        ok = valid & (xi >= 0) & (xi < self._channels) & (yi >= 0) & (yi < self._channels)
+        self._hist[self._pairs[ok], xi[ok], yi[ok]] += 1
+        self.entries += 1
@@ -0,0 +1,361 @@
+#!/usr/bin/env python
+#-----------------------------------------------------------------------------
+# Title      : Latency and throughput benchmarks of the displays
+#-----------------------------------------------------------------------------
+# benchmark_display() runs one display headless (offscreen Qt) against an in-process
+# SimulationRoot and measures frame-to-pixel latency, update rate, dropped frames, CPU
+# and RSS. run_benchmark_suite() repeats it for every display and frame rate, each in
+# its own process, adds the microbenchmarks and writes everything as JSON.
+# benchmark_panels() compares building the sensor panels of a display in code
+# (assertPanels) with loading them from the numbered widgets of its *_static.ui file.
+
+import os
+import sys
+import json
+import time
+import socket
+import platform
+import resource
+import subprocess
+import numpy as np
+
+from assertViewer.assertFrameBuffer import FrameRingBuffer
+from assertViewer.assertHistogram import ChannelHistogramEngine
+from assertViewer.assertBeamGeometry import compute_plane_profiles, pair_planes, BeamProfileAccumulator
+from assertViewer.assertParticles import ParticleCalibration, ParticleAccumulator, convert_counts
+from assertViewer.assertTrajectory import fit_tracks
+from assertViewer.assertLauncher import display_class
+
+def percentiles(values, points=(50, 90, 99)):
+    values = np.asarray(values, dtype=np.float64)
+    result = {f'p{p}' : float(np.percentile(values, p)) if len(values) else None for p in points}
+    result['max']   = float(values.max()) if len(values) else None
+    result['count'] = int(len(values))
+    return result
+
+def rss_bytes():
+    # Current resident set size, the peak where /proc is not available
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def cpu_seconds():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+def _time_call(func, repeat=1000, warmup=10):
+    for n in range(warmup):
+        func()
+    times = np.empty(repeat)
+    for n in range(repeat):
+        start = time.perf_counter()
+        func()
+        times[n] = time.perf_counter() - start
+    return {'mean_us' : float(1e6*times.mean()),
+            'p50_us'  : float(1e6*np.percentile(times, 50)),
+            'p99_us'  : float(1e6*np.percentile(times, 99))}
+
+def microbenchmarks(repeat=1000, asics=8, channels=64, frames=32, depth=1000, seed=0):
+    # The work behind the hot display methods, without the widget calls (those are part
+    # of the end-to-end numbers):
+    #   computeBeamGeometry    : plane profiles, plane pairing and the two profile fills
+    #   receive_mem_frame      : history append plus incremental histogram update
+    #   update_channel_histogram / perform_error_checking : the drill-down reads
+    rng = np.random.default_rng(seed)
+    counts = rng.normal(1000, 5, (asics, channels))
+    counts[:, 30:33] += [60, 120, 60]
+    mem = np.rint(rng.normal(1000, 5, (depth, channels, frames))).astype(np.float32)
+
+    total  = BeamProfileAccumulator(pairs=asics//2, channels=channels)
+    window = BeamProfileAccumulator(pairs=asics//2, channels=channels, window=1000)
+    def beam_geometry():
+        profiles = compute_plane_profiles(counts, valid=np.ones(asics, dtype=bool))
+        x, y, valid = pair_planes(profiles, 'mean')
+        pair_planes(profiles, 'sigma')
+        total.fill(x, y, valid)
+        window.fill(x, y, valid)
+
+    history = FrameRingBuffer(depth, (channels, frames))
+    engine  = ChannelHistogramEngine(asics=1, channels=channels, frames=frames, binsStart=900, binsStop=1100, numBins=200)
+    for frame in mem:
+        engine.update(0, frame, history.append(frame))
+    it = iter(range(1 << 62))
+    def receive_mem_frame():
+        frame = mem[next(it) % depth]
+        engine.update(0, frame, history.append(frame))
+    def channel_histogram():
+        engine.histogram(0, 17, 5)
+    def error_checking():
+        history.trace(17, 5)
+        engine.histogram(0, 17, 5)
+        history.latest()[:, 5]
+
+    calibration = ParticleCalibration(asics, channels, gain=10.0, pedestal=1000.0, noise=5.0)
+    accumulator = ParticleAccumulator(asics, channels)
+    def particles():
+        accumulator.add(convert_counts(counts, calibration))
+
+    batch = rng.normal(32, 4, (256, asics//2))
+    def tracks():
+        fit_tracks(np.arange(asics//2), batch, batch, np.ones(batch.shape, dtype=bool))
+
+    return {'computeBeamGeometry'      : _time_call(beam_geometry, repeat),
+            'receive_mem_frame'        : _time_call(receive_mem_frame, repeat),
+            'update_channel_histogram' : _time_call(channel_histogram, repeat),
+            'perform_error_checking'   : _time_call(error_checking, repeat),
+            'process_frame'            : _time_call(particles, repeat),
+            'fitTracks_256'            : _time_call(tracks, repeat)}
+
+# Display -> (.ui file without extension, numbered panel prefix, panel factory, panels of the default geometry)
+PANEL_LAYOUTS = {'event'    : ('assertViewerPyDM_EventMonitoring',          'PyDMWaveformPlot_', 'waveform_plot_panel', 8),
+                 'channel'  : ('assertViewerPyDM_StripMonitoring',          'PyDMImageView_',    'image_panel',         8),
+                 'beam'     : ('assertViewerPyQtGraph_BeamGeometry',        'graphicsView_',     'plot_panel',          4),
+                 'particle' : ('assertViewerPyQtGraph_ParticleMonitoring',  'graphicsView_',     'plot_panel',          8)}
+
+def benchmark_panels(display, mode, repeat=5):
+    # Run inside a fresh process. Builds the display layout <repeat> times, keeping every
+    # copy alive, and returns the mean time and RSS growth per copy:
+    #   'ui'    : the *_static.ui file with the numbered panels
+    #   'code'  : the placeholder .ui file plus the panels built by assertPanels
+    #   'empty' : the placeholder .ui file alone, the part common to both
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from qtpy import uic
+    from qtpy.QtWidgets import QApplication, QWidget
+    from assertViewer import assertPanels
+
+    name, prefix, factory, count = PANEL_LAYOUTS[display]
+    folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ui')
+    path = os.path.join(folder, f'{name}_static.ui' if mode == 'ui' else f'{name}.ui')
+    app = QApplication.instance() or QApplication([])
+
+    def build():
+        widget = QWidget()
+        uic.loadUi(path, widget)
+        panels = None
+        if mode == 'code':
+            panels = assertPanels.sensor_panels(widget, prefix, count, getattr(assertPanels, factory))
+        elif mode == 'ui':
+            panels = assertPanels.SensorPanels.from_ui(widget, prefix, count)
+        widget.resize(1600, 1000)
+        widget.show()
+        app.processEvents()
+        return widget, panels
+
+    # The first copy also imports the widget modules
+    keep = [build()]
+    start_rss = rss_bytes()
+    times = []
+    for n in range(repeat):
+        start = time.perf_counter()
+        keep.append(build())
+        times.append(time.perf_counter() - start)
+    return {'display' : display, 'mode' : mode, 'panels' : 0 if keep[0][1] is None else len(keep[0][1]),
+            'build_ms' : 1e3*float(np.mean(times)), 'rss_kb' : (rss_bytes() - start_rss) / 1024 / repeat}
+
+def run_panel_benchmarks(displays=('event', 'channel', 'beam', 'particle'), repeat=5):
+    # Startup time and memory of the sensor panels, .ui against code, per display and
+    # per panel (the 'empty' layout subtracted); every measurement in its own process
+    package = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ)
+    env['PYTHONPATH'] = package + os.pathsep + env.get('PYTHONPATH', '')
+    env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+    results = []
+    for display in displays:
+        if display not in PANEL_LAYOUTS:
+            continue
+        entry = {'display' : display}
+        for mode in ('empty', 'ui', 'code'):
+            code = ("import json\n"
+                    "from assertViewer.assertBenchmark import benchmark_panels\n"
+                    f"print(json.dumps(benchmark_panels({display!r}, {mode!r}, repeat={int(repeat)})))\n")
+            proc = subprocess.run([sys.executable, '-c', code], env=env, capture_output=True, text=True, timeout=300)
+            lines = [l for l in proc.stdout.splitlines() if l.startswith('{')]
+            if proc.returncode != 0 or not lines:
+                entry['error'] = proc.stderr.strip().splitlines()[-1:]
+                break
+            entry[mode] = json.loads(lines[-1])
+        if 'error' not in entry:
+            for mode in ('ui', 'code'):
+                panels = max(entry[mode]['panels'], 1)
+                entry[mode]['ms_per_panel'] = (entry[mode]['build_ms'] - entry['empty']['build_ms']) / panels
+                entry[mode]['kb_per_panel'] = (entry[mode]['rss_kb'] - entry['empty']['rss_kb']) / panels
+        results.append(entry)
+        print(panel_summary_line(entry), flush=True)
+    return results
+
+def benchmark_display(display, rate, duration=10.0, warmup=2.0, port=9200, maxFps=0, sizeX=800, sizeY=1000, asics=8, channels=64):
+    # Run inside a fresh process: one QApplication, one display, one simulated source
+    # of <asics> x <channels>; the display reads that geometry from the server
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    os.environ['ROGUE_SERVERS'] = f'localhost:{port}'
+    import pydm
+    import pyrogue.pydm
+    from qtpy.QtCore import QObject, QEvent, QTimer
+    from qtpy.QtWidgets import QGraphicsView
+    from pydm import PyDMChannel
+    from assertViewer.assertSimulation import SimulationRoot
+
+    class LatencyProbe(QObject):
+        def __init__(self, widget, root, dataReceiver):
+            super().__init__(widget)
+            # A redraw marks the newest delivered frame as shown; the first paint of a
+            # plot viewport after that closes the frame-to-pixel measurement. Displays
+            # without a refresh scheduler redraw on every delivered frame.
+            self._root = root
+            self._widget = widget
+            self._latest = None
+            self._shown  = None
+            self.reset()
+            self._channel = PyDMChannel(address=f'{dataReceiver}.ASIC0FrameCnt', value_slot=self._receive)
+            self._channel.connect()
+            # Displays with a worker thread draw when its result arrives, so the frame
+            # that was newest at the redraw request is only marked shown then
+            self._scheduled = hasattr(widget, '_refresh')
+            self._requested = None
+            worker = getattr(widget, '_worker', None)
+            if worker is not None:
+                worker.resultReady.connect(self._result_ready)
+            if self._scheduled:
+                callback = widget._refresh._callback
+                def redraw():
+                    if worker is not None:
+                        self._requested = self._latest
+                    else:
+                        self._shown = self._latest
+                    callback()
+                widget._refresh._callback = redraw
+            for view in widget.findChildren(QGraphicsView):
+                view.viewport().installEventFilter(self)
+
+        def reset(self):
+            self.latency  = []
+            self.received = 0
+            self.updates  = 0
+            self.start_dropped = getattr(self._widget, '_dropped', 0)
+            self.start_frames = self._root.FrameCount.value()
+            self.start_cpu    = cpu_seconds() - self._root.cpu_time
+            self.start_time   = time.perf_counter()
+
+        def _receive(self, value):
+            self._latest = int(value)
+            self.received += 1
+            if not self._scheduled:
+                self._shown = self._latest
+
+        def _result_ready(self, key, result):
+            # Per event work posted without a key does not draw anything
+            if key is not None and self._requested is not None:
+                self._shown, self._requested = self._requested, None
+
+        def eventFilter(self, obj, event):
+            if event.type() == QEvent.Paint and self._shown is not None:
+                self.latency.append(time.perf_counter() - self._root.publish_time(self._shown))
+                self.updates += 1
+                self._shown = None
+            return False
+
+        def result(self):
+            elapsed   = time.perf_counter() - self.start_time
+            published = self._root.FrameCount.value() - self.start_frames
+            cpu = cpu_seconds() - self._root.cpu_time - self.start_cpu
+            latency = percentiles(1e3*np.asarray(self.latency))
+            # Frames that never reached the display plus the events the display dropped
+            # because its worker fell behind (single ASIC MemFrames for the channel display)
+            display_dropped = getattr(self._widget, '_dropped', 0) - self.start_dropped
+            return {'latency_ms'      : latency,
+                    'update_rate'     : self.updates / elapsed,
+                    'received_rate'   : self.received / elapsed,
+                    'source_rate'     : published / elapsed,
+                    'published'       : published,
+                    'received'        : self.received,
+                    'dropped'         : max(published - self.received, 0) + display_dropped,
+                    'display_dropped' : display_dropped,
+                    'cpu_percent'     : 100.0 * cpu / elapsed,
+                    'rss_mb'          : rss_bytes() / 1e6,
+                    'seconds'         : elapsed}
+
+    cls = display_class(display)
+    dataReceiver = 'rogue://0/root.AsicSampleProcessor'
+    macros = {'dataReceiver' : dataReceiver, 'title' : display, 'sizeX' : sizeX, 'sizeY' : sizeY,
+              'port' : str(port), 'maxFps' : maxFps}
+
+    with SimulationRoot(rate=rate, asics=asics, channels=channels, serverPort=port) as root:
+        app = pydm.PyDMApplication(hide_nav_bar=True, hide_menu_bar=True, hide_status_bar=True)
+        widget = cls(macros=macros)
+        widget.resize(sizeX, sizeY)
+        widget.show()
+        probe = LatencyProbe(widget, root, dataReceiver)
+        root.start_run()
+        QTimer.singleShot(int(1000*warmup), probe.reset)
+        QTimer.singleShot(int(1000*(warmup+duration)), app.quit)
+        app.exec_()
+        root.stop_run()
+        result = probe.result()
+
+    result.update({'display' : display, 'rate' : rate, 'maxFps' : maxFps, 'asics' : asics, 'channels' : channels})
+    return result
+
+def run_benchmark_suite(displays=('event', 'channel', 'beam', 'particle'), rates=(10, 100, 1000),
+                        duration=10.0, port=9200, maxFps=0, report=None, micro=True, panels=True, asics=8, channels=64):
+    # Every (display, rate) point runs in its own process so CPU, RSS and Qt state
+    # do not carry over between points
+    package = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ)
+    env['PYTHONPATH'] = package + os.pathsep + env.get('PYTHONPATH', '')
+    env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+    results = {'host'      : socket.gethostname(),
+               'platform'  : platform.platform(),
+               'python'    : platform.python_version(),
+               'numpy'     : np.__version__,
+               'timestamp' : time.strftime('%Y-%m-%dT%H:%M:%S'),
+               'duration'  : duration,
+               'geometry'  : {'asics' : asics, 'channels' : channels},
+               'displays'  : []}
+    if micro:
+        results['micro'] = microbenchmarks(asics=asics, channels=channels)
+    if panels:
+        results['panels'] = run_panel_benchmarks(displays)
+
+    point = 0
+    for display in displays:
+        for rate in rates:
+            code = ("import json\n"
+                    "from assertViewer.assertBenchmark import benchmark_display\n"
+                    f"print(json.dumps(benchmark_display({display!r}, {float(rate)}, duration={float(duration)}, port={port + 2*point}, maxFps={maxFps}, "
+                    f"asics={int(asics)}, channels={int(channels)})))\n")
+            point += 1
+            proc = subprocess.run([sys.executable, '-c', code], env=env, capture_output=True, text=True,
+                                  timeout=duration + 120)
+            lines = [l for l in proc.stdout.splitlines() if l.startswith('{')]
+            if proc.returncode == 0 and lines:
+                entry = json.loads(lines[-1])
+            else:
+                entry = {'display' : display, 'rate' : rate, 'error' : proc.stderr.strip().splitlines()[-1:] }
+            results['displays'].append(entry)
+            print(summary_line(entry), flush=True)
+
+    if report is not None:
+        with open(report, 'w') as f:
+            json.dump(results, f, indent=2)
+    return results
+
+def summary_line(entry):
+    if 'error' in entry:
+        return f"{entry['display']:>10} {entry['rate']:>8} Hz  failed: {entry['error']}"
+    lat = entry['latency_ms']
+    p50 = 'n/a' if lat['p50'] is None else f"{lat['p50']:.1f}"
+    p99 = 'n/a' if lat['p99'] is None else f"{lat['p99']:.1f}"
+    return (f"{entry['display']:>10} {entry['rate']:>8} Hz  source {entry['source_rate']:7.1f} Hz  "
+            f"updates {entry['update_rate']:6.1f} Hz  latency p50 {p50} ms p99 {p99} ms  "
+            f"dropped {entry['dropped']}  cpu {entry['cpu_percent']:.0f}%  rss {entry['rss_mb']:.0f} MB")
+
+def panel_summary_line(entry):
+    if 'error' in entry:
+        return f"{entry['display']:>10} panels  failed: {entry['error']}"
+    ui, code = entry['ui'], entry['code']
+    return (f"{entry['display']:>10} panels  .ui {ui['build_ms']:6.1f} ms ({ui['ms_per_panel']:5.2f} ms, {ui['kb_per_panel']:6.0f} kB per panel)  "
+            f"code {code['build_ms']:6.1f} ms ({code['ms_per_panel']:5.2f} ms, {code['kb_per_panel']:6.0f} kB per panel)")
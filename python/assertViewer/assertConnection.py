@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+#-----------------------------------------------------------------------------
+# Title      : Shared, persistent Rogue client connections
+#-----------------------------------------------------------------------------
+# One RogueConnection per host:port and process, shared by every display (and by the
+# rogue:// PyDM plugin, which gets the same cached VirtualClient). The server is probed
+# with exponential backoff before the client is created, so an unreachable server gives
+# a clear error instead of a display that hangs, and a lost link is re-established in
+# the background while the displays keep running.
+
+import time
+import socket
+import threading
+
+import pyrogue as pr
+
+_connections = {}
+_lock = threading.Lock()
+
+def parse_servers(serverList):
+    # 'host1:port1,host2:port2' -> [(host1, port1), (host2, port2)]
+    servers = []
+    for entry in (serverList or '').split(','):
+        entry = entry.strip()
+        if not entry:
+            continue
+        host, _, port = entry.rpartition(':')
+        servers.append((host or 'localhost', int(port)))
+    return servers
+
+def server_address(serverList=None, port=None):
+    # The server of serverList that listens on <port>, otherwise the host of the first
+    # entry with <port>; without a list the server runs on localhost
+    servers = parse_servers(serverList)
+    if port is None:
+        return servers[0] if servers else ('localhost', 9099)
+    port = int(port)
+    for host, p in servers:
+        if p == port:
+            return host, p
+    return (servers[0][0] if servers else 'localhost'), port
+
+class RogueConnection(object):
+    def __init__(self, host='localhost', port=9099, timeout=30.0, backoff=0.25, maxBackoff=10.0, linkTimeout=10.0):
+        # timeout bounds the wait for the first connection (None waits forever), backoff
+        # is the first retry delay, doubled on every failed attempt up to maxBackoff
+        self.host = host
+        self.port = int(port)
+        self.timeout     = timeout
+        self.backoff     = backoff
+        self.maxBackoff  = maxBackoff
+        self.linkTimeout = linkTimeout
+        self.reconnects  = 0
+        self._client    = None
+        self._linked    = False
+        self._listeners = []
+        self._lock      = threading.RLock()
+        self._stop      = threading.Event()
+        self._recovery  = None
+
+    def __repr__(self):
+        state = 'linked' if self.linked else ('unlinked' if self._client is not None else 'closed')
+        return f'RogueConnection({self.host}:{self.port}, {state})'
+
+    @property
+    def address(self):
+        return f'{self.host}:{self.port}'
+
+    @property
+    def linked(self):
+        return self._client is not None and self._linked
+
+    @property
+    def client(self):
+        return self.connect()
+
+    @property
+    def root(self):
+        return self.connect().root
+
+    def add_listener(self, function):
+        # function(root, linked) on every link change and after a reconnect
+        self._listeners.append(function)
+
+    def remove_listener(self, function):
+        if function in self._listeners:
+            self._listeners.remove(function)
+
+    def reachable(self, timeout=1.0):
+        try:
+            with socket.create_connection((self.host, self.port), timeout=timeout):
+                return True
+        except OSError:
+            return False
+
+    def _wait_reachable(self, timeout):
+        delay = self.backoff
+        start = time.monotonic()
+        while not self._stop.is_set():
+            if self.reachable(timeout=min(delay, 2.0)):
+                return True
+            if timeout is not None and time.monotonic() - start + delay > timeout:
+                return False
+            self._stop.wait(delay)
+            delay = min(2 * delay, self.maxBackoff)
+        return False
+
+    def connect(self):
+        # Returns the client, creating it on first use
+        with self._lock:
+            if self._client is not None:
+                return self._client
+            self._stop.clear()
+            if not self._wait_reachable(self.timeout):
+                raise ConnectionError(f"No Rogue server at {self.address} after {self.timeout} s")
+            self._client = self._create_client()
+            return self._client
+
+    def _create_client(self):
+        # VirtualClient only takes the address; the link is reported down by its own
+        # monitor and linkTimeout only applies to the recovery below
+        client = pr.interfaces.VirtualClient(self.host, self.port)
+        client.addLinkMonitor(self._link_changed)
+        self._linked = True
+        return client
+
+    def _drop_client(self):
+        # Stop the client and evict it from the VirtualClient cache so the next one
+        # opens fresh sockets
+        client, self._client = self._client, None
+        if client is None:
+            return
+        try:
+            client.stop()
+        except Exception:
+            pass
+        cache = getattr(pr.interfaces.VirtualClient, 'ClientCache', {})
+        for key in [key for key, value in cache.items() if value is client]:
+            del cache[key]
+
+    def _link_changed(self, linked):
+        self._linked = bool(linked)
+        if not linked and not self._stop.is_set():
+            if self._recovery is None or not self._recovery.is_alive():
+                self._recovery = threading.Thread(target=self._recover, name=f'RogueConnection {self.address}', daemon=True)
+                self._recovery.start()
+        self._notify()
+
+    def _recover(self):
+        # The client sockets reconnect by themselves once the server is back; if the
+        # link is still down linkTimeout after that, the client is replaced
+        while not self._stop.is_set() and not self._linked:
+            if not self._wait_reachable(None):
+                return
+            if self._stop.wait(self.linkTimeout) or self._linked:
+                return
+            with self._lock:
+                if self._stop.is_set() or self._linked:
+                    return
+                self._drop_client()
+                try:
+                    self._client = self._create_client()
+                except Exception:
+                    continue
+                self.reconnects += 1
+            self._notify()
+
+    def _notify(self):
+        root = self._client.root if self._client is not None else None
+        for function in list(self._listeners):
+            try:
+                function(root, self.linked)
+            except Exception:
+                pass
+
+    def close(self):
+        self._stop.set()
+        with self._lock:
+            self._drop_client()
+            self._linked = False
+
+def get_connection(host='localhost', port=9099, **kwargs):
+    # The process-wide connection to host:port, created on first use
+    key = (host, int(port))
+    with _lock:
+        if key not in _connections:
+            _connections[key] = RogueConnection(host, int(port), **kwargs)
+        return _connections[key]
+
+def rogue_connection(serverList=None, port=None, **kwargs):
+    return get_connection(*server_address(serverList, port), **kwargs)
+
+def close_connections():
+    # Called once the displays have exited
+    with _lock:
+        connections = list(_connections.values())
+        _connections.clear()
+    for connection in connections:
+        connection.close()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+#-----------------------------------------------------------------------------
+# Title      : Client-side ring buffer for ASIC frame history
+#-----------------------------------------------------------------------------
+
+import numpy as np
+
+class FrameRingBuffer(object):
+    def __init__(self, depth, shape, dtype=np.float32):
+        # Preallocate the whole history once, new frames overwrite the oldest slot
+        self._depth = max(int(depth), 1)
+        self._shape = tuple(shape)
+        self._data  = np.zeros((self._depth,) + self._shape, dtype=dtype)
+        self._head  = 0
+        self._count = 0
+
+    @classmethod
+    def from_memory_budget(cls, depth, budget, shape, dtype=np.float32):
+        # Clip the requested depth so the buffer stays within budget bytes
+        frame_bytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        if budget is not None:
+            depth = min(int(depth), max(int(budget // frame_bytes), 1))
+        return cls(depth, shape, dtype=dtype)
+
+    @property
+    def depth(self):
+        return self._depth
+
+    @property
+    def shape(self):
+        return self._shape
+
+    @property
+    def nbytes(self):
+        return self._data.nbytes
+
+    def __len__(self):
+        return self._count
+
+    def clear(self):
+        self._head  = 0
+        self._count = 0
+
+    def append(self, frame):
+        # Copy one frame into the next slot, nothing else in the buffer is touched.
+        # Returns the frame that dropped out of the history, if any.
+        evicted = None
+        if self._count == self._depth:
+            evicted = self._data[self._head].copy()
+        self._data[self._head] = frame
+        self._head = (self._head + 1) % self._depth
+        self._count = min(self._count + 1, self._depth)
+        return evicted
+
+    def extend(self, frames):
+        # Append many frames at once, oldest first
+        frames = np.asarray(frames)[-self._depth:]
+        n = len(frames)
+        self._data[(self._head + np.arange(n)) % self._depth] = frames
+        self._head = (self._head + n) % self._depth
+        self._count = min(self._count + n, self._depth)
+
+    def resize(self, depth):
+        # Reallocate for <depth> frames, keeping the newest ones
+        frames = self.ordered()
+        self._depth = max(int(depth), 1)
+        self._data  = np.zeros((self._depth,) + self._shape, dtype=self._data.dtype)
+        self.clear()
+        self.extend(frames)
+
+    def sum(self, dtype=np.float64):
+        # Sum over the frames in the buffer, straight from the contiguous slot ranges
+        start = (self._head - self._count) % self._depth
+        if start + self._count <= self._depth:
+            return self._data[start:start+self._count].sum(axis=0, dtype=dtype)
+        return self._data[start:].sum(axis=0, dtype=dtype) + self._data[:self._head].sum(axis=0, dtype=dtype)
+
+    def _order(self):
+        # Slot indices from the oldest to the newest frame
+        return (self._head - self._count + np.arange(self._count)) % self._depth
+
+    def popleft(self):
+        # Remove and return the oldest frame
+        if self._count == 0:
+            return None
+        frame = self._data[(self._head - self._count) % self._depth].copy()
+        self._count -= 1
+        return frame
+
+    def oldest(self):
+        if self._count == 0:
+            return None
+        return self._data[(self._head - self._count) % self._depth]
+
+    def latest(self):
+        if self._count == 0:
+            return None
+        return self._data[(self._head - 1) % self._depth]
+
+    def ordered(self):
+        # Full history, oldest frame first
+        return self._data[self._order()]
+
+    def trace(self, *index):
+        # History of a single element, e.g. trace(channel, frame), oldest frame first
+        return self._data[(self._order(),) + index]
@@ -10,8 +10,18 @@ import numpy as np
 from pydm.widgets import PyDMLineEdit, PyDMLabel
 from qtpy.QtWidgets import QWidget, QLabel, QGridLayout, QVBoxLayout, QSpacerItem, QSizePolicy
 
-def runReceiverDisplay(dataReceiver, serverList='localhost:9090', root=None,
-                   title=None,sizeX=800,sizeY=1000,maxListExpand=5,maxListSize=100):
+from assertViewer.assertPlotting import LocalCurve
+from assertViewer.assertPanels import sensor_panels, waveform_plot_panel
+from assertViewer.assertRefresh import RefreshScheduler
+from assertViewer.assertInstrumentation import Instrumentation, InstrumentationReporter
+from assertViewer.assertStartup import report_on_event_loop
+from assertViewer.assertSignalCache import AsicSignalCache
+from assertViewer.assertGeometry import geometry_from_macros
+from assertViewer.assertConnection import close_connections
+
+def runReceiverDisplay(dataReceiver, serverList='localhost:9090', geometry=None, port='9090', root=None,
+                   title=None,sizeX=800,sizeY=1000,maxListExpand=5,maxListSize=100,maxFps=10,
+                   showStats=False,statsLog=None,statsInterval=1.0):
 
     #pyrogue.pydm.runPyDM()
 
@@ -38,39 +48,63 @@ def runReceiverDisplay(dataReceiver, serverList='localhost:9090', root=None,
 
     macrosA = {}
     macrosA['dataReceiver'] = dataReceiver
+    macrosA['geometry'] = geometry
+    macrosA['serverList'] = os.getenv('ROGUE_SERVERS')
+    macrosA['port'] = port
     macrosA['title'] = title
     macrosA['sizeX'] = sizeX
     macrosA['sizeY'] = sizeY
+    macrosA['maxFps'] = maxFps
+    macrosA['showStats'] = showStats
+    macrosA['statsLog'] = statsLog
+    macrosA['statsInterval'] = statsInterval
     app = pydm.PyDMApplication(ui_file=ui,
                                command_line_args=args,
                                macros=macrosA,
                                hide_nav_bar=True,
                                hide_menu_bar=True,
                                hide_status_bar=True)
+    report_on_event_loop(title)
     app.exec()
+    close_connections()
 
 class assertGUI(pydm.Display):
     def __init__(self, parent=None, args=None, macros=None):
         super().__init__(parent=parent, args=args, macros=macros)
         # print(f'{macros=}')
-        self._asics = 8
+        self._geometry = geometry_from_macros(macros)
+        self._asics = self._geometry.asics
+        self._channels = self._geometry.channels
         self._dataReceiver = macros['dataReceiver']
         self.sizeX = macros['sizeX']
         self.sizeY = macros['sizeY']
+        self._max_fps = macros.get('maxFps', 10)
+        self._show_stats = macros.get('showStats', False)
+        self._stats_log  = macros.get('statsLog', None)
+        self._stats_interval = float(macros.get('statsInterval', 1.0))
+        self._perf = Instrumentation(name='event')
         self.setup_main_tab()
         self.setup_config_tab()
+        self.setup_plots()
+        self.setup_instrumentation()
 
     def setup_main_tab(self):
         grid_layout=QGridLayout()
         spacer_label=QLabel('')
         frame_cnt_label=QLabel(f'Frame Count')
         frame_cnt_line=PyDMLineEdit(init_channel=f'{self._dataReceiver}.ASIC0FrameCnt')
-        frame_cnt_line.textChanged.connect(self.onClick_updatePlots)
+        refresh_label=QLabel(f'Refresh')
+        refresh_stats=QLabel('')
+        # Redraw at most maxFps times per second, merging the frames in between
+        self._refresh = RefreshScheduler(self.updatePlots, maxFps=self._max_fps, label=refresh_stats, parent=self)
+        frame_cnt_line.textChanged.connect(self._refresh.notify)
         vertical_spacer=QSpacerItem(20, 40, QSizePolicy.Minimum, QSizePolicy.Expanding)
         grid_layout.addWidget(spacer_label,0,0)
         grid_layout.addWidget(frame_cnt_label,1,0)
         grid_layout.addWidget(frame_cnt_line,1,1)
-        grid_layout.addItem(vertical_spacer,2,0)
+        grid_layout.addWidget(refresh_label,2,0)
+        grid_layout.addWidget(refresh_stats,2,1)
+        grid_layout.addItem(vertical_spacer,3,0)
         self.ui.PyDMTabWidget_main.setLayout(grid_layout)
 
     def setup_config_tab(self):
@@ -82,54 +116,63 @@ class assertGUI(pydm.Display):
         self.ui.PyDMCheckbox_pedestals.clicked.connect(self.onClick_updatePlots)
         self.ui.PyDMCheckbox_cm.clicked.connect(self.onClick_updatePlots)
 
-    def onClick_updatePlots(self):
-
-        self.resetPlots()
-
-        # Read current plot settings and update plots
+    def setup_plots(self):
+        # Create one curve per sensor plane once; new frames only push data into them
+        self._index_channels = np.arange(self._channels)
+        self._curves = []
+        self._panels = sensor_panels(self.ui, 'PyDMWaveformPlot_', self._asics, waveform_plot_panel, name='PyDMWaveformPlot')
+        for i, plot in enumerate(self._panels, 1):
+            plot.setPlotTitle(f'{self._geometry.planes[i-1].upper()} Coordinates - Plane {i}')
+            self._curves.append(LocalCurve(plot, yAxisName = "ADC Counts"))
+
+        # The signal subscriptions stay open and are only retargeted when a checkbox changes
+        self._signals = AsicSignalCache(self._dataReceiver, asics=self._asics, channels=self._channels,
+                                        variable=self.selected_signal())
+        self._signals.connect()
+
+    def setup_instrumentation(self):
+        # Phase timings as an optional on-screen overlay and/or a periodic log
+        self._perf_reporter = InstrumentationReporter(self._perf, self, show=self._show_stats, path=self._stats_log,
+                                                      interval=self._stats_interval,
+                                                      gauges={'queue'  : lambda: self._refresh.pending,
+                                                              'merged' : lambda: self._refresh.frames_merged})
+
+    def selected_signal(self):
+        # Read current plot settings
         noise_checkbox     = self.ui.PyDMCheckbox_noise 
         pedestals_checkbox = self.ui.PyDMCheckbox_pedestals
         cm_checkbox        = self.ui.PyDMCheckbox_cm
 
-        # Redraw the ADC counts on all sensor planes
-        # Check to see if the frame count has incremented
-        # If it has, then reset all plots and redraw the counts
         # Assuming all count combinations exist as rogue variables already
-        # And also that the framecount is parsed out and stored in a rogue variable
-        # The checkboxes determine which channel we add to the plot each time
-
-        # Depending on the configuration, update the curves with the appropriate counts  
-        if noise_checkbox.isChecked() and pedestals_checkbox.isChecked() and cm_checkbox.isChecked():
-            for i in np.arange(1,self._asics+1):
-                getattr(self.ui, f'PyDMWaveformPlot_{i}').addChannel(y_channel = f'{self._dataReceiver}.ASIC{i-1}SigNosPed',x_channel = f'{self._dataReceiver}.IndexChannels',plot_style = "Line",color = "orange",lineWidth = 3,yAxisName = "ADC Counts")
-        elif noise_checkbox.isChecked() and pedestals_checkbox.isChecked():
-            for i in np.arange(1,self._asics+1):
-                getattr(self.ui, f'PyDMWaveformPlot_{i}').addChannel(y_channel = f'{self._dataReceiver}.ASIC{i-1}SigNosPed',x_channel = f'{self._dataReceiver}.IndexChannels',plot_style = "Line",color = "orange",lineWidth = 3,yAxisName = "ADC Counts")
-        elif noise_checkbox.isChecked() and cm_checkbox.isChecked():
-            for i in np.arange(1,self._asics+1):
-                getattr(self.ui, f'PyDMWaveformPlot_{i}').addChannel(y_channel = f'{self._dataReceiver}.ASIC{i-1}SigNos',x_channel = f'{self._dataReceiver}.IndexChannels',plot_style = "Line",color = "orange",lineWidth = 3,yAxisName = "ADC Counts")
-        elif pedestals_checkbox.isChecked() and cm_checkbox.isChecked():
-            for i in np.arange(1,self._asics+1):
-                getattr(self.ui, f'PyDMWaveformPlot_{i}').addChannel(y_channel = f'{self._dataReceiver}.ASIC{i-1}SigPed',x_channel = f'{self._dataReceiver}.IndexChannels',plot_style = "Line",color = "orange",lineWidth = 3,yAxisName = "ADC Counts")
+        # The checkboxes determine which signal variable we plot
+        if noise_checkbox.isChecked() and pedestals_checkbox.isChecked():
+            return 'SigNosPed'
         elif noise_checkbox.isChecked():
-            for i in np.arange(1,self._asics+1):
-                getattr(self.ui, f'PyDMWaveformPlot_{i}').addChannel(y_channel = f'{self._dataReceiver}.ASIC{i-1}SigNos',x_channel = f'{self._dataReceiver}.IndexChannels',plot_style = "Line",color = "orange",lineWidth = 3,yAxisName = "ADC Counts")
+            return 'SigNos'
         elif pedestals_checkbox.isChecked():
-            for i in np.arange(1,self._asics+1):
-                getattr(self.ui, f'PyDMWaveformPlot_{i}').addChannel(y_channel = f'{self._dataReceiver}.ASIC{i-1}SigPed',x_channel = f'{self._dataReceiver}.IndexChannels',plot_style = "Line",color = "orange",lineWidth = 3,yAxisName = "ADC Counts")
-        elif cm_checkbox.isChecked():
-            # Displaying pure signals for now
-            for i in np.arange(1,self._asics+1):
-                getattr(self.ui, f'PyDMWaveformPlot_{i}').addChannel(y_channel = f'{self._dataReceiver}.ASIC{i-1}Sig',x_channel = f'{self._dataReceiver}.IndexChannels',plot_style = "Line",color = "orange",lineWidth = 3,yAxisName = "ADC Counts")
-        elif not noise_checkbox.isChecked() and not pedestals_checkbox.isChecked() and not cm_checkbox.isChecked():
-            for i in np.arange(1,self._asics+1):
-                getattr(self.ui, f'PyDMWaveformPlot_{i}').addChannel(y_channel = f'{self._dataReceiver}.ASIC{i-1}Sig',x_channel = f'{self._dataReceiver}.IndexChannels',plot_style = "Line",color = "orange",lineWidth = 3,yAxisName = "ADC Counts")
+            return 'SigPed'
         else:
-            pass
+            # Displaying pure signals for now (common mode only or nothing selected)
+            return 'Sig'
+
+    def onClick_updatePlots(self):
+        # Retarget the existing subscriptions to the newly selected signal variable
+        self.resetPlots()
+        self._signals.retarget(self.selected_signal())
+
+    def updatePlots(self):
+        # Push the newest data of every sensor plane into its curve
+        with self._perf.phase('fetch'):
+            values, valid = self._signals.values, self._signals.valid.copy()
+        with self._perf.phase('render'):
+            for asic in np.arange(len(self._panels)):
+                if valid[asic]:
+                    self._curves[asic].setData(values[asic], x=self._index_channels)
+        self._perf.frame()
 
     def resetPlots(self):
-        for i in np.arange(1,self._asics+1):
-            getattr(self.ui, f'PyDMWaveformPlot_{i}').clearCurves()
+        for curve in self._curves:
+            curve.clear()
 
     def ui_filename(self):
         # Point to the UI file
@@ -9,15 +9,27 @@ import time
 import pydm
 import numpy as np
 from pydm.widgets import PyDMLineEdit, PyDMLabel
-from qtpy.QtWidgets import QWidget, QLabel, QGridLayout, QVBoxLayout, QSpacerItem, QSizePolicy
+from qtpy.QtWidgets import QWidget, QLabel, QGridLayout, QVBoxLayout, QSpacerItem, QSizePolicy, QPushButton
+
+from assertViewer.assertRefresh import RefreshScheduler
+from assertViewer.assertWorker import BackgroundWorker
+from assertViewer.assertInstrumentation import Instrumentation, InstrumentationReporter
+from assertViewer.assertStartup import report_on_event_loop
+from assertViewer.assertConnection import rogue_connection, close_connections
+from assertViewer.assertSignalCache import shared_signal_cache
+from assertViewer.assertGeometry import geometry_from_macros
+from assertViewer.assertPanels import sensor_panels, plot_panel
+from assertViewer.assertBeamGeometry import compute_plane_profiles, pair_planes, profile_drift, BeamProfileAccumulator
 
 import rogue
 import pyrogue as pr
 import pyqtgraph as pg
 from pyqtgraph.Qt import QtCore, QtWidgets
 
-def runBeamDisplay(dataReceiver,serverList='localhost:9090',port='9090',root=None,
-                   title=None,sizeX=800,sizeY=1000,maxListExpand=5,maxListSize=100):
+def runBeamDisplay(dataReceiver,serverList='localhost:9090',geometry=None,port='9090',root=None,
+                   title=None,sizeX=800,sizeY=1000,maxListExpand=5,maxListSize=100,maxFps=10,
+                   profileWindow=1000,
+                   showStats=False,statsLog=None,statsInterval=1.0):
 
     #pyrogue.pydm.runPyDM()
 
@@ -44,135 +56,179 @@ def runBeamDisplay(dataReceiver,serverList='localhost:9090',port='9090',root=Non
 
     macrosA = {}
     macrosA['dataReceiver'] = dataReceiver
+    macrosA['geometry'] = geometry
     macrosA['title'] = title
     macrosA['sizeX'] = sizeX
     macrosA['sizeY'] = sizeY
     macrosA['port' ] = port
+    macrosA['serverList'] = os.getenv('ROGUE_SERVERS')
+    macrosA['maxFps'] = maxFps
+    macrosA['showStats'] = showStats
+    macrosA['statsLog'] = statsLog
+    macrosA['statsInterval'] = statsInterval
+    macrosA['profileWindow'] = profileWindow
     app = pydm.PyDMApplication(ui_file=ui,
                                command_line_args=args,
                                macros=macrosA,
                                hide_nav_bar=True,
                                hide_menu_bar=True,
                                hide_status_bar=True)
+    report_on_event_loop(title)
     app.exec()
+    close_connections()
 
 class assertGUIBeamGeometry(pydm.Display):
     def __init__(self, parent=None, args=None, macros=None):
         super().__init__(parent=parent, args=args, macros=macros)
         # print(f'{macros=}')
-        self._asics = 8
-        self._channels = 64
+        self._geometry = geometry_from_macros(macros)
+        self._asics = self._geometry.asics
+        self._channels = self._geometry.channels
+        self._stations = self._geometry.stations
         self._port = macros['port']
+        self._serverList = macros.get('serverList', None)
         self._dataReceiver = macros['dataReceiver']
         self.sizeX = macros['sizeX']
         self.sizeY = macros['sizeY']
+        self._max_fps = macros.get('maxFps', 10)
+        self._show_stats = macros.get('showStats', False)
+        self._stats_log  = macros.get('statsLog', None)
+        self._stats_interval = float(macros.get('statsInterval', 1.0))
+        self._perf = Instrumentation(name='beam')
+        self._profile_frames = macros.get('profileWindow', 1000)
+        self._worker = BackgroundWorker('beam', parent=self)
         self.setup_plots()
         self.setup_main_tab()
         self.setup_config_tab()
         self.connect_rogue_root()
+        self.setup_signals()
+        self.setup_instrumentation()
         
     def connect_rogue_root(self):
-        with pr.interfaces.VirtualClient(addr="localhost",port=int(self._port)) as client:
-        
-           # Get the reference to the root node
-           self._root = client.root
-        
-           # Get a variable value with a read, this returns the native value
-           #ret = self._root.RogueVersion.get()
-           #print(f"Version = {ret}")
+        # Shared, persistent client of the server listening on <port>; the root is
+        # rebound if the connection has to be re-established
+        self._connection = rogue_connection(self._serverList, self._port)
+        self._root = self._connection.root
+        self._connection.add_listener(self.rogue_link_changed)
+
+        # Get a variable value with a read, this returns the native value
+        #ret = self._root.RogueVersion.get()
+        #print(f"Version = {ret}")
+
+    def rogue_link_changed(self, root, linked):
+        if root is not None:
+            self._root = root
+
+    def setup_signals(self):
+        # All ASIC signal arrays are pushed to a local cache instead of 8 gets per update,
+        # shared with the other displays of the process
+        self._signals = shared_signal_cache(self._dataReceiver, asics=self._asics, channels=self._channels, variable='Sig')
+        # Every complete event fills the beam profiles, a redraw only reads them. At
+        # most a few events wait for the worker, further events are dropped and counted
+        # so a DAQ rate above what the worker handles does not build up a backlog.
+        self._latest_event = None
+        self._max_pending  = 8
+        self._dropped      = 0
+        self._signals.add_listener(eventCallback=self.receive_event)
        
+    def setup_instrumentation(self):
+        # Phase timings as an optional on-screen overlay and/or a periodic log
+        self._perf_reporter = InstrumentationReporter(self._perf, self, show=self._show_stats, path=self._stats_log,
+                                                      interval=self._stats_interval,
+                                                      gauges={'queue'  : lambda: self._refresh.pending,
+                                                              'merged' : lambda: self._refresh.frames_merged,
+                                                              'worker' : lambda: self._worker.pending,
+                                                              'dropped': lambda: self._dropped,
+                                                              'stale'  : lambda: self._worker.stale + self._worker.skipped})
+
     def setup_plots(self):
-        # Add legends
-        #self.ui.graphicsView_1.addLegend()
-        #self.ui.graphicsView_2.addLegend()
-        #self.ui.graphicsView_3.addLegend()
-        #self.ui.graphicsView_4.addLegend()
-        for i in np.arange(1,int(self._asics/2)+1):
-            getattr(self.ui, f'graphicsView_{i}').addLegend() 
-
-        # Add error bars
+        # One panel per station, built from the geometry
+        self._panels = sensor_panels(self.ui, 'graphicsView_', self._stations, plot_panel, name='graphicsView')
+
         x=np.zeros  (self._channels)
         y=np.zeros  (self._channels)
         err=np.zeros(self._channels)
-        #self._error_bars_1 = pg.ErrorBarItem(beam=0.5, pen={'color': 'w', 'width': 1})
-        #self._error_bars_2 = pg.ErrorBarItem(beam=0.5, pen={'color': 'w', 'width': 1})
-        #self._error_bars_3 = pg.ErrorBarItem(beam=0.5, pen={'color': 'w', 'width': 1})
-        #self._error_bars_4 = pg.ErrorBarItem(beam=0.5, pen={'color': 'w', 'width': 1})
-        for i in np.arange(1,int(self._asics/2)+1):
-            setattr(self, f'self._error_bars_{i}', pg.ErrorBarItem(beam=0.5, pen={'color': 'w', 'width': 1})) 
-        #self.ui.graphicsView_1.addItem(self._error_bars_1)
-        #self.ui.graphicsView_2.addItem(self._error_bars_2)
-        #self.ui.graphicsView_3.addItem(self._error_bars_3)
-        #self.ui.graphicsView_4.addItem(self._error_bars_4)
-        for i in np.arange(1,int(self._asics/2)+1):
-            getattr(self.ui, f'graphicsView_{i}').addItem(getattr(self,f'self._error_bars_{i}')) 
-        #self._error_bars_1.setData(x=x,y=y,top=err,bottom=err)
-        #self._error_bars_2.setData(x=x,y=y,top=err,bottom=err)
-        #self._error_bars_3.setData(x=x,y=y,top=err,bottom=err)
-        #self._error_bars_4.setData(x=x,y=y,top=err,bottom=err)
-        for i in np.arange(1,int(self._asics/2)+1):
-            getattr(self, f'self._error_bars_{i}').setData(x=x,y=y,top=err,bottom=err) 
-
-        # Show grid
-        #self.ui.graphicsView_1.showGrid(x=True, y=True)
-        #self.ui.graphicsView_2.showGrid(x=True, y=True)
-        #self.ui.graphicsView_3.showGrid(x=True, y=True)
-        #self.ui.graphicsView_4.showGrid(x=True, y=True)
-        for i in np.arange(1,int(self._asics/2)+1):
-            getattr(self.ui, f'graphicsView_{i}').showGrid(x=True, y=True) 
-
-        # Add x-axis labels
-        #self.ui.graphicsView_1.setLabel("bottom", "X-coordinate")
-        #self.ui.graphicsView_2.setLabel("bottom", "X-coordinate")
-        #self.ui.graphicsView_3.setLabel("bottom", "X-coordinate")
-        #self.ui.graphicsView_4.setLabel("bottom", "X-coordinate")
-        for i in np.arange(1,int(self._asics/2)+1):
-            getattr(self.ui, f'graphicsView_{i}').setLabel("bottom", "X-coordinate") 
-
-        # Add y-axis labels 
-        #self.ui.graphicsView_1.setLabel("left", "Y-coordinate")
-        #self.ui.graphicsView_2.setLabel("left", "Y-coordinate")
-        #self.ui.graphicsView_3.setLabel("left", "Y-coordinate")
-        #self.ui.graphicsView_4.setLabel("left", "Y-coordinate")
-        for i in np.arange(1,int(self._asics/2)+1):
-            getattr(self.ui, f'graphicsView_{i}').setLabel("left", "Y-coordinate") 
-
-        # Set X and Y ranges
-        #self.ui.graphicsView_1.setXRange(0, 70, padding=0)
-        #self.ui.graphicsView_1.setYRange(0, 70, padding=0)
-        #self.ui.graphicsView_2.setXRange(0, 70, padding=0)
-        #self.ui.graphicsView_2.setYRange(0, 70, padding=0)
-        #self.ui.graphicsView_3.setXRange(0, 70, padding=0)
-        #self.ui.graphicsView_3.setYRange(0, 70, padding=0)
-        #self.ui.graphicsView_4.setXRange(0, 70, padding=0)
-        #self.ui.graphicsView_4.setYRange(0, 70, padding=0)
-        for i in np.arange(1,int(self._asics/2)+1):
-            getattr(self.ui, f'graphicsView_{i}').setXRange(0, 70, padding=0) 
-            getattr(self.ui, f'graphicsView_{i}').setYRange(0, 70, padding=0) 
-
-        # Create plot items
-        self._plot_item_1 = self.ui.graphicsView_1.plot(x=[], y=[], symbol='o', pen=None, symbolPen={'color': 'm', 'width': 2}, symbolBrush="m", symbolSize=8, name="Beam Geometry (sensor planes 1 & 2)")
-        self._plot_item_2 = self.ui.graphicsView_2.plot(x=[], y=[], symbol='o', pen=None, symbolPen={'color': 'm', 'width': 2}, symbolBrush="m", symbolSize=8, name="Beam Geometry (sensor planes 3 & 4)")
-        self._plot_item_3 = self.ui.graphicsView_3.plot(x=[], y=[], symbol='o', pen=None, symbolPen={'color': 'm', 'width': 2}, symbolBrush="m", symbolSize=8, name="Beam Geometry (sensor planes 5 & 6)")
-        self._plot_item_4 = self.ui.graphicsView_4.plot(x=[], y=[], symbol='o', pen=None, symbolPen={'color': 'm', 'width': 2}, symbolBrush="m", symbolSize=8, name="Beam Geometry (sensor planes 7 & 8)")
-
-        # Set titles
-        self.ui.graphicsView_1.setTitle("Beam Geometry (Sensor Planes 1 & 2)")
-        self.ui.graphicsView_2.setTitle("Beam Geometry (Sensor Planes 3 & 4)")
-        self.ui.graphicsView_3.setTitle("Beam Geometry (Sensor Planes 5 & 6)")
-        self.ui.graphicsView_4.setTitle("Beam Geometry (Sensor Planes 7 & 8)")
+        self._error_bars = []
+        self._plot_items = []
+        for (xp, yp), view in zip(self._geometry.pairs, self._panels):
+            # Add legends
+            view.addLegend()
+
+            # Add error bars
+            self._error_bars.append(pg.ErrorBarItem(beam=0.5, pen={'color': 'w', 'width': 1}))
+            view.addItem(self._error_bars[-1])
+            self._error_bars[-1].setData(x=x,y=y,top=err,bottom=err)
+
+            # Show grid
+            view.showGrid(x=True, y=True)
+
+            # Add x- and y-axis labels
+            view.setLabel("bottom", "X-coordinate")
+            view.setLabel("left", "Y-coordinate")
+
+            # Set X and Y ranges
+            view.setXRange(*self._geometry.strip_range, padding=0)
+            view.setYRange(*self._geometry.strip_range, padding=0)
+
+            # Create plot items
+            self._plot_items.append(view.plot(x=[], y=[], symbol='o', pen=None, symbolPen={'color': 'm', 'width': 2}, symbolBrush="m", symbolSize=8, name=f"Beam Geometry (sensor planes {xp+1} & {yp+1})"))
+
+            # Set titles
+            view.setTitle(f"Beam Geometry (Sensor Planes {xp+1} & {yp+1})")
+
+        # Accumulated beam profiles: one since the last reset, one fading over profileWindow frames
+        self._profile_total  = BeamProfileAccumulator(pairs=self._stations, channels=self._channels)
+        self._profile_window = BeamProfileAccumulator(pairs=self._stations, channels=self._channels, window=self._profile_frames)
+        lut = pg.colormap.get('inferno').getLookupTable()
+        self._profile_images = []
+        for view in self._panels:
+            img = pg.ImageItem()
+            img.setLookupTable(lut)
+            img.setRect(QtCore.QRectF(0.5, 0.5, self._channels, self._channels))
+            img.setZValue(-10)
+            img.hide()
+            self._profile_images.append(img)
+            view.addItem(img)
+
+        # Create the beam width ROIs once, updates only move and resize them
+        roi_pen = pg.mkPen('m', width=2, style=QtCore.Qt.DashLine)
+        self._roi_circles = []
+        for view in self._panels:
+            roi = pg.EllipseROI([0, 0], [1, 1], pen=roi_pen, movable=False, resizable=False)
+            for handle in roi.getHandles():
+                roi.removeHandle(handle)
+            roi.hide()
+            self._roi_circles.append(roi)
+            view.addItem(roi)
 
     def setup_main_tab(self):
         grid_layout=QGridLayout()
         spacer_label=QLabel('')
         frame_cnt_label=QLabel(f'Frame Count')
         frame_cnt_line=PyDMLineEdit(init_channel=f'{self._dataReceiver}.ASIC0FrameCnt')
-        frame_cnt_line.textChanged.connect(self.updatePlots)
+        refresh_label=QLabel(f'Refresh')
+        refresh_stats=QLabel('')
+        update_label=QLabel(f'Update Time')
+        self._update_label=QLabel('')
+        self._update_count = 0
+        self._update_last  = 0.0
+        self._update_max   = 0.0
+        self._update_sum   = 0.0
+        # Redraw at most maxFps times per second, merging the frames in between
+        self._refresh = RefreshScheduler(self.updatePlots, maxFps=self._max_fps, label=refresh_stats, parent=self)
+        frame_cnt_line.textChanged.connect(self._refresh.notify)
         vertical_spacer=QSpacerItem(20, 40, QSizePolicy.Minimum, QSizePolicy.Expanding)
         grid_layout.addWidget(spacer_label,0,0)
         grid_layout.addWidget(frame_cnt_label,1,0)
         grid_layout.addWidget(frame_cnt_line,1,1)
-        grid_layout.addItem(vertical_spacer,2,0)
+        grid_layout.addWidget(refresh_label,2,0)
+        grid_layout.addWidget(refresh_stats,2,1)
+        grid_layout.addWidget(update_label,3,0)
+        grid_layout.addWidget(self._update_label,3,1)
+        reset_button=QPushButton('Reset Beam Profile')
+        reset_button.clicked.connect(self.onClick_resetProfile)
+        grid_layout.addWidget(reset_button,4,0,1,2)
+        grid_layout.addItem(vertical_spacer,5,0)
         self.ui.PyDMTabWidget_main.setLayout(grid_layout)
 
     def setup_config_tab(self):
@@ -185,117 +241,141 @@ class assertGUIBeamGeometry(pydm.Display):
         self.ui.PyDMCheckbox_feature3.clicked.connect(self.onClick_checkFeature3)
 
     def onClick_checkFeature1(self):
-        self.ui.PyDMCheckbox_feature1.setChecked(True)
+        # Clicking the active mode again returns to the beam spot view
         self.ui.PyDMCheckbox_feature2.setChecked(False)
         self.ui.PyDMCheckbox_feature3.setChecked(False)
         self.updatePlots()
 
     def onClick_checkFeature2(self):
+        # Clicking the active mode again returns to the beam spot view
         self.ui.PyDMCheckbox_feature1.setChecked(False)
-        self.ui.PyDMCheckbox_feature2.setChecked(True)
         self.ui.PyDMCheckbox_feature3.setChecked(False)
         self.updatePlots()
 
     def onClick_checkFeature3(self):
+        # Clicking the active mode again returns to the beam spot view
         self.ui.PyDMCheckbox_feature1.setChecked(False)
         self.ui.PyDMCheckbox_feature2.setChecked(False)
-        self.ui.PyDMCheckbox_feature3.setChecked(True)
         self.updatePlots()
 
-    def computeBeamGeometry(self):
-        # Get Rogue ADC counts
-        counts1 = self._root.AsicSampleProcessor.ASIC0Sig.get()
-        counts2 = self._root.AsicSampleProcessor.ASIC1Sig.get()
-        counts3 = self._root.AsicSampleProcessor.ASIC2Sig.get()
-        counts4 = self._root.AsicSampleProcessor.ASIC3Sig.get()
-        counts5 = self._root.AsicSampleProcessor.ASIC4Sig.get()
-        counts6 = self._root.AsicSampleProcessor.ASIC5Sig.get()
-        counts7 = self._root.AsicSampleProcessor.ASIC6Sig.get()
-        counts8 = self._root.AsicSampleProcessor.ASIC7Sig.get()
-
-        # Get indices of strips with the max counts on each sensor plane
-        if len(counts1): max_index_1 = np.argmax(np.array(counts1)) + 1 
-        if len(counts2): max_index_2 = np.argmax(np.array(counts2)) + 1
-        if len(counts3): max_index_3 = np.argmax(np.array(counts3)) + 1
-        if len(counts4): max_index_4 = np.argmax(np.array(counts4)) + 1
-        if len(counts5): max_index_5 = np.argmax(np.array(counts5)) + 1
-        if len(counts6): max_index_6 = np.argmax(np.array(counts6)) + 1
-        if len(counts7): max_index_7 = np.argmax(np.array(counts7)) + 1
-        if len(counts8): max_index_8 = np.argmax(np.array(counts8)) + 1
-
-        ## Update plot items
-        if len(counts1) and len(counts2): self._plot_item_1.setData(x=np.array([max_index_1]), y=np.array([max_index_2]))
-        if len(counts3) and len(counts4): self._plot_item_2.setData(x=np.array([max_index_3]), y=np.array([max_index_4]))
-        if len(counts5) and len(counts6): self._plot_item_3.setData(x=np.array([max_index_5]), y=np.array([max_index_6]))
-        if len(counts7) and len(counts8): self._plot_item_4.setData(x=np.array([max_index_7]), y=np.array([max_index_8]))
-
-        ## Add error bars
-        err = np.full(1,3)
-        if len(counts1) and len(counts2): getattr(self, 'self._error_bars_1').setData(x=np.array([max_index_1]), y=np.array([max_index_2]), top=err, bottom=err)
-        if len(counts3) and len(counts4): getattr(self, 'self._error_bars_2').setData(x=np.array([max_index_3]), y=np.array([max_index_4]), top=err, bottom=err)
-        if len(counts5) and len(counts6): getattr(self, 'self._error_bars_3').setData(x=np.array([max_index_5]), y=np.array([max_index_6]), top=err, bottom=err)
-        if len(counts7) and len(counts8): getattr(self, 'self._error_bars_4').setData(x=np.array([max_index_7]), y=np.array([max_index_8]), top=err, bottom=err)
-
-        # Add beam widths (ROI circles)
-        d = [40, 40]
-        if len(counts1) and len(counts2):
-            if getattr(self, '_roi_circle_1', None) is not None: self.ui.graphicsView_1.removeItem(self._roi_circle_1)
-            self._roi_circle_1 = pg.CircleROI([max_index_1-20,max_index_2-20], d, pen=pg.mkPen('m', width=2, style=QtCore.Qt.DashLine), movable=False, resizable=False) 
-            self.ui.graphicsView_1.addItem(self._roi_circle_1)
-            self._roi_circle_1.aspectLocked = True
-        if len(counts3) and len(counts4): 
-            if getattr(self, '_roi_circle_2', None) is not None: self.ui.graphicsView_2.removeItem(self._roi_circle_2)
-            self._roi_circle_2 = pg.CircleROI([max_index_3-20,max_index_4-20], d, pen=pg.mkPen('m', width=2, style=QtCore.Qt.DashLine), movable=False, resizable=False) 
-            self.ui.graphicsView_2.addItem(self._roi_circle_2)
-            self._roi_circle_2.aspectLocked = True
-        if len(counts5) and len(counts6): 
-            if getattr(self, '_roi_circle_3', None) is not None: self.ui.graphicsView_3.removeItem(self._roi_circle_3)
-            self._roi_circle_3 = pg.CircleROI([max_index_5-20,max_index_6-20], d, pen=pg.mkPen('m', width=2, style=QtCore.Qt.DashLine), movable=False, resizable=False) 
-            self.ui.graphicsView_3.addItem(self._roi_circle_3)
-            self._roi_circle_3.aspectLocked = True
-        if len(counts7) and len(counts8): 
-            if getattr(self, '_roi_circle_4', None) is not None: self.ui.graphicsView_4.removeItem(self._roi_circle_4)
-            self._roi_circle_4 = pg.CircleROI([max_index_7-20,max_index_8-20], d, pen=pg.mkPen('m', width=2, style=QtCore.Qt.DashLine), movable=False, resizable=False) 
-            self.ui.graphicsView_4.addItem(self._roi_circle_4)
-            self._roi_circle_4.aspectLocked = True
-
-        # Set X and Y ranges
-        #self.ui.graphicsView_1.setXRange(0, 70, padding=0)
-        #self.ui.graphicsView_1.setYRange(0, 70, padding=0)
-        #self.ui.graphicsView_2.setXRange(0, 70, padding=0)
-        #self.ui.graphicsView_2.setYRange(0, 70, padding=0)
-        #self.ui.graphicsView_3.setXRange(0, 70, padding=0)
-        #self.ui.graphicsView_3.setYRange(0, 70, padding=0)
-        #self.ui.graphicsView_4.setXRange(0, 70, padding=0)
-        #self.ui.graphicsView_4.setYRange(0, 70, padding=0)
-        for i in np.arange(1,int(self._asics/2)+1):
-            getattr(self.ui, f'graphicsView_{i}').setXRange(0, 70, padding=0) 
-            getattr(self.ui, f'graphicsView_{i}').setYRange(0, 70, padding=0) 
+    def receive_event(self, values, valid, frame):
+        # Queued in order on the worker thread, so no event is skipped between redraws
+        # unless the worker falls behind
+        if self._worker.pending >= self._max_pending:
+            self._dropped += 1
+            return
+        self._worker.post(self.fill_profiles, values, valid)
+
+    def fill_profiles(self, counts, valid):
+        # Runs on the worker thread for every event; the profile accumulators and the
+        # newest beam spot are only touched there, so they need no locking
+        with self._perf.phase('compute'):
+            # Beam position and width on all sensor planes at once
+            profiles = compute_plane_profiles(counts, valid=valid)
+            x, y, pair_valid = pair_planes(profiles, 'mean', self._geometry.x_planes, self._geometry.y_planes)
+            x_width, y_width, _ = pair_planes(profiles, 'sigma', self._geometry.x_planes, self._geometry.y_planes)
+
+            # Fill the beam profiles of all plane pairs
+            self._profile_total.fill(x, y, pair_valid)
+            self._profile_window.fill(x, y, pair_valid)
+            self._latest_event = {'x' : x, 'y' : y, 'valid' : pair_valid, 'x_width' : x_width, 'y_width' : y_width}
+        self._perf.count('events')
+
+    def computeBeamGeometry(self, mode=None):
+        # Runs on the worker thread, after the events queued before it, and returns the
+        # newest beam spot with copies of the accumulated profiles (the accumulators
+        # keep filling while the GUI draws)
+        start = time.perf_counter()
+        if self._latest_event is None:
+            return None
+        with self._perf.phase('fetch'):
+            images = None
+            if mode == 'total':
+                images = self._profile_total.image.copy()
+            elif mode == 'window':
+                images = self._profile_window.image.copy()
+            elif mode == 'drift':
+                images = profile_drift(self._profile_window.image, self._profile_total.image)
+        return dict(self._latest_event, images=images, start=start)
+
+    def drawBeamGeometry(self, result):
+        if result is None:
+            return
+        x, y, pair_valid = result['x'], result['y'], result['valid']
+        x_width, y_width = result['x_width'], result['y_width']
+        with self._perf.phase('render'):
+            for i in np.arange(1,len(self._panels)+1):
+                if not pair_valid[i-1]:
+                    # No beam spot on this pair in the newest event, clear the old one
+                    # so it is not taken for live data
+                    empty = np.zeros(0)
+                    self._plot_items[i-1].setData(x=empty, y=empty)
+                    self._error_bars[i-1].setData(x=empty, y=empty, left=empty, right=empty, top=empty, bottom=empty)
+                    self._roi_circles[i-1].hide()
+                    continue
+
+                ## Update plot items
+                self._plot_items[i-1].setData(x=x[i-1:i], y=y[i-1:i])
+
+                ## Add error bars from the measured widths
+                self._error_bars[i-1].setData(x=x[i-1:i], y=y[i-1:i], left=x_width[i-1:i], right=x_width[i-1:i], top=y_width[i-1:i], bottom=y_width[i-1:i])
+
+                # Move the beam width ROI (ellipse spanning the FWHM) in place
+                d = [2.355*x_width[i-1], 2.355*y_width[i-1]]
+                roi = self._roi_circles[i-1]
+                roi.setPos([x[i-1]-d[0]/2,y[i-1]-d[1]/2], update=False, finish=False)
+                roi.setSize(d, finish=False)
+                roi.show()
+
+        self.show_profiles(result['images'])
+        self.record_update_time(time.perf_counter() - result['start'])
+        self._perf.frame()
+
+    def profile_mode(self):
+        # Depending on the configuration, show the accumulated beam profiles
+        if self.ui.PyDMCheckbox_feature1.isChecked():
+            # Beam profile since the last reset
+            return 'total'
+        elif self.ui.PyDMCheckbox_feature2.isChecked():
+            # Beam profile fading over the last profileWindow frames
+            return 'window'
+        elif self.ui.PyDMCheckbox_feature3.isChecked():
+            # Recent beam profile against the one since the last reset
+            return 'drift'
+        return None
 
     def updatePlots(self):
         #print('Update the plots ...\n')
 
-        # Read current plot settings and update plots
-        feature1_checkbox = self.ui.PyDMCheckbox_feature1
-        feature2_checkbox = self.ui.PyDMCheckbox_feature2
-        feature3_checkbox = self.ui.PyDMCheckbox_feature3
-
-        # Depending on the configuration, update the curves with the appropriate counts
-        if feature1_checkbox.isChecked():
-            # Add labels, legend and update photon plots
-            #self.update_asic_photons()
-            pass
-        elif feature2_checkbox.isChecked():
-            # Add labels, legend and update electron plots
-            #self.update_asic_electrons()
-            pass
-        elif feature3_checkbox.isChecked():
-            # Add labels, legend and update LET plots
-            #self.update_asic_LET()
-            pass
-        else:
-            self.computeBeamGeometry()
-            pass
+        # Fetch and compute on the worker thread, a newer update replaces one that
+        # has not been drawn yet
+        self._worker.submit('beam', self.computeBeamGeometry, self.profile_mode(), callback=self.drawBeamGeometry)
+
+    def show_profiles(self, images):
+        # Timed apart from the beam spot rendering, the image upload dominates when shown
+        with self._perf.phase('profiles'):
+            for i, img in enumerate(self._profile_images):
+                if images is None:
+                    img.hide()
+                else:
+                    img.setImage(images[i], autoLevels=True)
+                    img.show()
+
+    def onClick_resetProfile(self):
+        self._worker.post(self.reset_profiles)
+        self.updatePlots()
+
+    def reset_profiles(self):
+        self._profile_total.reset()
+        self._profile_window.reset()
+
+    def record_update_time(self, elapsed):
+        # Keep track of the per-frame update cost
+        self._update_count += 1
+        self._update_last = elapsed
+        self._update_max  = max(self._update_max, elapsed)
+        self._update_sum += elapsed
+        self._update_label.setText(f'{1e3*self._update_last:.2f} ms (mean {1e3*self._update_sum/self._update_count:.2f}, max {1e3*self._update_max:.2f})')
 
     def ui_filename(self):
         # Point to the UI file
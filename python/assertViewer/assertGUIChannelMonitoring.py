@@ -7,6 +7,8 @@
 import os
 import pydm
 import numpy as np
+from functools import partial
+from pydm import PyDMChannel
 import pyqtgraph as pg
 from pydm.widgets import PyDMLineEdit, PyDMLabel, PyDMImageView
 from qtpy.QtWidgets import QWidget, QLabel, QGridLayout, QVBoxLayout, QSpacerItem, QSizePolicy
@@ -14,8 +16,19 @@ from qtpy.QtWidgets import QWidget, QLabel, QGridLayout, QVBoxLayout, QSpacerIte
 import rogue
 import pyrogue as pr
 
-def runChannelDisplay(dataReceiver,serverList='localhost:9090',port='9090',root=None,
-                   title=None,sizeX=800,sizeY=1000,maxListExpand=5,maxListSize=100):
+from assertViewer.assertWorker import BackgroundWorker
+from assertViewer.assertInstrumentation import Instrumentation, InstrumentationReporter
+from assertViewer.assertStartup import report_on_event_loop
+from assertViewer.assertConnection import rogue_connection, close_connections
+from assertViewer.assertPlotting import LocalCurve
+from assertViewer.assertPanels import sensor_panels, image_panel
+from assertViewer.assertGeometry import geometry_from_macros
+from assertViewer.assertHistogram import ChannelHistory, DEFAULT_BINS, valid_bins
+
+def runChannelDisplay(dataReceiver,serverList='localhost:9090',geometry=None,port='9090',root=None,
+                   title=None,sizeX=800,sizeY=1000,maxListExpand=5,maxListSize=100,
+                   historyDepth=1000,historyMemory=256,maxFps=10,
+                   showStats=False,statsLog=None,statsInterval=1.0):
 
     #pyrogue.pydm.runPyDM()
 
@@ -42,17 +55,27 @@ def runChannelDisplay(dataReceiver,serverList='localhost:9090',port='9090',root=
 
     macrosA = {}
     macrosA['dataReceiver'] = dataReceiver
+    macrosA['geometry'] = geometry
     macrosA['title'] = title
     macrosA['sizeX'] = sizeX
     macrosA['sizeY'] = sizeY
     macrosA['port' ] = port
+    macrosA['serverList'] = os.getenv('ROGUE_SERVERS')
+    macrosA['historyDepth' ] = historyDepth
+    macrosA['historyMemory'] = historyMemory
+    macrosA['maxFps'] = maxFps
+    macrosA['showStats'] = showStats
+    macrosA['statsLog'] = statsLog
+    macrosA['statsInterval'] = statsInterval
     app = pydm.PyDMApplication(ui_file=ui,
                                command_line_args=args,
                                macros=macrosA,
                                hide_nav_bar=True,
                                hide_menu_bar=True,
                                hide_status_bar=True)
+    report_on_event_loop(title)
     app.exec()
+    close_connections()
 
 class assertGUIChannelMonitoring(pydm.Display):
     def __init__(self, parent=None, args=None, macros=None):
@@ -61,57 +84,152 @@ class assertGUIChannelMonitoring(pydm.Display):
         #print(f'{macros=}')
         self.sizeX = macros['sizeX']
         self.sizeY = macros['sizeY']
-        self._asics = 8
-        self._frames = 32
-        self._channels = 64
+        self._geometry = geometry_from_macros(macros)
+        self._asics = self._geometry.asics
+        self._frames = self._geometry.frames
+        self._channels = self._geometry.channels
+        # One image panel per ASIC, built from the geometry
+        self._panels = sensor_panels(self.ui, 'PyDMImageView_', self._asics, image_panel, name='PyDMImageView',
+                                     caption=lambda i: f'Sensor Plane {i} - Y: Channels, X: Memory Frames')
         self._port = macros['port']
+        self._serverList = macros.get('serverList', None)
+        self._max_fps = macros.get('maxFps', 10)
+        self._show_stats = macros.get('showStats', False)
+        self._stats_log  = macros.get('statsLog', None)
+        self._stats_interval = float(macros.get('statsInterval', 1.0))
+        self._perf = Instrumentation(name='channel')
+        self._history_depth  = int(macros.get('historyDepth', 1000))
+        self._history_memory = macros.get('historyMemory', 256)
         self.connect_rogue_root()
+        self._worker = BackgroundWorker('channel', parent=self)
+        self._history_worker = BackgroundWorker('channel-history', parent=self)
+        self.init_history()
+        self.init_local_curves()
         self.init_colorbar()
         self.init_crosshair()
         self.setup_main_tab()
         self.set_image_channels()
         self.enable_mouse_cursor()
+        self.setup_instrumentation()
         
     def connect_rogue_root(self):
-        with pr.interfaces.VirtualClient(addr="localhost",port=int(self._port)) as client:
-        
-           # Get the reference to the root node
-           self._root = client.root
-        
-           # Get a variable value with a read, this returns the native value
-           ret = self._root.RogueVersion.get()
-           #print(f"Version = {ret}")
+        # Shared, persistent client of the server listening on <port>; the root is
+        # rebound if the connection has to be re-established
+        self._connection = rogue_connection(self._serverList, self._port)
+        self._root = self._connection.root
+        self._connection.add_listener(self.rogue_link_changed)
+        self.check_server_slicing()
+
+        # Get a variable value with a read, this returns the native value
+        ret = self._root.RogueVersion.get()
+        #print(f"Version = {ret}")
+
+    def rogue_link_changed(self, root, linked):
+        if root is not None:
+            self._root = root
+            self.check_server_slicing()
+
+    def check_server_slicing(self):
+        # Only servers with the MemFrameHistSlice command (so far the AsicSampleProcessor
+        # emulator of assertSampleProcessor.py) can return a single channel trace. Any
+        # other server sends the full history cube on every drill-down that the local
+        # history cannot answer, so the saving of the slice needs that server support.
+        self._server_slicing = hasattr(self._root.AsicSampleProcessor, 'MemFrameHistSlice')
+
+    def init_history(self):
+        # Local MemFrame history of every ASIC and its histograms, filled from the
+        # MemFrame updates so drill-down queries never go back to the server.
+        # The memory budget (MB) is shared between all ASICs.
+        budget = None
+        if self._history_memory is not None:
+            budget = float(self._history_memory) * 1024 * 1024
+        bins = (self._root.AsicSampleProcessor.BinsStart.get(),
+                self._root.AsicSampleProcessor.BinsStop.get(),
+                self._root.AsicSampleProcessor.NumBins.get())
+        if not valid_bins(*bins):
+            # A misconfigured server must not keep the display from starting
+            print(f"Unusable histogram binning {bins} on the server, using {DEFAULT_BINS}")
+            bins = DEFAULT_BINS
+        self._history = ChannelHistory(asics=self._asics, channels=self._channels, frames=self._frames,
+                                       depth=self._history_depth, budget=budget, binsStart=bins[0],
+                                       binsStop=bins[1], numBins=bins[2])
+        # Start from the deeper history the server already holds, so the drill-down
+        # covers it right after launch; live frames are appended to it
+        for i in range(self._asics):
+            frames = getattr(self._root.AsicSampleProcessor, f'ASIC{i}MemFrameHist').get()
+            if frames is not None and np.size(frames):
+                self._history.seed(i, np.asarray(frames).reshape(-1, self._channels, self._frames))
+        self._history_channels = []
+        # MemFrames are ingested on their own worker, so a slow drill-down never holds
+        # them up. At most a few events per ASIC wait, further frames are dropped and
+        # counted.
+        self._max_pending = 4 * self._asics
+        self._dropped     = 0
+        for i in np.arange(self._asics):
+            channel = PyDMChannel(address=f'{self._dataReceiver}.ASIC{i}MemFrame', value_slot=partial(self.receive_mem_frame, i))
+            channel.connect()
+            self._history_channels.append(channel)
+
+    def receive_mem_frame(self, asic, value):
+        # The history and the histograms are only written on the history worker thread
+        if self._history_worker.pending >= self._max_pending:
+            self._dropped += 1
+            return
+        self._history_worker.post(self.ingest_mem_frame, asic, value)
+
+    def ingest_mem_frame(self, asic, value):
+        frame = np.asarray(value).reshape(self._channels, self._frames)
+        with self._perf.phase('compute'):
+            self._history.append(asic, frame)
+        self._perf.count('memframes')
+        if asic == self._asics-1:
+            self._perf.frame()
+
+    def setup_instrumentation(self):
+        # Phase timings as an optional on-screen overlay and/or a periodic log
+        self._perf_reporter = InstrumentationReporter(self._perf, self, show=self._show_stats, path=self._stats_log,
+                                                      interval=self._stats_interval,
+                                                      gauges={'history' : lambda: self._history.entries(0),
+                                                              'ingest'  : lambda: self._history_worker.pending,
+                                                              'dropped' : lambda: self._dropped,
+                                                              'worker'  : lambda: self._worker.pending,
+                                                              'stale'   : lambda: self._worker.stale + self._worker.skipped})
+
+    def init_local_curves(self):
+        # Drill-down plots are drawn straight from local arrays, so clicks from
+        # several operators no longer overwrite each other's server variables
+        self._timeplot_curve     = LocalCurve(self.ui.PyDMWaveformPlot_1, yAxisName='ADC Counts')
+        self._histogram_curve    = LocalCurve(self.ui.PyDMWaveformPlot_2, yAxisName='Frequencies')
+        self._all_channels_curve = LocalCurve(self.ui.PyDMWaveformPlot_3, yAxisName='ADC Counts')
 
     def init_colorbar(self):
-        for i in np.arange(1,self._asics+1):
-            setattr(self, f'self.img_item_{i}', getattr(self.ui, f'PyDMImageView_{i}').getImageItem())
-            setattr(self, f'self.colorbar_{i}', getattr(self.ui, f'PyDMImageView_{i}').getView().addColorBar(getattr(self,f'self.img_item_{i}'),colorMap='inferno',values=(int(self.ui.PyDMLineEdit_2.text()), int(self.ui.PyDMLineEdit_3.text())),label='ADC Counts'))
+        self._img_items = []
+        self._colorbars = []
+        for view in self._panels:
+            self._img_items.append(view.getImageItem())
+            self._colorbars.append(view.getView().addColorBar(self._img_items[-1],colorMap='inferno',values=(int(self.ui.PyDMLineEdit_2.text()), int(self.ui.PyDMLineEdit_3.text())),label='ADC Counts'))
 
     def init_crosshair(self):
-        for i in np.arange(1,self._asics+1):
-            v_name = f'_v_line_img{i}'
-            h_name = f'_h_line_img{i}'
-            v_val  = pg.InfiniteLine(angle=90, movable=False, pen='g')
-            h_val  = pg.InfiniteLine(angle=0,  movable=False, pen='g')
-            setattr(self, v_name, v_val)
-            setattr(self, h_name, h_val)
-
-        for i in np.arange(1,self._asics+1):
-            getattr(self.ui, f'PyDMImageView_{i}').getView().addItem(getattr(self, f'_v_line_img{i}'), ignoreBounds=False)
-            getattr(self.ui, f'PyDMImageView_{i}').getView().addItem(getattr(self, f'_h_line_img{i}'), ignoreBounds=False)
+        self._v_lines = []
+        self._h_lines = []
+        for view in self._panels:
+            self._v_lines.append(pg.InfiniteLine(angle=90, movable=False, pen='g'))
+            self._h_lines.append(pg.InfiniteLine(angle=0,  movable=False, pen='g'))
+            view.getView().addItem(self._v_lines[-1], ignoreBounds=False)
+            view.getView().addItem(self._h_lines[-1], ignoreBounds=False)
         
         self.clear_crosshair()
 
     def clear_crosshair(self):
-        for i in np.arange(1,self._asics+1):
-            getattr(self, f'_v_line_img{i}').hide()
-            getattr(self, f'_h_line_img{i}').hide()
+        for v_line, h_line in zip(self._v_lines, self._h_lines):
+            v_line.hide()
+            h_line.hide()
 
     def update_crosshair(self, x, y, sensor=1):
-        getattr(self, f'_v_line_img{sensor}').setPos(x)
-        getattr(self, f'_h_line_img{sensor}').setPos(y)
-        getattr(self, f'_v_line_img{sensor}').show()
-        getattr(self, f'_h_line_img{sensor}').show()
+        self._v_lines[sensor-1].setPos(x)
+        self._h_lines[sensor-1].setPos(y)
+        self._v_lines[sensor-1].show()
+        self._h_lines[sensor-1].show()
 
     def setup_main_tab(self):
         self.ui.PyDMLineEdit_1.setChannel(f'{self._dataReceiver}.ASIC0FrameCnt')
@@ -148,8 +266,11 @@ class assertGUIChannelMonitoring(pydm.Display):
         #self.ui.PyDMImageView_7.setImageChannel(f"{self._dataReceiver}.ASIC6Image")
         #self.ui.PyDMImageView_8.setImageChannel(f"{self._dataReceiver}.ASIC7Image")
         self.updateColorMapLimits()
-        for i in np.arange(1,self._asics+1):
-            getattr(self.ui, f'PyDMImageView_{i}').setImageChannel(f'{self._dataReceiver}.ASIC{i-1}MemFrame')
+        for i, view in enumerate(self._panels, 1):
+            # The image views coalesce frames themselves, cap them at the display refresh rate
+            if self._max_fps:
+                view.maxRedrawRate = int(self._max_fps)
+            view.setImageChannel(f'{self._dataReceiver}.ASIC{i-1}MemFrame')
 
         #self.ui.pushButton.clicked.connect(self.updateDisplay)
 
@@ -163,8 +284,8 @@ class assertGUIChannelMonitoring(pydm.Display):
         #self.ui.PyDMImageView_6.scene.sigMouseClicked.connect(self.clickProcessImage6)
         #self.ui.PyDMImageView_7.scene.sigMouseClicked.connect(self.clickProcessImage7)
         #self.ui.PyDMImageView_8.scene.sigMouseClicked.connect(self.clickProcessImage8)
-        for i in np.arange(1,self._asics+1):
-            getattr(self.ui, f'PyDMImageView_{i}').scene.sigMouseClicked.connect(getattr(self, f'clickProcessImage{i}'))
+        for i, view in enumerate(self._panels, 1):
+            view.scene.sigMouseClicked.connect(partial(self.clickProcessImage, i))
 
     def updateColorMapLimits(self):
         #minContrast = int(self.ui.PyDMLineEdit_2.displayText())
@@ -180,12 +301,11 @@ class assertGUIChannelMonitoring(pydm.Display):
         #self.ui.PyDMImageView_7.setColorMapLimits(minContrast, maxContrast)
         #self.ui.PyDMImageView_8.setColorMapLimits(minContrast, maxContrast)
 
-        for i in np.arange(1,self._asics+1):
-            getattr(self.ui, f'PyDMImageView_{i}').setColorMapLimits(minContrast, maxContrast)
+        for view in self._panels:
+            view.setColorMapLimits(minContrast, maxContrast)
 
-        for i in np.arange(1,self._asics+1):
-            #getattr(self, f'self.colorbar_{i}').setLevels(values=(int(self.ui.PyDMLineEdit_4.text()), int(self.ui.PyDMLineEdit_5.text())))
-            getattr(self, f'self.colorbar_{i}').setLevels(values=(minContrast, maxContrast))
+        for colorbar in self._colorbars:
+            colorbar.setLevels(values=(minContrast, maxContrast))
 
     def updateDisplay(self):
         #self.ui.PyDMImageView_1.redrawImage()
@@ -197,43 +317,15 @@ class assertGUIChannelMonitoring(pydm.Display):
         #self.ui.PyDMImageView_7.redrawImage()
         #self.ui.PyDMImageView_8.redrawImage()
         self.updateColorMapLimits()
-        for i in np.arange(1,self._asics+1):
-            getattr(self.ui, f'PyDMImageView_{i}').redrawImage()
+        for view in self._panels:
+            view.redrawImage()
 
     # def setTimeSpan(self):
     #     self.ui.PyDMTimePlot.setTimeSpan(int(self.ui.lineEdit.text()))
 
-    def clickProcessImage1(self, event):
-        pos = self.ui.PyDMImageView_1.getView().getViewBox().mapSceneToView(event.scenePos())
-        self.perform_error_checking(pos, 1)
-
-    def clickProcessImage2(self, event):
-        pos = self.ui.PyDMImageView_2.getView().getViewBox().mapSceneToView(event.scenePos())
-        self.perform_error_checking(pos, 2)
-
-    def clickProcessImage3(self, event):
-        pos = self.ui.PyDMImageView_3.getView().getViewBox().mapSceneToView(event.scenePos())
-        self.perform_error_checking(pos, 3)
-
-    def clickProcessImage4(self, event):
-        pos = self.ui.PyDMImageView_4.getView().getViewBox().mapSceneToView(event.scenePos())
-        self.perform_error_checking(pos, 4)
-
-    def clickProcessImage5(self, event):
-        pos = self.ui.PyDMImageView_5.getView().getViewBox().mapSceneToView(event.scenePos())
-        self.perform_error_checking(pos, 5)
-
-    def clickProcessImage6(self, event):
-        pos = self.ui.PyDMImageView_6.getView().getViewBox().mapSceneToView(event.scenePos())
-        self.perform_error_checking(pos, 6)
-
-    def clickProcessImage7(self, event):
-        pos = self.ui.PyDMImageView_7.getView().getViewBox().mapSceneToView(event.scenePos())
-        self.perform_error_checking(pos, 7)
-
-    def clickProcessImage8(self, event):
-        pos = self.ui.PyDMImageView_8.getView().getViewBox().mapSceneToView(event.scenePos())
-        self.perform_error_checking(pos, 8)
+    def clickProcessImage(self, sensor, event):
+        pos = self._panels[sensor-1].getView().getViewBox().mapSceneToView(event.scenePos())
+        self.perform_error_checking(pos, sensor)
 
     def perform_error_checking(self, pos, sensor):
         if int(pos.x()) >= self._frames:
@@ -257,52 +349,114 @@ class assertGUIChannelMonitoring(pydm.Display):
         self.ui.PyDMLineEdit_6.setText(str(y))
         self.ui.PyDMLineEdit_7.setText(str(sensor))
         
-        self.update_channel_timeplot(x,y,sensor)
-        self.update_channel_histogram(x,y,sensor)
-        self.update_all_channels_plot(x,sensor)
-
-    def update_channel_timeplot(self, frame, channel, sensor):
+        # Fetch and compute on the worker thread; a click on another channel before
+        # the result is back makes this request stale, only the newest one is drawn
+        self._worker.submit('drilldown', self.fetch_drilldown, x, y, sensor, callback=self.show_drilldown)
+
+    def fetch_drilldown(self, frame, channel, sensor):
+        # Runs on the worker thread, returns the plot-ready arrays of the drill-down plots
+        # Fetch the channel trace once and share it between the timeplot and the histogram
+        with self._perf.phase('fetch'):
+            trace = self.fetch_channel_trace(frame, channel, sensor)
+        histogram = self.compute_channel_histogram(frame, channel, sensor, trace=trace)
+        with self._perf.phase('fetch'):
+            all_channels = self.fetch_all_channels(frame, sensor)
+        return {'trace' : np.array(trace), 'histogram' : histogram, 'all_channels' : all_channels}
+
+    def show_drilldown(self, result):
+        self.update_channel_timeplot(result['trace'])
+        self.update_channel_histogram(*result['histogram'])
+        self.update_all_channels_plot(result['all_channels'])
+
+    def fetch_channel_trace(self, frame, channel, sensor):
+        # Answer from the local history when it has been filled
+        trace = self._history.trace(sensor-1, channel, frame)
+        if trace is not None:
+            return trace
+
+        # Ask the server for the [:, channel, frame] column of the history only,
+        # so the transfer size does not grow with the number of channels and frames
+        if self._server_slicing:
+            return np.asarray(self._root.AsicSampleProcessor.MemFrameHistSlice([sensor-1, channel, frame]))
+
+        # Servers without the slice command: transfer the full history cube
         asic_vals = getattr(self._root.AsicSampleProcessor, f'ASIC{sensor-1}MemFrameHist').get()
-        #timeplot  = asic_vals[:,channel,frame][::-1]
-        timeplot  = asic_vals[:,channel,frame]
-        #print(timeplot) 
-        self._root.AsicSampleProcessor.MemFrameOverTime.set(timeplot, write = True)
-        #print(self._root.AsicSampleProcessor.MemFrameOverTime.get())
-        self.ui.PyDMWaveformPlot_1.clearCurves()
-        self.ui.PyDMWaveformPlot_1.addChannel(y_channel = f'{self._dataReceiver}.MemFrameOverTime',plot_style = "Line",color = "orange",lineWidth = 3,yAxisName = "ADC Counts")
+        #return asic_vals[:,channel,frame][::-1]
+        return np.asarray(asic_vals)[:,channel,frame]
+
+    def compute_channel_histogram(self, frame, channel, sensor, trace=None):
+        # The histogram engine already holds this row once the local history is filled
+        with self._perf.phase('compute'):
+            histogram = self._history.histogram(sensor-1, channel, frame)
+        if histogram is not None:
+            return histogram
 
-    def update_channel_histogram(self, frame, channel, sensor):
         bin_start = self._root.AsicSampleProcessor.BinsStart.get()
         bin_stop  = self._root.AsicSampleProcessor.BinsStop.get()
         num_bins  = self._root.AsicSampleProcessor.NumBins.get()
         #vals = getattr(self._root.AsicSampleProcessor, f'ASIC{sensor-1}CntHist{channel}').get()
-        asic_vals = getattr(self._root.AsicSampleProcessor, f'ASIC{sensor-1}MemFrameHist').get()
-        #vals  = asic_vals[:,channel,frame][::-1]
-        vals  = asic_vals[:,channel,frame]
-        y, x = np.histogram(vals, bins=np.linspace(bin_start, bin_stop, num_bins))
-        self._root.AsicSampleProcessor.Bins.set(x, write = True)
-        self._root.AsicSampleProcessor.Frequencies.set(y, write = True)
-        self.ui.PyDMWaveformPlot_2.clearCurves()
-        self.ui.PyDMWaveformPlot_2.addChannel(y_channel = f'{self._dataReceiver}.Frequencies',x_channel = f'{self._dataReceiver}.Bins',plot_style = "Line",color = "orange",lineWidth = 3,yAxisName = "Frequencies") 
-
-    def update_all_channels_plot(self, frame, sensor):
+        if trace is None:
+            trace = self.fetch_channel_trace(frame, channel, sensor)
+        vals  = trace
+        with self._perf.phase('compute'):
+            return np.histogram(vals, bins=np.linspace(bin_start, bin_stop, num_bins))
+
+    def fetch_all_channels(self, frame, sensor):
+        asic_vals = self._history.latest(sensor-1)
+        if asic_vals is not None:
+            return asic_vals[:,frame]
         asic_vals = getattr(self._root.AsicSampleProcessor, f'ASIC{sensor-1}MemFrame').get()
-        all_channels  = asic_vals[:,frame]
+        return np.array(np.asarray(asic_vals)[:,frame])
+
+    def update_channel_timeplot(self, trace):
+        timeplot  = trace
+        #print(timeplot) 
+        with self._perf.phase('render'):
+            self._timeplot_curve.setData(timeplot)
+
+    def update_channel_histogram(self, y, x):
+        with self._perf.phase('render'):
+            self._histogram_curve.setHistogram(y, x)
+
+    def update_all_channels_plot(self, all_channels):
         #print(all_channels)
-        self._root.AsicSampleProcessor.MemFrameAllChannels.set(all_channels, write = True)
-        self.ui.PyDMWaveformPlot_3.clearCurves()
-        #self.ui.PyDMWaveformPlot_3.addChannel(y_channel = f'{self._dataReceiver}.MemFrameAllChannels',x_channel = f'{self._dataReceiver}.IndexChannels',plot_style = "Line",color = "orange",lineWidth = 3,yAxisName = "ADC Counts") 
-        self.ui.PyDMWaveformPlot_3.addChannel(y_channel = f'{self._dataReceiver}.MemFrameAllChannels',plot_style = "Line",color = "orange",lineWidth = 3,yAxisName = "ADC Counts") 
+        with self._perf.phase('render'):
+            self._all_channels_curve.setData(all_channels)
 
     def update_histogram_params(self):
-        bin_start = int(self.ui.PyDMLineEdit_11.text())
-        bin_stop  = int(self.ui.PyDMLineEdit_12.text())
-        num_bins  = int(self.ui.PyDMLineEdit_13.text())
+        # A range that is being typed or is unusable is marked on the line edits and
+        # neither written to the server nor applied to the local histograms
+        edits = (self.ui.PyDMLineEdit_11, self.ui.PyDMLineEdit_12, self.ui.PyDMLineEdit_13)
+        try:
+            bin_start, bin_stop, num_bins = (int(edit.text()) for edit in edits)
+        except ValueError:
+            bin_start, bin_stop, num_bins = None, None, None
+        ok = valid_bins(bin_start, bin_stop, num_bins)
+        for edit in edits:
+            edit.setStyleSheet('' if ok else 'border: 2px solid red')
+            edit.setToolTip('' if ok else 'Expected Bins Start < Bins Stop and at least 2 bins')
+        if not ok:
+            return
+        # The server writes and the rebinning of the history run on the drill-down
+        # worker thread, followed by a fresh drill-down
+        self._worker.post(self.apply_histogram_params, bin_start, bin_stop, num_bins)
+        self._worker.submit('drilldown', self.fetch_drilldown, int(self.ui.PyDMLineEdit_14.text()), int(self.ui.PyDMLineEdit_6.text()),
+                            int(self.ui.PyDMLineEdit_7.text()), callback=self.show_drilldown)
+
+    def apply_histogram_params(self, bin_start, bin_stop, num_bins):
+        self._history.set_bins(bin_start, bin_stop, num_bins)
         self._root.AsicSampleProcessor.BinsStart.set(bin_start, write = True)
         self._root.AsicSampleProcessor.BinsStop.set(bin_stop, write = True)
         self._root.AsicSampleProcessor.NumBins.set(num_bins, write = True)
-        self.update_channel_histogram(int(self.ui.PyDMLineEdit_14.text()),int(self.ui.PyDMLineEdit_6.text()),int(self.ui.PyDMLineEdit_7.text()))
  
+    def pedestal_map(self, sensor):
+        # Mean of every (channel, frame) cell over the local history (worker thread)
+        return self._history.mean(sensor-1)
+
+    def noise_map(self, sensor):
+        # RMS of every (channel, frame) cell over the local history (worker thread)
+        return self._history.rms(sensor-1)
+
     def ui_filename(self):
         # Point to the UI file
         return 'ui/assertViewerPyDM_StripMonitoring.ui'
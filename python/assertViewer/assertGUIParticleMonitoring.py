@@ -9,14 +9,26 @@ import time
 import pydm
 import numpy as np
 from pydm.widgets import PyDMLineEdit, PyDMLabel
-from qtpy.QtWidgets import QWidget, QLabel, QGridLayout, QVBoxLayout, QSpacerItem, QSizePolicy
+from qtpy.QtWidgets import QWidget, QLabel, QGridLayout, QVBoxLayout, QSpacerItem, QSizePolicy, QComboBox, QCheckBox, QPushButton, QFileDialog
+
+from assertViewer.assertRefresh import RefreshScheduler
+from assertViewer.assertWorker import BackgroundWorker
+from assertViewer.assertInstrumentation import Instrumentation, InstrumentationReporter
+from assertViewer.assertStartup import report_on_event_loop
+from assertViewer.assertConnection import rogue_connection, close_connections
+from assertViewer.assertSignalCache import shared_signal_cache
+from assertViewer.assertGeometry import geometry_from_macros
+from assertViewer.assertPanels import sensor_panels, plot_panel
+from assertViewer.assertParticles import ParticleCalibration, ParticleResultCache, ParticleAccumulator
 
 import rogue
 import pyrogue as pr
 import pyqtgraph as pg
 
-def runParticleDisplay(dataReceiver,serverList='localhost:9090',port='9090',root=None,
-                   title=None,sizeX=800,sizeY=1000,maxListExpand=5,maxListSize=100):
+def runParticleDisplay(dataReceiver,serverList='localhost:9090',geometry=None,port='9090',root=None,
+                   title=None,sizeX=800,sizeY=1000,maxListExpand=5,maxListSize=100,maxFps=10,
+                   calibration=None,accumulateFrames=100,accumulateSeconds=10.0,
+                   showStats=False,statsLog=None,statsInterval=1.0):
 
     #pyrogue.pydm.runPyDM()
 
@@ -43,133 +55,171 @@ def runParticleDisplay(dataReceiver,serverList='localhost:9090',port='9090',root
 
     macrosA = {}
     macrosA['dataReceiver'] = dataReceiver
+    macrosA['geometry'] = geometry
     macrosA['title'] = title
     macrosA['sizeX'] = sizeX
     macrosA['sizeY'] = sizeY
     macrosA['port']  = port
+    macrosA['serverList'] = os.getenv('ROGUE_SERVERS')
+    macrosA['maxFps'] = maxFps
+    macrosA['showStats'] = showStats
+    macrosA['statsLog'] = statsLog
+    macrosA['statsInterval'] = statsInterval
+    macrosA['calibration'] = calibration
+    macrosA['accumulateFrames']  = accumulateFrames
+    macrosA['accumulateSeconds'] = accumulateSeconds
     app = pydm.PyDMApplication(ui_file=ui,
                                command_line_args=args,
                                macros=macrosA,
                                hide_nav_bar=True,
                                hide_menu_bar=True,
                                hide_status_bar=True)
+    report_on_event_loop(title)
     app.exec()
+    close_connections()
 
 class assertGUIParticleMonitoring(pydm.Display):
     def __init__(self, parent=None, args=None, macros=None):
         super().__init__(parent=parent, args=args, macros=macros)
         # print(f'{macros=}')
-        self._asics = 8
+        self._geometry = geometry_from_macros(macros)
+        self._asics = self._geometry.asics
+        self._channels = self._geometry.channels
         self._port = macros['port']
+        self._serverList = macros.get('serverList', None)
         self._dataReceiver = macros['dataReceiver']
         self.sizeX = macros['sizeX']
         self.sizeY = macros['sizeY']
+        self._max_fps = macros.get('maxFps', 10)
+        self._show_stats = macros.get('showStats', False)
+        self._stats_log  = macros.get('statsLog', None)
+        self._stats_interval = float(macros.get('statsInterval', 1.0))
+        self._perf = Instrumentation(name='particle')
+        self.load_calibration(macros.get('calibration', None))
+        self._accumulate_frames  = int(macros.get('accumulateFrames', 100))
+        self._accumulate_seconds = float(macros.get('accumulateSeconds', 10.0))
+        self._worker = BackgroundWorker('particle', parent=self)
         self.setup_plots()
         self.setup_main_tab()
         self.setup_config_tab()
         self.connect_rogue_root()
+        self.setup_signals()
+        self.setup_instrumentation()
         
     def connect_rogue_root(self):
-        with pr.interfaces.VirtualClient(addr="localhost",port=int(self._port)) as client:
-        
-           # Get the reference to the root node
-           self._root = client.root
-        
-           # Get a variable value with a read, this returns the native value
-           ret = self._root.RogueVersion.get()
-           print(f"Version = {ret}")
+        # Shared, persistent client of the server listening on <port>; the root is
+        # rebound if the connection has to be re-established
+        self._connection = rogue_connection(self._serverList, self._port)
+        self._root = self._connection.root
+        self._connection.add_listener(self.rogue_link_changed)
+
+        # Get a variable value with a read, this returns the native value
+        ret = self._root.RogueVersion.get()
+        print(f"Version = {ret}")
+
+    def rogue_link_changed(self, root, linked):
+        if root is not None:
+            self._root = root
+
+    def load_calibration(self, path):
+        # Per channel gain/pedestal/noise tables, unit gain and no pedestal without a file
+        if path:
+            self._calibration = ParticleCalibration.load(path)
+        else:
+            self._calibration = ParticleCalibration(asics=self._asics, channels=self._channels)
+
+    def setup_signals(self):
+        # All ASIC signal arrays are pushed to a local cache instead of 8 gets per update,
+        # shared with the other displays of the process
+        self._signals = shared_signal_cache(self._dataReceiver, asics=self._asics, channels=self._channels, variable='Sig')
+        self._results = ParticleResultCache(asics=self._asics, channels=self._channels)
+        self._accumulator = ParticleAccumulator(asics=self._asics, channels=self._channels,
+                                                frames=self._accumulate_frames, seconds=self._accumulate_seconds)
+        # Every complete event is converted and accumulated on the worker thread, at the
+        # DAQ rate; a redraw only reads the cached results. At most a few events wait for
+        # the worker, further events are dropped and counted so a DAQ rate above what
+        # the worker handles does not build up a backlog.
+        self._max_pending = 8
+        self._dropped     = 0
+        self._signals.add_listener(eventCallback=self.receive_event)
        
+    def setup_instrumentation(self):
+        # Phase timings as an optional on-screen overlay and/or a periodic log
+        self._perf_reporter = InstrumentationReporter(self._perf, self, show=self._show_stats, path=self._stats_log,
+                                                      interval=self._stats_interval,
+                                                      gauges={'queue'  : lambda: self._refresh.pending,
+                                                              'merged' : lambda: self._refresh.frames_merged,
+                                                              'worker' : lambda: self._worker.pending,
+                                                              'dropped': lambda: self._dropped,
+                                                              'stale'  : lambda: self._worker.stale + self._worker.skipped})
+
     def setup_plots(self):
-        # Add legends
-        self.ui.graphicsView_1.addLegend()
-        self.ui.graphicsView_2.addLegend()
-        self.ui.graphicsView_3.addLegend()
-        self.ui.graphicsView_4.addLegend()
-        self.ui.graphicsView_5.addLegend()
-        self.ui.graphicsView_6.addLegend()
-        self.ui.graphicsView_7.addLegend()
-        self.ui.graphicsView_8.addLegend()
-
-        # Add error bars
-        x=np.zeros(64)
-        y=np.zeros(64)
-        err=np.zeros(64)
-        self._error_bars_1 = pg.ErrorBarItem(beam=0.5, pen={'color': 'w', 'width': 1})
-        self._error_bars_2 = pg.ErrorBarItem(beam=0.5, pen={'color': 'w', 'width': 1})
-        self._error_bars_3 = pg.ErrorBarItem(beam=0.5, pen={'color': 'w', 'width': 1})
-        self._error_bars_4 = pg.ErrorBarItem(beam=0.5, pen={'color': 'w', 'width': 1})
-        self._error_bars_5 = pg.ErrorBarItem(beam=0.5, pen={'color': 'w', 'width': 1})
-        self._error_bars_6 = pg.ErrorBarItem(beam=0.5, pen={'color': 'w', 'width': 1})
-        self._error_bars_7 = pg.ErrorBarItem(beam=0.5, pen={'color': 'w', 'width': 1})
-        self._error_bars_8 = pg.ErrorBarItem(beam=0.5, pen={'color': 'w', 'width': 1})
-        self.ui.graphicsView_1.addItem(self._error_bars_1)
-        self.ui.graphicsView_2.addItem(self._error_bars_2)
-        self.ui.graphicsView_3.addItem(self._error_bars_3)
-        self.ui.graphicsView_4.addItem(self._error_bars_4)
-        self.ui.graphicsView_5.addItem(self._error_bars_5)
-        self.ui.graphicsView_6.addItem(self._error_bars_6)
-        self.ui.graphicsView_7.addItem(self._error_bars_7)
-        self.ui.graphicsView_8.addItem(self._error_bars_8)
-        self._error_bars_1.setData(x=x,y=y,top=err,bottom=err)
-        self._error_bars_2.setData(x=x,y=y,top=err,bottom=err)
-        self._error_bars_3.setData(x=x,y=y,top=err,bottom=err)
-        self._error_bars_4.setData(x=x,y=y,top=err,bottom=err)
-        self._error_bars_5.setData(x=x,y=y,top=err,bottom=err)
-        self._error_bars_6.setData(x=x,y=y,top=err,bottom=err)
-        self._error_bars_7.setData(x=x,y=y,top=err,bottom=err)
-        self._error_bars_8.setData(x=x,y=y,top=err,bottom=err)
-
-        # Show grid
-        self.ui.graphicsView_1.showGrid(x=True, y=True)
-        self.ui.graphicsView_2.showGrid(x=True, y=True)
-        self.ui.graphicsView_3.showGrid(x=True, y=True)
-        self.ui.graphicsView_4.showGrid(x=True, y=True)
-        self.ui.graphicsView_5.showGrid(x=True, y=True)
-        self.ui.graphicsView_6.showGrid(x=True, y=True)
-        self.ui.graphicsView_7.showGrid(x=True, y=True)
-        self.ui.graphicsView_8.showGrid(x=True, y=True)
-
-        # Add x-axis labels
-        self.ui.graphicsView_1.setLabel("bottom", "Channel Index")
-        self.ui.graphicsView_2.setLabel("bottom", "Channel Index")
-        self.ui.graphicsView_3.setLabel("bottom", "Channel Index")
-        self.ui.graphicsView_4.setLabel("bottom", "Channel Index")
-        self.ui.graphicsView_5.setLabel("bottom", "Channel Index")
-        self.ui.graphicsView_6.setLabel("bottom", "Channel Index")
-        self.ui.graphicsView_7.setLabel("bottom", "Channel Index")
-        self.ui.graphicsView_8.setLabel("bottom", "Channel Index")
-
-        # Create plot items
-        self._plot_item_1 = self.ui.graphicsView_1.plot(x=[], y=[], symbol='o', pen=None, symbolPen={'color': 'm', 'width': 2}, symbolBrush="m", symbolSize=8, name="Plane 1 particles")
-        self._plot_item_2 = self.ui.graphicsView_2.plot(x=[], y=[], symbol='o', pen=None, symbolPen={'color': 'm', 'width': 2}, symbolBrush="m", symbolSize=8, name="Plane 2 particles")
-        self._plot_item_3 = self.ui.graphicsView_3.plot(x=[], y=[], symbol='o', pen=None, symbolPen={'color': 'm', 'width': 2}, symbolBrush="m", symbolSize=8, name="Plane 3 particles")
-        self._plot_item_4 = self.ui.graphicsView_4.plot(x=[], y=[], symbol='o', pen=None, symbolPen={'color': 'm', 'width': 2}, symbolBrush="m", symbolSize=8, name="Plane 4 particles")
-        self._plot_item_5 = self.ui.graphicsView_5.plot(x=[], y=[], symbol='o', pen=None, symbolPen={'color': 'm', 'width': 2}, symbolBrush="m", symbolSize=8, name="Plane 5 particles")
-        self._plot_item_6 = self.ui.graphicsView_6.plot(x=[], y=[], symbol='o', pen=None, symbolPen={'color': 'm', 'width': 2}, symbolBrush="m", symbolSize=8, name="Plane 6 particles")
-        self._plot_item_7 = self.ui.graphicsView_7.plot(x=[], y=[], symbol='o', pen=None, symbolPen={'color': 'm', 'width': 2}, symbolBrush="m", symbolSize=8, name="Plane 7 particles")
-        self._plot_item_8 = self.ui.graphicsView_8.plot(x=[], y=[], symbol='o', pen=None, symbolPen={'color': 'm', 'width': 2}, symbolBrush="m", symbolSize=8, name="Plane 8 particles")
-
-        # Set titles
-        self.ui.graphicsView_1.setTitle("Plane 1 - Particles per channel")
-        self.ui.graphicsView_2.setTitle("Plane 2 - Particles per channel")
-        self.ui.graphicsView_3.setTitle("Plane 3 - Particles per channel")
-        self.ui.graphicsView_4.setTitle("Plane 4 - Particles per channel")
-        self.ui.graphicsView_5.setTitle("Plane 5 - Particles per channel")
-        self.ui.graphicsView_6.setTitle("Plane 6 - Particles per channel")
-        self.ui.graphicsView_7.setTitle("Plane 7 - Particles per channel")
-        self.ui.graphicsView_8.setTitle("Plane 8 - Particles per channel")
+        # One panel per ASIC, built from the geometry
+        self._panels = sensor_panels(self.ui, 'graphicsView_', self._asics, plot_panel, name='graphicsView')
+
+        x=np.zeros(self._channels)
+        y=np.zeros(self._channels)
+        err=np.zeros(self._channels)
+        self._error_bars = []
+        self._plot_items = []
+        for i, view in enumerate(self._panels, 1):
+            # Add legends
+            view.addLegend()
+
+            # Add error bars
+            self._error_bars.append(pg.ErrorBarItem(beam=0.5, pen={'color': 'w', 'width': 1}))
+            view.addItem(self._error_bars[-1])
+            self._error_bars[-1].setData(x=x,y=y,top=err,bottom=err)
+
+            # Show grid
+            view.showGrid(x=True, y=True)
+
+            # Add x-axis labels
+            view.setLabel("bottom", "Channel Index")
+
+            # Create plot items
+            self._plot_items.append(view.plot(x=[], y=[], symbol='o', pen=None, symbolPen={'color': 'm', 'width': 2}, symbolBrush="m", symbolSize=8, name=f"Plane {i} particles"))
+
+            # Set titles
+            view.setTitle(f"Plane {i} - Particles per channel")
 
     def setup_main_tab(self):
         grid_layout=QGridLayout()
         spacer_label=QLabel('')
         frame_cnt_label=QLabel(f'Frame Count')
         frame_cnt_line=PyDMLineEdit(init_channel=f'{self._dataReceiver}.ASIC0FrameCnt')
-        frame_cnt_line.textChanged.connect(self.updatePlots)
+        refresh_label=QLabel(f'Refresh')
+        refresh_stats=QLabel('')
+        # Redraw at most maxFps times per second, merging the frames in between
+        self._refresh = RefreshScheduler(self.updatePlots, maxFps=self._max_fps, label=refresh_stats, parent=self)
+        frame_cnt_line.textChanged.connect(self._refresh.notify)
         vertical_spacer=QSpacerItem(20, 40, QSizePolicy.Minimum, QSizePolicy.Expanding)
         grid_layout.addWidget(spacer_label,0,0)
         grid_layout.addWidget(frame_cnt_label,1,0)
         grid_layout.addWidget(frame_cnt_line,1,1)
-        grid_layout.addItem(vertical_spacer,2,0)
+        grid_layout.addWidget(refresh_label,2,0)
+        grid_layout.addWidget(refresh_stats,2,1)
+
+        # Accumulation window of the plotted quantities
+        accumulate_label=QLabel(f'Accumulation')
+        self._accumulate_combo=QComboBox()
+        self._accumulate_combo.addItem('Single frame', None)
+        self._accumulate_combo.addItem(f'Last {self._accumulate_frames} frames', 'frames')
+        self._accumulate_combo.addItem(f'Last {self._accumulate_seconds:g} seconds', 'time')
+        self._accumulate_combo.addItem('Since reset', 'total')
+        self._accumulate_combo.currentIndexChanged.connect(self.drawPlots)
+        self._rate_checkbox=QCheckBox('Show rate (per second)')
+        self._rate_checkbox.clicked.connect(self.drawPlots)
+        reset_button=QPushButton('Reset')
+        reset_button.clicked.connect(self.onClick_resetAccumulation)
+        export_button=QPushButton('Export')
+        export_button.clicked.connect(self.onClick_exportAccumulation)
+        grid_layout.addWidget(accumulate_label,3,0)
+        grid_layout.addWidget(self._accumulate_combo,3,1)
+        grid_layout.addWidget(self._rate_checkbox,4,1)
+        grid_layout.addWidget(reset_button,5,0)
+        grid_layout.addWidget(export_button,5,1)
+        grid_layout.addItem(vertical_spacer,6,0)
         self.ui.PyDMTabWidget_main.setLayout(grid_layout)
 
     def setup_config_tab(self):
@@ -185,200 +235,109 @@ class assertGUIParticleMonitoring(pydm.Display):
         self.ui.PyDMCheckbox_photons.setChecked(True)
         self.ui.PyDMCheckbox_electrons.setChecked(False)
         self.ui.PyDMCheckbox_LET.setChecked(False)
-        self.updatePlots()
+        self.drawPlots()
 
     def onClick_checkElectrons(self):
         self.ui.PyDMCheckbox_photons.setChecked(False)
         self.ui.PyDMCheckbox_electrons.setChecked(True)
         self.ui.PyDMCheckbox_LET.setChecked(False)
-        self.updatePlots()
+        self.drawPlots()
 
     def onClick_checkLET(self):
         self.ui.PyDMCheckbox_photons.setChecked(False)
         self.ui.PyDMCheckbox_electrons.setChecked(False)
         self.ui.PyDMCheckbox_LET.setChecked(True)
-        self.updatePlots()
-
-    def update_asic_photons(self):
-        # Get Rogue ADC counts
-        counts1 = self._root.AsicSampleProcessor.ASIC0Sig.get()
-        counts2 = self._root.AsicSampleProcessor.ASIC1Sig.get()
-        counts3 = self._root.AsicSampleProcessor.ASIC2Sig.get()
-        counts4 = self._root.AsicSampleProcessor.ASIC3Sig.get()
-        counts5 = self._root.AsicSampleProcessor.ASIC4Sig.get()
-        counts6 = self._root.AsicSampleProcessor.ASIC5Sig.get()
-        counts7 = self._root.AsicSampleProcessor.ASIC6Sig.get()
-        counts8 = self._root.AsicSampleProcessor.ASIC7Sig.get()
-
-        # Compute photons
-        rng = np.random.default_rng()
-        photons1 = np.full(64, rng.integers(low=0.9e+06, high=1.1e+06))
-        photons2 = np.full(64, rng.integers(low=0.9e+06, high=1.1e+06))
-        photons3 = np.full(64, rng.integers(low=0.9e+06, high=1.1e+06))
-        photons4 = np.full(64, rng.integers(low=0.9e+06, high=1.1e+06))
-        photons5 = np.full(64, rng.integers(low=0.9e+06, high=1.1e+06))
-        photons6 = np.full(64, rng.integers(low=0.9e+06, high=1.1e+06))
-        photons7 = np.full(64, rng.integers(low=0.9e+06, high=1.1e+06))
-        photons8 = np.full(64, rng.integers(low=0.9e+06, high=1.1e+06))
- 
-        # Update plot items
-        channels = np.arange(1, 65, 1)
-        self._plot_item_1.setData(x=channels, y=photons1)
-        self._plot_item_2.setData(x=channels, y=photons2)
-        self._plot_item_3.setData(x=channels, y=photons3)
-        self._plot_item_4.setData(x=channels, y=photons4)
-        self._plot_item_5.setData(x=channels, y=photons5)
-        self._plot_item_6.setData(x=channels, y=photons6)
-        self._plot_item_7.setData(x=channels, y=photons7)
-        self._plot_item_8.setData(x=channels, y=photons8)
-       
-        # Add y-axis labels 
-        self.ui.graphicsView_1.setLabel("left", "Photons")
-        self.ui.graphicsView_2.setLabel("left", "Photons")
-        self.ui.graphicsView_3.setLabel("left", "Photons")
-        self.ui.graphicsView_4.setLabel("left", "Photons")
-        self.ui.graphicsView_5.setLabel("left", "Photons")
-        self.ui.graphicsView_6.setLabel("left", "Photons")
-        self.ui.graphicsView_7.setLabel("left", "Photons")
-        self.ui.graphicsView_8.setLabel("left", "Photons")
-
-        # Add error bars
-        err = np.full(64,2)
-        self._error_bars_1.setData(x=channels, y=photons1, top=err, bottom=err)
-        self._error_bars_2.setData(x=channels, y=photons2, top=err, bottom=err)
-        self._error_bars_3.setData(x=channels, y=photons3, top=err, bottom=err)
-        self._error_bars_4.setData(x=channels, y=photons4, top=err, bottom=err)
-        self._error_bars_5.setData(x=channels, y=photons5, top=err, bottom=err)
-        self._error_bars_6.setData(x=channels, y=photons6, top=err, bottom=err)
-        self._error_bars_7.setData(x=channels, y=photons7, top=err, bottom=err)
-        self._error_bars_8.setData(x=channels, y=photons8, top=err, bottom=err)
-
-    def update_asic_electrons(self):
-        # Get Rogue ADC counts
-        counts1 = self._root.AsicSampleProcessor.ASIC0Sig.get()
-        counts2 = self._root.AsicSampleProcessor.ASIC1Sig.get()
-        counts3 = self._root.AsicSampleProcessor.ASIC2Sig.get()
-        counts4 = self._root.AsicSampleProcessor.ASIC3Sig.get()
-        counts5 = self._root.AsicSampleProcessor.ASIC4Sig.get()
-        counts6 = self._root.AsicSampleProcessor.ASIC5Sig.get()
-        counts7 = self._root.AsicSampleProcessor.ASIC6Sig.get()
-        counts8 = self._root.AsicSampleProcessor.ASIC7Sig.get()
-
-        # Compute electrons
-        rng = np.random.default_rng()
-        electrons1 = np.full(64, rng.integers(low=0.9e+06, high=1.1e+06))
-        electrons2 = np.full(64, rng.integers(low=0.9e+06, high=1.1e+06))
-        electrons3 = np.full(64, rng.integers(low=0.9e+06, high=1.1e+06))
-        electrons4 = np.full(64, rng.integers(low=0.9e+06, high=1.1e+06))
-        electrons5 = np.full(64, rng.integers(low=0.9e+06, high=1.1e+06))
-        electrons6 = np.full(64, rng.integers(low=0.9e+06, high=1.1e+06))
-        electrons7 = np.full(64, rng.integers(low=0.9e+06, high=1.1e+06))
-        electrons8 = np.full(64, rng.integers(low=0.9e+06, high=1.1e+06))
- 
-        # Update plot items
-        channels = np.arange(1, 65, 1)
-        self._plot_item_1.setData(x=channels, y=electrons1)
-        self._plot_item_2.setData(x=channels, y=electrons2)
-        self._plot_item_3.setData(x=channels, y=electrons3)
-        self._plot_item_4.setData(x=channels, y=electrons4)
-        self._plot_item_5.setData(x=channels, y=electrons5)
-        self._plot_item_6.setData(x=channels, y=electrons6)
-        self._plot_item_7.setData(x=channels, y=electrons7)
-        self._plot_item_8.setData(x=channels, y=electrons8)
-       
-        # Add y-axis labels 
-        self.ui.graphicsView_1.setLabel("left", "Electrons")
-        self.ui.graphicsView_2.setLabel("left", "Electrons")
-        self.ui.graphicsView_3.setLabel("left", "Electrons")
-        self.ui.graphicsView_4.setLabel("left", "Electrons")
-        self.ui.graphicsView_5.setLabel("left", "Electrons")
-        self.ui.graphicsView_6.setLabel("left", "Electrons")
-        self.ui.graphicsView_7.setLabel("left", "Electrons")
-        self.ui.graphicsView_8.setLabel("left", "Electrons")
-
-        # Add error bars
-        err = np.full(64,2)
-        self._error_bars_1.setData(x=channels, y=electrons1, top=err, bottom=err)
-        self._error_bars_2.setData(x=channels, y=electrons2, top=err, bottom=err)
-        self._error_bars_3.setData(x=channels, y=electrons3, top=err, bottom=err)
-        self._error_bars_4.setData(x=channels, y=electrons4, top=err, bottom=err)
-        self._error_bars_5.setData(x=channels, y=electrons5, top=err, bottom=err)
-        self._error_bars_6.setData(x=channels, y=electrons6, top=err, bottom=err)
-        self._error_bars_7.setData(x=channels, y=electrons7, top=err, bottom=err)
-        self._error_bars_8.setData(x=channels, y=electrons8, top=err, bottom=err)
-
-    def update_asic_LET(self):
-        # Get Rogue ADC counts
-        counts1 = self._root.AsicSampleProcessor.ASIC0Sig.get()
-        counts2 = self._root.AsicSampleProcessor.ASIC1Sig.get()
-        counts3 = self._root.AsicSampleProcessor.ASIC2Sig.get()
-        counts4 = self._root.AsicSampleProcessor.ASIC3Sig.get()
-        counts5 = self._root.AsicSampleProcessor.ASIC4Sig.get()
-        counts6 = self._root.AsicSampleProcessor.ASIC5Sig.get()
-        counts7 = self._root.AsicSampleProcessor.ASIC6Sig.get()
-        counts8 = self._root.AsicSampleProcessor.ASIC7Sig.get()
-
-        # Compute LET
-        rng = np.random.default_rng()
-        LET1 = np.full(64, rng.integers(low=0.9e+06, high=1.1e+06))
-        LET2 = np.full(64, rng.integers(low=0.9e+06, high=1.1e+06))
-        LET3 = np.full(64, rng.integers(low=0.9e+06, high=1.1e+06))
-        LET4 = np.full(64, rng.integers(low=0.9e+06, high=1.1e+06))
-        LET5 = np.full(64, rng.integers(low=0.9e+06, high=1.1e+06))
-        LET6 = np.full(64, rng.integers(low=0.9e+06, high=1.1e+06))
-        LET7 = np.full(64, rng.integers(low=0.9e+06, high=1.1e+06))
-        LET8 = np.full(64, rng.integers(low=0.9e+06, high=1.1e+06))
- 
-        # Update plot items
-        channels = np.arange(1, 65, 1)
-        self._plot_item_1.setData(x=channels, y=LET1)
-        self._plot_item_2.setData(x=channels, y=LET2)
-        self._plot_item_3.setData(x=channels, y=LET3)
-        self._plot_item_4.setData(x=channels, y=LET4)
-        self._plot_item_5.setData(x=channels, y=LET5)
-        self._plot_item_6.setData(x=channels, y=LET6)
-        self._plot_item_7.setData(x=channels, y=LET7)
-        self._plot_item_8.setData(x=channels, y=LET8)
-       
-        # Add y-axis labels 
-        self.ui.graphicsView_1.setLabel("left", "LET")
-        self.ui.graphicsView_2.setLabel("left", "LET")
-        self.ui.graphicsView_3.setLabel("left", "LET")
-        self.ui.graphicsView_4.setLabel("left", "LET")
-        self.ui.graphicsView_5.setLabel("left", "LET")
-        self.ui.graphicsView_6.setLabel("left", "LET")
-        self.ui.graphicsView_7.setLabel("left", "LET")
-        self.ui.graphicsView_8.setLabel("left", "LET")
-
-        # Add error bars
-        err = np.full(64,2)
-        self._error_bars_1.setData(x=channels, y=LET1, top=err, bottom=err)
-        self._error_bars_2.setData(x=channels, y=LET2, top=err, bottom=err)
-        self._error_bars_3.setData(x=channels, y=LET3, top=err, bottom=err)
-        self._error_bars_4.setData(x=channels, y=LET4, top=err, bottom=err)
-        self._error_bars_5.setData(x=channels, y=LET5, top=err, bottom=err)
-        self._error_bars_6.setData(x=channels, y=LET6, top=err, bottom=err)
-        self._error_bars_7.setData(x=channels, y=LET7, top=err, bottom=err)
-        self._error_bars_8.setData(x=channels, y=LET8, top=err, bottom=err)
+        self.drawPlots()
+
+    def plot_settings(self):
+        # Read current plot settings: quantity, y-axis label, accumulation window, rate
+        if self.ui.PyDMCheckbox_electrons.isChecked():
+            quantity, label = 'electrons', 'Electrons'
+        elif self.ui.PyDMCheckbox_LET.isChecked():
+            quantity, label = 'LET', 'LET (MeV cm2/mg)'
+        else:
+            quantity, label = 'photons', 'Photons'
+        return quantity, label, self._accumulate_combo.currentData(), self._rate_checkbox.isChecked()
+
+    def compute_asic_quantity(self, quantity, label, window, rate):
+        # Runs on the worker thread, from the per frame cache and the accumulator
+        result = self._results.result
+        if result is None:
+            return None
+        valid = self._results.valid.copy()
+        if window is None:
+            values = result[quantity]
+            err    = result[f'{quantity}_err']
+        else:
+            with self._perf.phase('compute'):
+                values, err, rate_values, rate_err = self._accumulator.accumulated(quantity, window)
+            if rate:
+                values, err = rate_values, rate_err
+                label = f'{label} / s'
+        return {'values' : np.array(values), 'err' : np.array(err), 'valid' : valid, 'label' : label}
+
+    def update_asic_quantity(self, plot):
+        # Update plot items, y-axis labels and statistical error bars
+        if plot is None:
+            return
+        values, err, valid, label = plot['values'], plot['err'], plot['valid'], plot['label']
+        channels = np.arange(1, self._channels+1, 1)
+        with self._perf.phase('render'):
+            for i, view in enumerate(self._panels, 1):
+                if not valid[i-1]:
+                    continue
+                self._plot_items[i-1].setData(x=channels, y=values[i-1])
+                view.setLabel("left", label)
+                self._error_bars[i-1].setData(x=channels, y=values[i-1], top=err[i-1], bottom=err[i-1])
+
+    def receive_event(self, values, valid, frame):
+        # Queued in order on the worker thread, so no event is skipped between redraws.
+        # Stamped on arrival, so a busy worker does not shift the time windows and rates.
+        if self._worker.pending >= self._max_pending:
+            self._dropped += 1
+            return
+        self._worker.post(self.process_event, values, valid, frame, time.time())
+
+    def process_event(self, counts, valid, frame, stamp=None):
+        # Convert the ADC counts of all sensor planes of one event to all particle
+        # quantities at once with the per channel calibration
+        with self._perf.phase('compute'):
+            # Every event enters the per event history and the integrated sums
+            result = self._results.update(counts, self._calibration, valid=valid, frame=frame)
+            self._accumulator.add(result, now=stamp)
+        self._perf.count('events')
+
+    def onClick_resetAccumulation(self):
+        self._worker.post(self.reset_accumulation, time.time())
+        self.drawPlots()
+
+    def reset_accumulation(self, now=None):
+        # The events queued before the click are still added before the reset
+        self._accumulator.reset(now=now)
+        self._results.reset()
+
+    def onClick_exportAccumulation(self):
+        path, _ = QFileDialog.getSaveFileName(self, 'Export accumulated particle counts', 'particles.npz', 'NumPy archive (*.npz)')
+        if path:
+            self._worker.post(self.export_accumulation, path)
+
+    def export_accumulation(self, path):
+        # Accumulated sums, errors and rates of all windows and quantities
+        self._accumulator.export(path)
 
     def updatePlots(self):
         #print('Update the plots ...\n')
+        # Read the converted and accumulated events on the worker thread, after the events
+        # queued before; only the newest request is drawn
+        self._worker.submit('plots', self.compute_asic_quantity, *self.plot_settings(), callback=self.drawFrame)
+
+    def drawFrame(self, plot):
+        self.update_asic_quantity(plot)
+        self._perf.frame()
 
-        # Read current plot settings and update plots
-        photons_checkbox   = self.ui.PyDMCheckbox_photons
-        electrons_checkbox = self.ui.PyDMCheckbox_electrons
-        LET_checkbox       = self.ui.PyDMCheckbox_LET
-
-        # Depending on the configuration, update the curves with the appropriate counts
-        if photons_checkbox.isChecked():
-            # Add labels, legend and update photon plots
-            self.update_asic_photons()
-        elif electrons_checkbox.isChecked():
-            # Add labels, legend and update electron plots
-            self.update_asic_electrons()
-        elif LET_checkbox.isChecked():
-            # Add labels, legend and update LET plots
-            self.update_asic_LET()
+    def drawPlots(self):
+        # Redraw with the current settings, replacing a redraw that has not run yet
+        self._worker.submit('plots', self.compute_asic_quantity, *self.plot_settings(), callback=self.update_asic_quantity)
 
     def ui_filename(self):
         # Point to the UI file
@@ -0,0 +1,329 @@
+#!/usr/bin/env python
+#-----------------------------------------------------------------------------
+# Title      : Configuration file for ASSERT trajectory display
+#-----------------------------------------------------------------------------
+# Borrowed from ePixGUI.py (ePixViewer, https://github.com/slaclab/ePixViewer)
+
+import os
+import pydm
+import threading
+import numpy as np
+from pydm.widgets import PyDMLineEdit, PyDMLabel
+from qtpy.QtWidgets import QWidget, QLabel, QGridLayout, QVBoxLayout, QSpacerItem, QSizePolicy, QPushButton
+
+from assertViewer.assertRefresh import RefreshScheduler
+from assertViewer.assertWorker import BackgroundWorker
+from assertViewer.assertInstrumentation import Instrumentation, InstrumentationReporter
+from assertViewer.assertStartup import report_on_event_loop
+from assertViewer.assertConnection import close_connections
+from assertViewer.assertSignalCache import shared_signal_cache
+from assertViewer.assertGeometry import geometry_from_macros
+from assertViewer.assertFrameBuffer import FrameRingBuffer
+from assertViewer.assertPlotting import LocalCurve
+from assertViewer.assertBeamGeometry import compute_plane_profiles, pair_planes
+from assertViewer.assertTrajectory import fit_tracks
+
+import pyqtgraph as pg
+
+def runTrajectoryDisplay(dataReceiver,serverList='localhost:9090',geometry=None,port='9090',root=None,
+                   title=None,sizeX=800,sizeY=1000,maxListExpand=5,maxListSize=100,maxFps=10,
+                   stationZ=None,stripPitch=None,trackHistory=10000,
+                   showStats=False,statsLog=None,statsInterval=1.0):
+
+    #pyrogue.pydm.runPyDM()
+
+    if root is not None:
+
+        if not root.running:
+            raise Exception("Attempt to use pydm with root that has not started")
+
+        os.environ['ROGUE_SERVERS'] = 'localhost:{}'.format(root.serverPort)
+    else:
+        os.environ['ROGUE_SERVERS'] = serverList
+
+    ui = os.path.abspath(__file__)
+
+    if title is None:
+        title = "Assert Live Trajectory Display: {}".format(os.getenv('ROGUE_SERVERS'))
+
+    args = []
+    args.append(f"sizeX={sizeX}")
+    args.append(f"sizeY={sizeY}")
+    args.append(f"title='{title}'")
+    args.append(f"maxListExpand={maxListExpand}")
+    args.append(f"maxListSize={maxListSize}")
+
+    macrosA = {}
+    macrosA['dataReceiver'] = dataReceiver
+    macrosA['geometry'] = geometry
+    macrosA['serverList'] = os.getenv('ROGUE_SERVERS')
+    macrosA['title'] = title
+    macrosA['sizeX'] = sizeX
+    macrosA['sizeY'] = sizeY
+    macrosA['port' ] = port
+    macrosA['maxFps'] = maxFps
+    macrosA['showStats'] = showStats
+    macrosA['statsLog'] = statsLog
+    macrosA['statsInterval'] = statsInterval
+    macrosA['stationZ'] = stationZ
+    macrosA['stripPitch'] = stripPitch
+    macrosA['trackHistory'] = trackHistory
+    app = pydm.PyDMApplication(ui_file=ui,
+                               command_line_args=args,
+                               macros=macrosA,
+                               hide_nav_bar=True,
+                               hide_menu_bar=True,
+                               hide_status_bar=True)
+    report_on_event_loop(title)
+    app.exec()
+    close_connections()
+
+class assertGUITrajectory(pydm.Display):
+    def __init__(self, parent=None, args=None, macros=None):
+        super().__init__(parent=parent, args=args, macros=macros)
+        # print(f'{macros=}')
+        self._geometry = geometry_from_macros(macros)
+        self._asics = self._geometry.asics
+        self._channels = self._geometry.channels
+        self._stations = self._geometry.stations
+        self._dataReceiver = macros['dataReceiver']
+        self.sizeX = macros['sizeX']
+        self.sizeY = macros['sizeY']
+        self._max_fps = macros.get('maxFps', 10)
+        self._show_stats = macros.get('showStats', False)
+        self._stats_log  = macros.get('statsLog', None)
+        self._stats_interval = float(macros.get('statsInterval', 1.0))
+        self._perf = Instrumentation(name='trajectory')
+
+        # Positions of the x/y stations along the beam and the strip pitch, in the same unit
+        self._station_z = self._geometry.stationZ
+        self._strip_pitch = self._geometry.stripPitch
+        self._track_history = int(macros.get('trackHistory', 10000))
+        self._worker = BackgroundWorker('trajectory', parent=self)
+
+        self.setup_buffers()
+        self.setup_plots()
+        self.setup_main_tab()
+        self.setup_config_tab()
+        self.setup_signals()
+        self.setup_instrumentation()
+
+    def setup_buffers(self):
+        # Events waiting for the next batched fit, filled on the GUI thread and taken
+        # by the worker thread; the fitted tracks are only touched on the worker thread.
+        # When the worker falls behind the oldest waiting events are overwritten and counted.
+        self._dropped        = 0
+        self._pending_lock   = threading.Lock()
+        self._pending_counts = FrameRingBuffer(4096, (self._asics, self._channels), dtype=np.float64)
+        self._pending_valid  = FrameRingBuffer(4096, (self._asics,), dtype=bool)
+
+        # Fitted tracks: angle_x, angle_y, offset_x, offset_y and the x/y residuals per station
+        self._tracks    = FrameRingBuffer(self._track_history, (4,), dtype=np.float64)
+        self._residuals = FrameRingBuffer(self._track_history, (2, self._stations), dtype=np.float64)
+        self._latest    = None
+        self._fitted    = 0
+
+    def setup_signals(self):
+        # Every complete event is queued, fitting happens in batches at the refresh rate
+        self._signals = shared_signal_cache(self._dataReceiver, asics=self._asics, channels=self._channels, variable='Sig')
+        self._signals.add_listener(eventCallback=self.receive_event)
+
+    def setup_instrumentation(self):
+        # Phase timings as an optional on-screen overlay and/or a periodic log
+        self._perf_reporter = InstrumentationReporter(self._perf, self, show=self._show_stats, path=self._stats_log,
+                                                      interval=self._stats_interval,
+                                                      gauges={'queue'  : lambda: len(self._pending_counts),
+                                                              'merged' : lambda: self._refresh.frames_merged,
+                                                              'worker' : lambda: self._worker.pending,
+                                                              'dropped': lambda: self._dropped,
+                                                              'stale'  : lambda: self._worker.stale + self._worker.skipped})
+
+    def setup_plots(self):
+        for i in np.arange(1,5):
+            getattr(self.ui, f'graphicsView_{i}').addLegend()
+            getattr(self.ui, f'graphicsView_{i}').showGrid(x=True, y=True)
+
+        # Angle and offset distributions
+        self._angle_x_curve  = LocalCurve(self.ui.graphicsView_1, color='m', lineWidth=2, yAxisName='Tracks', name='x')
+        self._angle_y_curve  = LocalCurve(self.ui.graphicsView_1, color='c', lineWidth=2, name='y')
+        self._offset_x_curve = LocalCurve(self.ui.graphicsView_2, color='m', lineWidth=2, yAxisName='Tracks', name='x')
+        self._offset_y_curve = LocalCurve(self.ui.graphicsView_2, color='c', lineWidth=2, name='y')
+        self.ui.graphicsView_1.setLabel("bottom", "Track Angle (mrad)")
+        self.ui.graphicsView_2.setLabel("bottom", "Track Offset at z = 0")
+
+        # Residual mean and RMS per station
+        self._residual_items = []
+        for k, color in enumerate(['m', 'c']):
+            item = self.ui.graphicsView_3.plot(x=[], y=[], symbol='o', pen=None, symbolPen={'color': color, 'width': 2}, symbolBrush=color, symbolSize=8, name='xy'[k])
+            bars = pg.ErrorBarItem(beam=0.2, pen={'color': color, 'width': 1})
+            self.ui.graphicsView_3.addItem(bars)
+            self._residual_items.append((item, bars))
+        self.ui.graphicsView_3.setLabel("bottom", "Station")
+        self.ui.graphicsView_3.setLabel("left", "Residual")
+
+        # Latest tracks in the x-z plane: hits and fitted lines
+        self._hits_item  = self.ui.graphicsView_4.plot(x=[], y=[], symbol='o', pen=None, symbolPen={'color': 'm', 'width': 2}, symbolBrush="m", symbolSize=6, name="Hits (x)")
+        self._lines_item = self.ui.graphicsView_4.plot(x=[], y=[], pen=pg.mkPen('w', width=1), connect='finite', name="Tracks (x)")
+        self.ui.graphicsView_4.setLabel("bottom", "z")
+        self.ui.graphicsView_4.setLabel("left", "x")
+
+        # Set titles
+        self.ui.graphicsView_1.setTitle("Track Angles")
+        self.ui.graphicsView_2.setTitle("Track Offsets")
+        self.ui.graphicsView_3.setTitle("Residuals per Station (mean and RMS)")
+        self.ui.graphicsView_4.setTitle("Latest Tracks (x-z)")
+
+    def setup_main_tab(self):
+        grid_layout=QGridLayout()
+        spacer_label=QLabel('')
+        frame_cnt_label=QLabel(f'Frame Count')
+        frame_cnt_line=PyDMLineEdit(init_channel=f'{self._dataReceiver}.ASIC0FrameCnt')
+        refresh_label=QLabel(f'Refresh')
+        refresh_stats=QLabel('')
+        # Redraw at most maxFps times per second, merging the frames in between
+        self._refresh = RefreshScheduler(self.updatePlots, maxFps=self._max_fps, label=refresh_stats, parent=self)
+        frame_cnt_line.textChanged.connect(self._refresh.notify)
+        tracks_label=QLabel(f'Tracks')
+        self._tracks_stats=QLabel('')
+        reset_button=QPushButton('Reset Tracks')
+        reset_button.clicked.connect(self.onClick_resetTracks)
+        vertical_spacer=QSpacerItem(20, 40, QSizePolicy.Minimum, QSizePolicy.Expanding)
+        grid_layout.addWidget(spacer_label,0,0)
+        grid_layout.addWidget(frame_cnt_label,1,0)
+        grid_layout.addWidget(frame_cnt_line,1,1)
+        grid_layout.addWidget(refresh_label,2,0)
+        grid_layout.addWidget(refresh_stats,2,1)
+        grid_layout.addWidget(tracks_label,3,0)
+        grid_layout.addWidget(self._tracks_stats,3,1)
+        grid_layout.addWidget(reset_button,4,0,1,2)
+        grid_layout.addItem(vertical_spacer,5,0)
+        self.ui.PyDMTabWidget_main.setLayout(grid_layout)
+
+    def setup_config_tab(self):
+        self.ui.PyDMCheckbox_allStations.setChecked(False)
+        self.ui.PyDMCheckbox_latestOnly.setChecked(False)
+
+        self.ui.PyDMCheckbox_allStations.clicked.connect(self.drawPlots)
+        self.ui.PyDMCheckbox_latestOnly.clicked.connect(self.drawPlots)
+
+    def receive_event(self, values, valid, frame):
+        with self._pending_lock:
+            if len(self._pending_counts) == self._pending_counts.depth:
+                self._dropped += 1
+            self._pending_counts.append(values)
+            self._pending_valid.append(valid)
+
+    def onClick_resetTracks(self):
+        self._worker.post(self.reset_tracks)
+        self.drawPlots()
+
+    def reset_tracks(self):
+        self._tracks.clear()
+        self._residuals.clear()
+        self._latest = None
+        self._fitted = 0
+
+    def fitTracks(self, allStations=False):
+        # Fit all events received since the last refresh in one batch (worker thread)
+        with self._perf.phase('fetch'):
+            with self._pending_lock:
+                if len(self._pending_counts) == 0:
+                    return
+                counts = self._pending_counts.ordered()
+                valid  = self._pending_valid.ordered()
+                self._pending_counts.clear()
+                self._pending_valid.clear()
+
+        with self._perf.phase('compute'):
+            self.fitBatch(counts, valid, allStations)
+        self._perf.count('events', len(counts))
+
+    def fitBatch(self, counts, valid, allStations=False):
+        # Plane profiles, track fits and the track selection of a batch of events
+        profiles = compute_plane_profiles(counts, valid=valid)
+        x, y, hit = pair_planes(profiles, 'mean', self._geometry.x_planes, self._geometry.y_planes)
+        result = fit_tracks(self._station_z, x*self._strip_pitch, y*self._strip_pitch, hit)
+        ok = result['ok']
+        if allStations:
+            ok &= hit.all(axis=1)
+
+        self._tracks.extend(np.stack([result['angle_x'], result['angle_y'], result['offset_x'], result['offset_y']], axis=1)[ok])
+        self._residuals.extend(np.stack([result['residual_x'], result['residual_y']], axis=1)[ok])
+        self._latest = {'x' : x[ok]*self._strip_pitch, 'slope' : result['slope_x'][ok], 'offset' : result['offset_x'][ok]}
+        self._fitted += int(ok.sum())
+
+    def plot_settings(self):
+        return self.ui.PyDMCheckbox_allStations.isChecked(), self.ui.PyDMCheckbox_latestOnly.isChecked()
+
+    def updatePlots(self):
+        # Fit and prepare the plots on the worker thread, only the newest request is drawn
+        self._worker.submit('plots', self.fitAndCompute, *self.plot_settings(), callback=self.drawFrame)
+
+    def drawFrame(self, plots):
+        self.renderPlots(plots)
+        self._perf.frame()
+
+    def drawPlots(self):
+        # Redraw with the current settings without fitting the pending events
+        self._worker.submit('plots', self.computePlots, self.plot_settings()[1], callback=self.renderPlots)
+
+    def fitAndCompute(self, allStations, latestOnly):
+        self.fitTracks(allStations)
+        return self.computePlots(latestOnly)
+
+    def computePlots(self, latestOnly):
+        # Runs on the worker thread and returns plot-ready arrays
+        with self._perf.phase('compute'):
+            tracks    = self._tracks.ordered()
+            residuals = self._residuals.ordered()
+            if latestOnly and self._latest is not None:
+                n = len(self._latest['slope'])
+                tracks, residuals = tracks[len(tracks)-n:], residuals[len(residuals)-n:]
+            plots = {'stats' : f'{self._fitted} fitted, {len(tracks)} shown', 'tracks' : len(tracks)}
+            if len(tracks) == 0:
+                return plots
+
+            # Angle and offset distributions
+            plots['histograms'] = [np.histogram(tracks[:,column], bins=50) for column in range(4)]
+
+            # Residual mean and RMS per station, x and y side by side
+            with np.errstate(invalid='ignore'):
+                plots['mean'] = np.nanmean(residuals, axis=0)
+                plots['rms']  = np.nanstd(residuals, axis=0)
+
+            # Latest tracks (at most 20) as hits and NaN-separated line segments
+            if self._latest is not None and len(self._latest['slope']):
+                latest = slice(-20, None)
+                z = self._station_z
+                hits_x = self._latest['x'][latest]
+                ends_z = np.array([z[0], z[-1], np.nan])
+                lines  = self._latest['offset'][latest,None] + self._latest['slope'][latest,None]*ends_z
+                plots['hits']  = (np.tile(z, len(hits_x)), hits_x.ravel())
+                plots['lines'] = (np.tile(ends_z, len(lines)), lines.ravel())
+        return plots
+
+    def renderPlots(self, plots):
+        self._tracks_stats.setText(plots['stats'])
+        if plots['tracks'] == 0:
+            return
+        with self._perf.phase('render'):
+            for curve, (counts, edges) in zip([self._angle_x_curve, self._angle_y_curve, self._offset_x_curve, self._offset_y_curve], plots['histograms']):
+                curve.setHistogram(counts, edges)
+
+            stations = np.arange(1, self._stations+1, dtype=np.float64)
+            for k, (item, bars) in enumerate(self._residual_items):
+                pos = stations + (k - 0.5)*0.1
+                item.setData(x=pos, y=plots['mean'][k])
+                bars.setData(x=pos, y=plots['mean'][k], top=plots['rms'][k], bottom=plots['rms'][k])
+
+            if 'hits' in plots:
+                self._hits_item.setData(x=plots['hits'][0], y=plots['hits'][1])
+                self._lines_item.setData(x=plots['lines'][0], y=plots['lines'][1])
+
+    def ui_filename(self):
+        # Point to the UI file
+        return 'ui/assertViewerPyQtGraph_Trajectory.ui'
+
+    def ui_filepath(self):
+        # Return the full path to the UI file
+        return os.path.join(os.path.dirname(os.path.realpath(__file__)), self.ui_filename())
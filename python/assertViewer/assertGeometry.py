@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+#-----------------------------------------------------------------------------
+# Title      : Detector geometry descriptor
+#-----------------------------------------------------------------------------
+# Number of ASICs, channels and frames, the strip orientation of every plane and the
+# station positions along the beam. Loaded from a JSON file or read from the
+# AsicSampleProcessor of the Rogue tree, and used to size the buffers, the
+# computations and the sensor panels of the displays.
+
+import os
+import re
+import json
+import numpy as np
+
+# Resolved geometries by source, server and data receiver, so displays sharing a
+# process resolve each one once
+_resolved = {}
+
+class DetectorGeometry(object):
+    def __init__(self, asics=8, channels=64, frames=32, planes=None, stationZ=None, stripPitch=1.0):
+        # planes is the strip orientation of every ASIC, 'x' or 'y' (default alternating,
+        # 'xyxy...'); the n-th x plane and the n-th y plane form station n. stationZ are
+        # the station positions along the beam (default 0, 1, ...) and stripPitch the
+        # strip pitch, both in the same length unit.
+        self.asics    = int(asics)
+        self.channels = int(channels)
+        self.frames   = int(frames)
+        self.planes   = ''.join(planes) if planes is not None else 'xy' * (self.asics // 2) + 'x' * (self.asics % 2)
+        self.stripPitch = float(stripPitch)
+        if len(self.planes) != self.asics or set(self.planes) - set('xy'):
+            raise Exception(f"Expected one of 'x' or 'y' per ASIC, got '{self.planes}' for {self.asics} ASICs")
+
+        self.x_planes = np.array([i for i, p in enumerate(self.planes) if p == 'x'], dtype=np.intp)
+        self.y_planes = np.array([i for i, p in enumerate(self.planes) if p == 'y'], dtype=np.intp)
+        self.stations = min(len(self.x_planes), len(self.y_planes))
+        self.x_planes = self.x_planes[:self.stations]
+        self.y_planes = self.y_planes[:self.stations]
+
+        if stationZ is None:
+            stationZ = np.arange(self.stations)
+        elif isinstance(stationZ, str):
+            stationZ = [float(z) for z in stationZ.split(',') if z.strip()]
+        self.stationZ = np.asarray(stationZ, dtype=np.float64)
+        if len(self.stationZ) != self.stations:
+            raise Exception(f"Expected {self.stations} station positions, got {len(self.stationZ)}")
+
+    def __repr__(self):
+        return f'DetectorGeometry({self.asics} ASICs x {self.channels} channels x {self.frames} frames, {self.stations} stations)'
+
+    def __eq__(self, other):
+        return isinstance(other, DetectorGeometry) and self.to_dict() == other.to_dict()
+
+    @property
+    def strip_range(self):
+        # Plot range covering all strips (1-based) with a margin
+        return (0, self.channels + 6)
+
+    @property
+    def pairs(self):
+        # (x plane, y plane) ASIC indices of every station
+        return list(zip(self.x_planes.tolist(), self.y_planes.tolist()))
+
+    def frame_bytes(self, itemsize=4):
+        # Size of one MemFrame event of all ASICs
+        return self.asics * self.channels * self.frames * itemsize
+
+    def to_dict(self):
+        return {'asics'      : self.asics,
+                'channels'   : self.channels,
+                'frames'     : self.frames,
+                'planes'     : self.planes,
+                'stationZ'   : self.stationZ.tolist(),
+                'stripPitch' : self.stripPitch}
+
+    @classmethod
+    def from_dict(cls, values):
+        return cls(**{key : values[key] for key in ('asics', 'channels', 'frames', 'planes', 'stationZ', 'stripPitch') if key in values})
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    @classmethod
+    def from_device(cls, device):
+        # From a (virtual) AsicSampleProcessor: its NumAsics/NumChannels/NumFrames
+        # variables, or for servers without them the ASIC{n} variables and array shapes
+        if hasattr(device, 'NumAsics'):
+            return cls(asics=device.NumAsics.get(), channels=device.NumChannels.get(), frames=device.NumFrames.get())
+        asics = len([name for name in device.nodes if re.fullmatch(r'ASIC\d+FrameCnt', name)])
+        if asics == 0:
+            raise Exception(f"No ASIC variables found on {device.path}")
+        channels, frames = np.shape(device.ASIC0MemFrame.get())
+        return cls(asics=asics, channels=channels, frames=frames)
+
+def geometry_from_macros(macros):
+    # Geometry of a display: macros['geometry'] is a JSON file, 'default' (8 ASICs x 64
+    # channels x 32 frames) or None to ask the AsicSampleProcessor of the server.
+    # Station positions and strip pitch given as display options take precedence.
+    source = macros.get('geometry', None)
+    serverList = macros.get('serverList', None) or os.getenv('ROGUE_SERVERS')
+    # Displays of one process may look at different servers and data receivers
+    key = (source, serverList, str(macros.get('port', None)), macros.get('dataReceiver', None))
+    if key not in _resolved:
+        if source == 'default':
+            geometry = DetectorGeometry()
+        elif source is not None:
+            geometry = DetectorGeometry.load(source)
+        else:
+            from assertViewer.assertConnection import rogue_connection
+            connection = rogue_connection(serverList, macros.get('port', None))
+            path = str(macros['dataReceiver']).split('/')[-1]
+            geometry = DetectorGeometry.from_device(connection.root.getNode(path))
+        _resolved[key] = geometry
+    geometry = _resolved[key]
+
+    if macros.get('stationZ', None) is not None or macros.get('stripPitch', None) is not None:
+        values = geometry.to_dict()
+        if macros.get('stationZ', None) is not None:
+            values['stationZ'] = macros['stationZ']
+        if macros.get('stripPitch', None) is not None:
+            values['stripPitch'] = macros['stripPitch']
+        geometry = DetectorGeometry.from_dict(values)
+    return geometry
@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+#-----------------------------------------------------------------------------
+# Title      : Incremental per-channel histograms for the strip monitor
+#-----------------------------------------------------------------------------
+
+import threading
+import numpy as np
+
+from assertViewer.assertFrameBuffer import FrameRingBuffer
+
+# Binning used when the server holds an unusable one
+DEFAULT_BINS = (0, 1000, 100)
+
+def valid_bins(binsStart, binsStop, numBins):
+    # A non-empty range with at least two bin edges
+    try:
+        return float(binsStop) > float(binsStart) and int(numBins) >= 2
+    except (TypeError, ValueError):
+        return False
+
+class ChannelHistogramEngine(object):
+    def __init__(self, asics=8, channels=64, frames=32, binsStart=0, binsStop=1000, numBins=100):
+        # Histograms of every (asic, channel, frame) cell, kept up to date one frame at a time
+        self._asics    = asics
+        self._channels = channels
+        self._frames   = frames
+        self._cells    = channels*frames
+
+        # Running moments for the pedestal (mean) and noise (RMS) maps
+        self._entries = np.zeros(asics, dtype=np.int64)
+        self._sum     = np.zeros((asics, self._cells), dtype=np.float64)
+        self._sumsq   = np.zeros((asics, self._cells), dtype=np.float64)
+
+        self.set_bins(binsStart, binsStop, numBins)
+
+    @property
+    def edges(self):
+        return self._edges
+
+    def set_bins(self, binsStart, binsStop, numBins, history=None):
+        # Same binning as np.histogram(vals, bins=np.linspace(binsStart, binsStop, numBins)).
+        # history is an optional callable returning the (depth, channels, frames) history
+        # of an ASIC. Each ASIC is then refilled in one vectorized pass the next time one
+        # of its histograms is read, so changing the bins costs nothing up front.
+        if not valid_bins(binsStart, binsStop, numBins):
+            raise Exception(f"Expected binsStart < binsStop and at least 2 bin edges, got {binsStart}, {binsStop}, {numBins}")
+        self._edges = np.linspace(binsStart, binsStop, int(numBins))
+        self._start = float(binsStart)
+        self._stop  = float(binsStop)
+        self._nbins = len(self._edges) - 1
+        self._scale = self._nbins / (self._stop - self._start)
+        self._counts = np.zeros((self._asics, self._cells, self._nbins), dtype=np.int32)
+        self._history = history
+        self._stale   = np.full(self._asics, history is not None)
+
+    def _bin_index(self, values):
+        idx = np.floor((values - self._start) * self._scale).astype(np.intp)
+        # The last bin includes its right edge, as in np.histogram
+        idx[values == self._stop] = self._nbins - 1
+        valid = (idx >= 0) & (idx < self._nbins)
+        return idx, valid
+
+    def _fill(self, asic, frame, weight):
+        values = np.asarray(frame, dtype=np.float64).reshape(self._cells)
+        idx, valid = self._bin_index(values)
+        if not self._stale[asic]:
+            # Every cell lands in exactly one bin, so plain fancy indexing is safe here
+            cells = np.nonzero(valid)[0]
+            self._counts[asic, cells, idx[valid]] += weight
+        self._entries[asic] += weight
+        self._sum[asic]     += weight*values
+        self._sumsq[asic]   += weight*values*values
+
+    def update(self, asic, frame, evicted=None):
+        # Add the newest frame and remove the one that dropped out of the history window
+        self._fill(asic, frame, 1)
+        if evicted is not None:
+            self._fill(asic, evicted, -1)
+
+    def rebuild(self, asic, frames):
+        # Refill one ASIC from a (depth, channels, frames) history
+        values = np.asarray(frames, dtype=np.float64).reshape(-1, self._cells)
+        idx, valid = self._bin_index(values)
+        flat = (np.arange(self._cells)*self._nbins + idx)[valid]
+        self._counts[asic] = np.bincount(flat, minlength=self._cells*self._nbins).reshape(self._cells, self._nbins)
+        self._entries[asic] = len(values)
+        self._sum[asic]     = values.sum(axis=0)
+        self._sumsq[asic]   = (values*values).sum(axis=0)
+        self._stale[asic]   = False
+
+    def reset(self, asic=None):
+        sel = slice(None) if asic is None else asic
+        self._counts[sel]  = 0
+        self._entries[sel] = 0
+        self._sum[sel]     = 0
+        self._sumsq[sel]   = 0
+        self._stale[sel]   = False
+
+    def histogram(self, asic, channel, frame):
+        # Returns (counts, edges) like np.histogram
+        if self._stale[asic]:
+            self.rebuild(asic, self._history(asic))
+        return self._counts[asic, channel*self._frames + frame].copy(), self._edges
+
+    def mean(self, asic):
+        # Per channel mean (pedestal map), shape (channels, frames)
+        n = max(self._entries[asic], 1)
+        return (self._sum[asic] / n).reshape(self._channels, self._frames)
+
+    def rms(self, asic):
+        # Per channel RMS around the mean (noise map), shape (channels, frames)
+        n = max(self._entries[asic], 1)
+        mean = self._sum[asic] / n
+        var  = np.maximum(self._sumsq[asic] / n - mean*mean, 0.0)
+        return np.sqrt(var).reshape(self._channels, self._frames)
+
+class ChannelHistory(object):
+    def __init__(self, asics=8, channels=64, frames=32, depth=1000, budget=None,
+                 binsStart=0, binsStop=1000, numBins=100):
+        # The local MemFrame history of every ASIC, one preallocated (depth, channels,
+        # frames) ring buffer each, and the histograms of that history window. Frames
+        # are added from one thread and read from another, every method holds the lock.
+        # budget (bytes) is shared between all ASICs.
+        if budget is not None:
+            budget = budget / asics
+        self._lock    = threading.Lock()
+        self._buffers = [FrameRingBuffer.from_memory_budget(depth, budget, (channels, frames)) for _ in range(asics)]
+        self._engine  = ChannelHistogramEngine(asics=asics, channels=channels, frames=frames,
+                                               binsStart=binsStart, binsStop=binsStop, numBins=numBins)
+
+    @property
+    def depth(self):
+        return self._buffers[0].depth
+
+    def entries(self, asic):
+        return len(self._buffers[asic])
+
+    def append(self, asic, frame):
+        # Add the newest frame, the histograms drop the one that left the window
+        with self._lock:
+            evicted = self._buffers[asic].append(frame)
+            self._engine.update(asic, self._buffers[asic].latest(), evicted)
+
+    def seed(self, asic, frames):
+        # Replace the history of one ASIC with (n, channels, frames) frames, oldest
+        # first, e.g. the server history at startup, and refill its histograms
+        with self._lock:
+            self._buffers[asic].clear()
+            self._buffers[asic].extend(frames)
+            self._engine.rebuild(asic, self._buffers[asic].ordered())
+
+    def set_bins(self, binsStart, binsStop, numBins):
+        # Raises on a bad range; the histograms are refilled from the history on next use
+        with self._lock:
+            self._engine.set_bins(binsStart, binsStop, numBins, history=lambda asic: self._buffers[asic].ordered())
+
+    def trace(self, asic, channel, frame):
+        # History of one cell, oldest frame first, or None while the history is empty
+        with self._lock:
+            if len(self._buffers[asic]):
+                return self._buffers[asic].trace(channel, frame)
+
+    def latest(self, asic):
+        with self._lock:
+            frame = self._buffers[asic].latest()
+            return None if frame is None else frame.copy()
+
+    def histogram(self, asic, channel, frame):
+        # (counts, edges) of one cell, or None while the history is empty
+        with self._lock:
+            if len(self._buffers[asic]):
+                counts, edges = self._engine.histogram(asic, channel, frame)
+                return counts, edges.copy()
+
+    def mean(self, asic):
+        with self._lock:
+            return self._engine.mean(asic)
+
+    def rms(self, asic):
+        with self._lock:
+            return self._engine.rms(asic)
@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+#-----------------------------------------------------------------------------
+# Title      : Timers and counters for the fetch, compute and render phases
+#-----------------------------------------------------------------------------
+
+import json
+import time
+import threading
+import numpy as np
+from collections import deque
+
+from qtpy.QtCore import Qt, QObject, QTimer
+from qtpy.QtWidgets import QLabel
+
+PHASES = ('fetch', 'compute', 'render')
+
+class _Phase(object):
+    # Reusable context manager, one per phase name. The display workers time the same
+    # phase at the same time, so the start times are kept per thread (a stack, in case
+    # a phase is entered again inside itself).
+    __slots__ = ('_stats', '_local')
+
+    def __init__(self, stats):
+        self._stats = stats
+        self._local = threading.local()
+
+    def __enter__(self):
+        starts = getattr(self._local, 'starts', None)
+        if starts is None:
+            starts = self._local.starts = []
+        starts.append(time.perf_counter())
+        return self
+
+    def __exit__(self, *exc):
+        self._stats.add(time.perf_counter() - self._local.starts.pop())
+        return False
+
+class PhaseStats(object):
+    def __init__(self, window=256):
+        # Totals since the start plus the last <window> samples for means and percentiles
+        self.count = 0
+        self.total = 0.0
+        self.last  = 0.0
+        self.max   = 0.0
+        self._recent = deque(maxlen=window)
+        self._lock   = threading.Lock()
+
+    def add(self, elapsed):
+        with self._lock:
+            self.count += 1
+            self.total += elapsed
+            self.last   = elapsed
+            if elapsed > self.max:
+                self.max = elapsed
+            self._recent.append(elapsed)
+
+    def summary(self):
+        with self._lock:
+            recent = np.array(self._recent)
+        return {'count'   : self.count,
+                'total_s' : self.total,
+                'last_ms' : 1e3*self.last,
+                'max_ms'  : 1e3*self.max,
+                'mean_ms' : 1e3*float(recent.mean()) if len(recent) else 0.0,
+                'p95_ms'  : 1e3*float(np.percentile(recent, 95)) if len(recent) else 0.0}
+
+class Instrumentation(object):
+    def __init__(self, name='display', window=256):
+        # Phase timers (with perf.phase('fetch'): ...), event counters, gauges such as
+        # queue depths and the rate of completed updates (perf.frame())
+        self.name    = name
+        self._window = window
+        self._phases = {}
+        self._timers = {}
+        self.counters = {}
+        self.gauges   = {}
+        self._frames  = deque(maxlen=window)
+        self.started  = time.time()
+        for phase in PHASES:
+            self._add_phase(phase)
+
+    def _add_phase(self, name):
+        stats = PhaseStats(self._window)
+        self._phases[name] = stats
+        self._timers[name] = _Phase(stats)
+
+    def phase(self, name):
+        if name not in self._timers:
+            self._add_phase(name)
+        return self._timers[name]
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def gauge(self, name, value):
+        self.gauges[name] = value
+
+    def frame(self):
+        # Called once per completed update
+        self._frames.append(time.perf_counter())
+
+    @property
+    def fps(self):
+        if len(self._frames) < 2 or time.perf_counter() - self._frames[-1] > 2.0:
+            return 0.0
+        return (len(self._frames) - 1) / (self._frames[-1] - self._frames[0])
+
+    def snapshot(self):
+        return {'name'     : self.name,
+                'time'     : time.time(),
+                'uptime_s' : time.time() - self.started,
+                'fps'      : self.fps,
+                'phases'   : {name : stats.summary() for name, stats in self._phases.items()},
+                'counters' : dict(self.counters),
+                'gauges'   : dict(self.gauges)}
+
+    def text(self):
+        # Compact multi-line summary for the on-screen panel
+        lines = [f'{self.fps:.1f} fps']
+        for name, stats in self._phases.items():
+            summary = stats.summary()
+            lines.append(f"{name:8s} {summary['mean_ms']:7.2f} ms (p95 {summary['p95_ms']:.2f}, max {summary['max_ms']:.2f})")
+        for name, value in self.gauges.items():
+            lines.append(f'{name:8s} {value}')
+        for name, value in self.counters.items():
+            lines.append(f'{name:8s} {value}')
+        return '\n'.join(lines)
+
+    def export(self, path):
+        # Append one JSON line with the current snapshot
+        with open(path, 'a') as f:
+            f.write(json.dumps(self.snapshot()) + '\n')
+
+class InstrumentationReporter(QObject):
+    def __init__(self, instrumentation, parent, show=False, path=None, interval=1.0, gauges=None):
+        super().__init__(parent)
+        # Every <interval> seconds: sample the gauges (name -> callable), refresh the
+        # optional stats overlay in the corner of <parent> and append a snapshot to the
+        # optional log file
+        self._perf   = instrumentation
+        self._path   = path
+        self._gauges = gauges if gauges is not None else {}
+        self._label  = None
+        if show:
+            self._label = QLabel(parent)
+            self._label.setStyleSheet('QLabel { background-color: rgba(0, 0, 0, 160); color: white; '
+                                      'font-family: monospace; padding: 4px; }')
+            self._label.setAttribute(Qt.WA_TransparentForMouseEvents)
+            self._label.move(8, 8)
+            self._label.raise_()
+            self._label.show()
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self._tick)
+        if show or path:
+            self._timer.start(int(1000*interval))
+
+    def stop(self):
+        self._timer.stop()
+
+    def _tick(self):
+        for name, read in self._gauges.items():
+            self._perf.gauge(name, read())
+        if self._label is not None:
+            self._label.setText(self._perf.text())
+            self._label.adjustSize()
+            self._label.raise_()
+        if self._path:
+            self._perf.export(self._path)
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+#-----------------------------------------------------------------------------
+# Title      : Several live displays in one process
+#-----------------------------------------------------------------------------
+# runMultiDisplay() hosts any set of displays as tabs or docks of one window. They
+# share the interpreter, Qt, pydm and pyqtgraph, the Rogue connection (assertConnection),
+# the PyDM channels of equal addresses and the cached ASIC signal arrays
+# (shared_signal_cache), so memory and server load barely grow with every extra view.
+
+import os
+import importlib
+
+# Display name -> (module, pydm.Display subclass)
+DISPLAYS = {'event'      : ('assertViewer.assertGUI',                    'assertGUI'),
+            'channel'    : ('assertViewer.assertGUIChannelMonitoring',   'assertGUIChannelMonitoring'),
+            'beam'       : ('assertViewer.assertGUIBeamGeometry',        'assertGUIBeamGeometry'),
+            'particle'   : ('assertViewer.assertGUIParticleMonitoring',  'assertGUIParticleMonitoring'),
+            'trajectory' : ('assertViewer.assertGUITrajectory',          'assertGUITrajectory')}
+
+LAYOUTS = ('tabs', 'docks')
+
+def display_class(name):
+    if name not in DISPLAYS:
+        raise Exception(f"Unknown display '{name}', expected one of {', '.join(DISPLAYS)}")
+    module, cls = DISPLAYS[name]
+    return getattr(importlib.import_module(module), cls)
+
+def build_window(displays, macros, layout='tabs'):
+    # One QMainWindow with a tab or a dock per display; returns (window, {name: display})
+    from qtpy.QtCore import Qt
+    from qtpy.QtWidgets import QMainWindow, QTabWidget, QDockWidget
+
+    if layout not in LAYOUTS:
+        raise Exception(f"Unknown layout '{layout}', expected one of {', '.join(LAYOUTS)}")
+
+    window = QMainWindow()
+    views  = {}
+    tabs   = None
+    if layout == 'tabs':
+        tabs = QTabWidget(window)
+        window.setCentralWidget(tabs)
+    for name in displays:
+        view = display_class(name)(parent=window, macros=dict(macros, title=name))
+        views[name] = view
+        if tabs is not None:
+            tabs.addTab(view, name.capitalize())
+        else:
+            dock = QDockWidget(name.capitalize(), window)
+            dock.setObjectName(name)
+            dock.setWidget(view)
+            dock.setFeatures(QDockWidget.DockWidgetMovable | QDockWidget.DockWidgetFloatable)
+            window.addDockWidget(Qt.TopDockWidgetArea if len(views) % 2 else Qt.BottomDockWidgetArea, dock)
+    return window, views
+
+def runMultiDisplay(displays,dataReceiver,serverList='localhost:9090',geometry=None,port='9090',
+                    title=None,sizeX=1600,sizeY=1000,layout='tabs',maxFps=10,
+                    showStats=False,statsLog=None,statsInterval=1.0,**options):
+    # <options> are the display specific settings of the single display commands
+    # (historyDepth, profileWindow, calibration, stationZ, ...), each display reads its own
+    import pydm
+    from assertViewer.assertStartup import report_on_event_loop
+    from assertViewer.assertConnection import close_connections
+
+    os.environ['ROGUE_SERVERS'] = serverList
+
+    if title is None:
+        title = "Assert Live Displays: {}".format(os.getenv('ROGUE_SERVERS'))
+
+    macrosA = {}
+    macrosA['dataReceiver'] = dataReceiver
+    macrosA['geometry'] = geometry
+    macrosA['sizeX'] = sizeX
+    macrosA['sizeY'] = sizeY
+    macrosA['port' ] = port
+    macrosA['serverList'] = serverList
+    macrosA['maxFps'] = maxFps
+    macrosA['showStats'] = showStats
+    macrosA['statsLog'] = statsLog
+    macrosA['statsInterval'] = statsInterval
+    macrosA.update({key : value for key, value in options.items() if value is not None})
+
+    app = pydm.PyDMApplication(hide_nav_bar=True,
+                               hide_menu_bar=True,
+                               hide_status_bar=True)
+    window, views = build_window(displays, macrosA, layout)
+    window.setWindowTitle(title)
+    window.resize(sizeX, sizeY)
+    window.show()
+    report_on_event_loop(title)
+    app.exec()
+    close_connections()
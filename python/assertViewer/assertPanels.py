@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+#-----------------------------------------------------------------------------
+# Title      : Sensor panels built from the detector geometry
+#-----------------------------------------------------------------------------
+# The .ui files of the displays only hold an empty 'sensorPanels' widget where the
+# per ASIC (or per station) plots go. SensorPanels fills it with one plot per sensor
+# of the geometry, so the number of panels follows the detector and Qt no longer
+# parses and builds eight copies of every plot from XML. A .ui file that still has
+# numbered plots (<prefix>1, <prefix>2, ..., as the *_static.ui files) works as before.
+
+from qtpy.QtCore import Qt
+from qtpy.QtWidgets import QGridLayout, QLabel
+
+from assertViewer.assertPlotting import ui_panels
+
+# Name of the placeholder widget in the .ui files
+PLACEHOLDER = 'sensorPanels'
+
+def image_panel(parent):
+    # Channel display: channels x memory frames image of one ASIC
+    from pydm.widgets import PyDMImageView
+    view = PyDMImageView(parent)
+    view.readingOrder = PyDMImageView.Clike
+    view.maxRedrawRate = 30
+    view.showAxes = True
+    return view
+
+def waveform_plot_panel(parent):
+    # Event display: signal per channel of one ASIC
+    from pydm.widgets import PyDMWaveformPlot
+    plot = PyDMWaveformPlot(parent)
+    plot.setShowXGrid(True)
+    plot.setShowYGrid(True)
+    plot.setShowLegend(True)
+    plot.setXLabels(['Channel Index'])
+    return plot
+
+def plot_panel(parent):
+    # Particle and beam displays: plain pyqtgraph plot
+    import pyqtgraph as pg
+    return pg.PlotWidget(parent)
+
+class SensorPanels(object):
+    # The plot widgets of the sensor panels, in sensor order (panel i shows sensor i+1)
+    def __init__(self, widgets, labels=None):
+        self.widgets = list(widgets)
+        self.labels  = list(labels) if labels is not None else []
+
+    def __len__(self):
+        return len(self.widgets)
+
+    def __iter__(self):
+        return iter(self.widgets)
+
+    def __getitem__(self, index):
+        return self.widgets[index]
+
+    @classmethod
+    def build(cls, container, count, factory, name='panel', rows=None, caption=None):
+        # <count> widgets <factory>(container), filled column by column into <rows> rows
+        # (two up to eight panels, more beyond) and each under a caption(i) label if
+        # given; i = 1 ... count
+        if rows is None:
+            rows = min(count, max(2, -(-count // 4)))
+        span = 2 if caption is not None else 1
+        layout = QGridLayout(container)
+        layout.setContentsMargins(0, 0, 0, 0)
+        widgets = []
+        labels  = []
+        for i in range(count):
+            column, row = divmod(i, rows)
+            if caption is not None:
+                label = QLabel(caption(i+1), container)
+                label.setObjectName(f'{name}Label_{i+1}')
+                label.setAlignment(Qt.AlignCenter)
+                label.setMaximumHeight(25)
+                layout.addWidget(label, span*row, column)
+                labels.append(label)
+            widget = factory(container)
+            widget.setObjectName(f'{name}_{i+1}')
+            layout.addWidget(widget, span*row + span-1, column)
+            layout.setRowStretch(span*row + span-1, 1)
+            widgets.append(widget)
+        return cls(widgets, labels)
+
+    @classmethod
+    def from_ui(cls, ui, prefix, count):
+        # The numbered widgets <prefix>1 ... of a .ui file, as many as it provides
+        return cls([getattr(ui, f'{prefix}{i}') for i in range(1, ui_panels(ui, prefix, count)+1)])
+
+def sensor_panels(ui, prefix, count, factory, name='panel', rows=None, caption=None):
+    # Built into the placeholder when the .ui file has one, else its numbered widgets
+    container = getattr(ui, PLACEHOLDER, None)
+    if container is not None:
+        return SensorPanels.build(container, count, factory, name=name, rows=rows, caption=caption)
+    return SensorPanels.from_ui(ui, prefix, count)
@@ -0,0 +1,274 @@
+#!/usr/bin/env python
+#-----------------------------------------------------------------------------
+# Title      : Conversion of ASIC counts to photons, electrons and LET
+#-----------------------------------------------------------------------------
+
+import time
+import numpy as np
+
+from assertViewer.assertFrameBuffer import FrameRingBuffer
+
+# Silicon constants
+PAIR_ENERGY      = 3.62    # eV per electron-hole pair
+FANO_FACTOR      = 0.115
+SILICON_DENSITY  = 2329.0  # mg/cm^3
+MIP_PAIRS        = 8.0e5   # most probable electron-hole pairs per cm for a minimum ionizing particle
+
+class ParticleCalibration(object):
+    def __init__(self, asics=8, channels=64, gain=1.0, pedestal=0.0, noise=0.0,
+                 thickness=0.03, photonEnergy=8000.0):
+        # Per channel calibration tables, all of shape (asics, channels)
+        #   gain         : collected electrons (charge) per ADC count
+        #   pedestal     : ADC counts without signal
+        #   noise        : RMS noise in ADC counts
+        # Sensor constants
+        #   thickness    : sensor thickness in cm
+        #   photonEnergy : photon energy in eV
+        shape = (asics, channels)
+        self.gain         = np.broadcast_to(np.asarray(gain, dtype=np.float64), shape).copy()
+        self.pedestal     = np.broadcast_to(np.asarray(pedestal, dtype=np.float64), shape).copy()
+        self.noise        = np.broadcast_to(np.asarray(noise, dtype=np.float64), shape).copy()
+        self.thickness    = float(thickness)
+        self.photonEnergy = float(photonEnergy)
+
+    @classmethod
+    def load(cls, path):
+        # Calibration tables saved with save(), or any .npz holding the same keys
+        with np.load(path) as data:
+            gain = data['gain']
+            kwargs = {key : data[key] for key in ('pedestal', 'noise', 'thickness', 'photonEnergy') if key in data}
+        return cls(asics=gain.shape[0], channels=gain.shape[1], gain=gain, **kwargs)
+
+    def save(self, path):
+        np.savez(path, gain=self.gain, pedestal=self.pedestal, noise=self.noise,
+                 thickness=self.thickness, photonEnergy=self.photonEnergy)
+
+def convert_counts(counts, calibration):
+    # Convert (..., asics, channels) ADC counts to particle quantities in one pass.
+    # Returns a dict with the collected charge (electron-hole pairs), the number of
+    # incident photons and electrons and the LET (MeV cm^2/mg) per channel, each with
+    # its statistical error (<quantity>_err).
+    counts = np.asarray(counts, dtype=np.float64)
+    gain   = calibration.gain
+
+    # Collected charge and its variance: Fano-limited pair statistics plus electronic noise
+    charge     = np.clip((counts - calibration.pedestal) * gain, 0.0, None)
+    noise_e    = calibration.noise * gain
+    charge_err = np.sqrt(FANO_FACTOR*charge + noise_e*noise_e)
+
+    # Deposited energy in eV
+    energy     = charge * PAIR_ENERGY
+    energy_err = charge_err * PAIR_ENERGY
+
+    # Photons counted from the deposited energy, Poisson statistics plus noise
+    photons     = energy / calibration.photonEnergy
+    noise_ph    = noise_e * PAIR_ENERGY / calibration.photonEnergy
+    photons_err = np.sqrt(photons + noise_ph*noise_ph)
+
+    # Incident electrons as minimum ionizing particles crossing the sensor
+    mip_pairs     = MIP_PAIRS * calibration.thickness
+    electrons     = charge / mip_pairs
+    noise_el      = noise_e / mip_pairs
+    electrons_err = np.sqrt(electrons + noise_el*noise_el)
+
+    # Linear energy transfer through the sensor
+    scale   = 1e-6 / (SILICON_DENSITY * calibration.thickness)
+    LET     = energy * scale
+    LET_err = energy_err * scale
+
+    return {'charge'        : charge,
+            'charge_err'    : charge_err,
+            'photons'       : photons,
+            'photons_err'   : photons_err,
+            'electrons'     : electrons,
+            'electrons_err' : electrons_err,
+            'LET'           : LET,
+            'LET_err'       : LET_err}
+
+class ParticleResultCache(object):
+    QUANTITIES = ('photons', 'electrons', 'LET')
+
+    def __init__(self, asics=8, channels=64, depth=1000):
+        # All particle quantities of the newest event, computed once per event, plus
+        # their per event history and running sums for integrated plots. Fed with
+        # every event, so the history and the sums cover every frame of the run.
+        self.frame   = None
+        self.result  = None
+        self.valid   = np.zeros(asics, dtype=bool)
+        self.entries = 0
+        self._history = {q : FrameRingBuffer(depth, (asics, channels), dtype=np.float64) for q in self.QUANTITIES}
+        self._sums    = {q : np.zeros((asics, channels), dtype=np.float64) for q in self.QUANTITIES}
+        self._sumsq   = {q : np.zeros((asics, channels), dtype=np.float64) for q in self.QUANTITIES}
+
+    def update(self, counts, calibration, valid=None, frame=None):
+        # Convert and record one event. Every call is a new event: the frame counter
+        # arrives on its own channel and may repeat, so it only tags the result.
+        self.result = convert_counts(counts, calibration)
+        self.frame  = frame
+        if valid is not None:
+            self.valid[:] = valid
+        else:
+            self.valid[:] = True
+        for q in self.QUANTITIES:
+            self._history[q].append(self.result[q])
+            self._sums[q]  += self.result[q]
+            self._sumsq[q] += self.result[f'{q}_err']**2
+        self.entries += 1
+        return self.result
+
+    def reset(self):
+        for q in self.QUANTITIES:
+            self._history[q].clear()
+            self._sums[q][:]  = 0
+            self._sumsq[q][:] = 0
+        self.entries = 0
+
+    def history(self, quantity):
+        # (frames, asics, channels), oldest frame first
+        return self._history[quantity].ordered()
+
+    def integrated(self, quantity):
+        # Running sum since the last reset and its statistical error
+        return self._sums[quantity], np.sqrt(self._sumsq[quantity])
+
+class ParticleAccumulator(object):
+    WINDOWS = ('frames', 'time', 'total')
+
+    # Frames the time window buffers hold at first
+    INITIAL_CAPACITY = 64
+
+    def __init__(self, asics=8, channels=64, frames=100, seconds=10.0, capacity=10000):
+        # Per channel sums of all particle quantities over three windows: the last
+        # <frames> frames, the last <seconds> seconds (at most <capacity> frames) and
+        # everything since the last reset. Each frame is added to and the frames
+        # leaving a window are subtracted from fixed-size buffers, so an update costs
+        # the same whatever the window lengths. The time window buffers start small
+        # and double while the window holds more frames, so memory follows the rate.
+        self._shape    = (len(ParticleResultCache.QUANTITIES), asics, channels)
+        self._seconds  = float(seconds)
+        self._capacity = max(int(capacity), 1)
+
+        # The frames are stored as float32, the sums are float64
+        depth = min(self.INITIAL_CAPACITY, self._capacity)
+        self._frame_values = FrameRingBuffer(frames, self._shape, dtype=np.float32)
+        self._frame_var    = FrameRingBuffer(frames, self._shape, dtype=np.float32)
+        self._frame_stamps = FrameRingBuffer(frames, (), dtype=np.float64)
+        self._time_values  = FrameRingBuffer(depth, self._shape, dtype=np.float32)
+        self._time_var     = FrameRingBuffer(depth, self._shape, dtype=np.float32)
+        self._time_stamps  = FrameRingBuffer(depth, (), dtype=np.float64)
+
+        self._sums = {w : np.zeros(self._shape, dtype=np.float64) for w in self.WINDOWS}
+        self._vars = {w : np.zeros(self._shape, dtype=np.float64) for w in self.WINDOWS}
+        self.reset()
+
+    def reset(self, now=None):
+        for buf in (self._frame_values, self._frame_var, self._frame_stamps,
+                    self._time_values, self._time_var, self._time_stamps):
+            buf.clear()
+        for w in self.WINDOWS:
+            self._sums[w][:] = 0
+            self._vars[w][:] = 0
+        self.entries    = 0
+        # Updates since the window sums were last recomputed from the buffers
+        self._frame_updates = 0
+        self._time_updates  = 0
+        self.reset_time = time.time() if now is None else now
+        self.last_time  = self.reset_time
+        # Time stamps of the last frame that left each window, where the window starts
+        self._frame_start = self.reset_time
+        self._time_start  = self.reset_time
+
+    def add(self, result, now=None):
+        # result is the dict returned by convert_counts
+        now = time.time() if now is None else now
+        # Rounded to the stored precision first, so the value that leaves a window
+        # later is exactly the one that was added
+        values = np.stack([result[q] for q in ParticleResultCache.QUANTITIES]).astype(np.float32)
+        var    = np.stack([result[f'{q}_err']**2 for q in ParticleResultCache.QUANTITIES]).astype(np.float32)
+
+        # Last N frames
+        old_values = self._frame_values.append(values)
+        old_var    = self._frame_var.append(var)
+        old_stamp = self._frame_stamps.append(now)
+        if old_stamp is not None:
+            self._frame_start = float(old_stamp)
+        self._sums['frames'] += values
+        self._vars['frames'] += var
+        if old_values is not None:
+            self._sums['frames'] -= old_values
+            self._vars['frames'] -= old_var
+        self._frame_updates += 1
+        if self._frame_updates >= self._frame_values.depth:
+            self._resum('frames', self._frame_values, self._frame_var)
+            self._frame_updates = 0
+
+        # Last T seconds
+        while len(self._time_stamps) and self._time_stamps.oldest() <= now - self._seconds:
+            self._expire_oldest()
+        if len(self._time_stamps) == self._time_stamps.depth:
+            if self._time_stamps.depth < self._capacity:
+                depth = min(2*self._time_stamps.depth, self._capacity)
+                for buf in (self._time_values, self._time_var, self._time_stamps):
+                    buf.resize(depth)
+            else:
+                self._expire_oldest()
+        self._time_values.append(values)
+        self._time_var.append(var)
+        self._time_stamps.append(now)
+        self._sums['time'] += values
+        self._vars['time'] += var
+        self._time_updates += 1
+        if self._time_updates >= self._time_values.depth:
+            self._resum('time', self._time_values, self._time_var)
+            self._time_updates = 0
+
+        # Since reset
+        self._sums['total'] += values
+        self._vars['total'] += var
+
+        self.entries  += 1
+        self.last_time = now
+
+    def _resum(self, window, values, var):
+        # The running add/subtract leaves rounding errors behind, start over from the
+        # frames in the window once per buffer length of updates
+        self._sums[window][:] = values.sum()
+        self._vars[window][:] = var.sum()
+
+    def _expire_oldest(self):
+        self._time_start = float(self._time_stamps.popleft())
+        self._sums['time'] -= self._time_values.popleft()
+        self._vars['time'] -= self._time_var.popleft()
+
+    def duration(self, window):
+        # Time covered by a window in seconds
+        if window == 'frames':
+            start = self._frame_start
+        elif window == 'time':
+            start = max(self._time_start, self.last_time - self._seconds)
+        else:
+            start = self.reset_time
+        return max(self.last_time - start, 0.0)
+
+    def accumulated(self, quantity, window='total'):
+        # Returns (sum, error, rate, rate error) arrays of shape (asics, channels)
+        q   = ParticleResultCache.QUANTITIES.index(quantity)
+        val = self._sums[window][q]
+        err = np.sqrt(np.maximum(self._vars[window][q], 0.0))
+        duration = self.duration(window)
+        if duration > 0:
+            return val, err, val/duration, err/duration
+        return val, err, np.zeros_like(val), np.zeros_like(err)
+
+    def export(self, path):
+        # Save the accumulated arrays of all windows and quantities to an .npz file
+        data = {'reset_time' : self.reset_time, 'last_time' : self.last_time, 'entries' : self.entries}
+        for w in self.WINDOWS:
+            data[f'{w}_duration'] = self.duration(w)
+            for q in ParticleResultCache.QUANTITIES:
+                val, err, rate, rate_err = self.accumulated(q, w)
+                data[f'{w}_{q}']          = val
+                data[f'{w}_{q}_err']      = err
+                data[f'{w}_{q}_rate']     = rate
+                data[f'{w}_{q}_rate_err'] = rate_err
+        np.savez(path, **data)
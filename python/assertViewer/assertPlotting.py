@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+#-----------------------------------------------------------------------------
+# Title      : Plot adapters fed directly with NumPy arrays
+#-----------------------------------------------------------------------------
+
+import numpy as np
+import pyqtgraph as pg
+
+class LocalCurve(object):
+    # A line on a PyDM (or plain pyqtgraph) plot whose data comes from local arrays
+    # instead of a Rogue variable, so nothing has to be written to the server first
+    def __init__(self, plot, color='orange', lineWidth=3, yAxisName=None, name=None):
+        self._plot = plot
+        self._item = pg.PlotDataItem(x=[], y=[], pen=pg.mkPen(color, width=lineWidth), name=name)
+        self._plot.addItem(self._item)
+        if yAxisName is not None:
+            self._plot.setLabel('left', yAxisName)
+
+    @property
+    def item(self):
+        return self._item
+
+    def setData(self, y, x=None):
+        y = np.asarray(y)
+        if x is None:
+            x = np.arange(len(y))
+        self._item.setData(x=np.asarray(x), y=y)
+
+    def setHistogram(self, counts, edges):
+        # Draw the counts at the bin centres
+        edges = np.asarray(edges)
+        self.setData(counts, x=0.5*(edges[1:] + edges[:-1]))
+
+    def clear(self):
+        self._item.setData(x=[], y=[])
+
+def ui_panels(ui, prefix, count):
+    # How many of the sensor panels <prefix>1 ... <prefix><count> the .ui file provides
+    n = 0
+    while n < count and hasattr(ui, f'{prefix}{n+1}'):
+        n += 1
+    return n
@@ -0,0 +1,254 @@
+#!/usr/bin/env python
+#-----------------------------------------------------------------------------
+# Title      : Append-only chunked recording of ASIC frames
+#-----------------------------------------------------------------------------
+# File layout (little endian):
+#   file header  : FILE_HEADER (magic, version, asics, channels, frames)
+#   chunk        : CHUNK_HEADER (magic, records, codec, payload bytes) + payload
+#   payload      : <records> fixed-size records (record_dtype), zlib compressed if codec is CODEC_ZLIB
+# Every chunk is also listed in a sidecar <file>.idx (INDEX_MAGIC + INDEX_DTYPE entries) so a
+# reader can seek to any record without scanning the file. Both files are only ever appended
+# to; a run that stops uncleanly loses at most the chunk that was being written.
+
+import os
+import time
+import zlib
+import queue
+import struct
+import threading
+import numpy as np
+from functools import partial
+
+FILE_MAGIC   = b'ASRTREC\x01'
+INDEX_MAGIC  = b'ASRTIDX\x01'
+CHUNK_MAGIC  = b'CHNK'
+FILE_VERSION = 1
+
+FILE_HEADER  = struct.Struct('<8sIIIIII')
+CHUNK_HEADER = struct.Struct('<4sIIIQ')
+
+CODEC_RAW  = 0
+CODEC_ZLIB = 1
+
+INDEX_DTYPE = np.dtype([('offset',  '<u8'),   # file offset of the chunk header
+                        ('first',   '<u8'),   # number of the first record in the chunk
+                        ('records', '<u4'),
+                        ('codec',   '<u4'),
+                        ('frame',   '<i8'),   # frame counter of the first record
+                        ('time',    '<f8')])  # time stamp of the first record
+
+def record_dtype(asics=8, channels=64, frames=32):
+    # One event: frame counter, time stamp, the Sig array and the MemFrame of every ASIC
+    return np.dtype([('frame', '<i8'),
+                     ('time',  '<f8'),
+                     ('sig',   '<f4', (asics, channels)),
+                     ('mem',   '<f4', (asics, channels, frames))])
+
+def index_path(path):
+    return f'{path}.idx'
+
+class FrameRecorder(object):
+    def __init__(self, path, asics=8, channels=64, frames=32, compress=False, level=1,
+                 chunkRecords=64, flushInterval=1.0, queueSize=1024):
+        # write() only queues the event; a background thread packs chunkRecords events
+        # into a chunk, compresses it when requested and appends it to the file. A chunk
+        # is also written once flushInterval seconds have passed since its first event.
+        # When the queue is full new events are dropped and counted instead of blocking.
+        self._path   = path
+        self._dtype  = record_dtype(asics, channels, frames)
+        self._codec  = CODEC_ZLIB if compress else CODEC_RAW
+        self._level  = level
+        self._chunk  = np.zeros(chunkRecords, dtype=self._dtype)
+        self._fill   = 0
+        self._flush_interval = flushInterval
+        self._queue  = queue.Queue(maxsize=queueSize)
+
+        self.records = 0
+        self.chunks  = 0
+        self.dropped = 0
+        self.bytes_in  = 0
+        self.bytes_out = 0
+
+        self._file  = open(path, 'wb')
+        self._index = open(index_path(path), 'wb')
+        self._file.write(FILE_HEADER.pack(FILE_MAGIC, FILE_VERSION, asics, channels, frames, 0, 0))
+        self._index.write(INDEX_MAGIC)
+
+        self._thread = threading.Thread(target=self._run, name='FrameRecorder', daemon=True)
+        self._thread.start()
+
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def dtype(self):
+        return self._dtype
+
+    @property
+    def pending(self):
+        return self._queue.qsize()
+
+    def write(self, frame, sig, mem, timestamp=None, block=False):
+        # Queue one event, returns False if it had to be dropped
+        if timestamp is None:
+            timestamp = time.time()
+        try:
+            self._queue.put((frame, timestamp, np.array(sig, dtype=np.float32), np.array(mem, dtype=np.float32)), block=block)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        return True
+
+    def close(self):
+        # Write everything still queued and close both files
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+        self._file.close()
+        self._index.close()
+
+    def stats(self):
+        return {'records'   : self.records,
+                'chunks'    : self.chunks,
+                'dropped'   : self.dropped,
+                'pending'   : self.pending,
+                'bytes_in'  : self.bytes_in,
+                'bytes_out' : self.bytes_out}
+
+    def _run(self):
+        started = None
+        while True:
+            timeout = None
+            if started is not None:
+                timeout = max(started + self._flush_interval - time.monotonic(), 0.0)
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                self._write_chunk()
+                started = None
+                continue
+            if item is None:
+                self._write_chunk()
+                return
+            self._chunk[self._fill] = item
+            self._fill += 1
+            if started is None:
+                started = time.monotonic()
+            if self._fill == len(self._chunk):
+                self._write_chunk()
+                started = None
+
+    def _write_chunk(self):
+        if self._fill == 0:
+            return
+        records = self._chunk[:self._fill]
+        payload = records.tobytes()
+        self.bytes_in += len(payload)
+        if self._codec == CODEC_ZLIB:
+            payload = zlib.compress(payload, self._level)
+
+        offset = self._file.tell()
+        self._file.write(CHUNK_HEADER.pack(CHUNK_MAGIC, self._fill, self._codec, 0, len(payload)))
+        self._file.write(payload)
+        self._file.flush()
+
+        entry = np.zeros(1, dtype=INDEX_DTYPE)
+        entry['offset'], entry['first'], entry['records'], entry['codec'] = offset, self.records, self._fill, self._codec
+        entry['frame'], entry['time'] = records[0]['frame'], records[0]['time']
+        self._index.write(entry.tobytes())
+        self._index.flush()
+
+        self.bytes_out += CHUNK_HEADER.size + len(payload)
+        self.records += self._fill
+        self.chunks  += 1
+        self._fill = 0
+
+class LiveRecorder(object):
+    def __init__(self, device, recorder, asics=8):
+        # Feeds a FrameRecorder from the ASIC{n}Sig, ASIC{n}MemFrame and ASIC0FrameCnt
+        # variables of a (virtual) AsicSampleProcessor. An event is written once the Sig
+        # array and MemFrame of every ASIC have been updated.
+        self._device   = device
+        self._recorder = recorder
+        self._asics    = asics
+        shape = recorder.dtype['mem'].shape
+        self._sig = np.zeros(shape[:2], dtype=np.float32)
+        self._mem = np.zeros(shape, dtype=np.float32)
+        self._updated = np.zeros((2, asics), dtype=bool)
+        self._frame_cnt = 0
+        self._lock = threading.Lock()
+
+    def start(self):
+        for i in np.arange(self._asics):
+            getattr(self._device, f'ASIC{i}Sig').addListener(partial(self._receive, 0, int(i)))
+            getattr(self._device, f'ASIC{i}MemFrame').addListener(partial(self._receive, 1, int(i)))
+        self._device.ASIC0FrameCnt.addListener(self._receive_frame_cnt)
+
+    def _receive_frame_cnt(self, path, value):
+        self._frame_cnt = int(value.value)
+
+    def _receive(self, kind, asic, path, value):
+        value = np.asarray(value.value, dtype=np.float32)
+        with self._lock:
+            if kind == 0:
+                n = min(value.size, self._sig.shape[1])
+                self._sig[asic,:n] = value.ravel()[:n]
+            else:
+                self._mem[asic] = value.reshape(self._mem.shape[1:])
+            self._updated[kind,asic] = True
+            if self._updated.all():
+                self._recorder.write(self._frame_cnt, self._sig, self._mem)
+                self._updated[:] = False
+
+def runRecorder(output,port='9099',compress=False,chunkRecords=64,duration=None,statsInterval=5.0,serverList=None):
+    # Record the live AsicSampleProcessor to <output> until Ctrl-C or <duration> seconds
+    from assertViewer.assertConnection import rogue_connection, close_connections
+    from assertViewer.assertGeometry import DetectorGeometry
+
+    # Records are sized from the geometry of the server
+    device   = rogue_connection(serverList, port).root.AsicSampleProcessor
+    geometry = DetectorGeometry.from_device(device)
+    recorder = FrameRecorder(output, asics=geometry.asics, channels=geometry.channels, frames=geometry.frames,
+                             compress=compress, chunkRecords=chunkRecords)
+    start = time.time()
+    try:
+        live = LiveRecorder(device, recorder, asics=geometry.asics)
+        live.start()
+        while duration is None or time.time() - start < duration:
+            time.sleep(statsInterval if duration is None else min(statsInterval, max(duration - (time.time() - start), 0.0)))
+            print(f"Recorded {recorder.records} events ({recorder.bytes_out/1e6:.1f} MB), "
+                  f"{recorder.pending} queued, {recorder.dropped} dropped")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        recorder.close()
+        close_connections()
+    print(f"Wrote {recorder.records} events to {output}")
+
+def benchmark_recorder(path, records=2000, compress=False, chunkRecords=64, asics=8, channels=64, frames=32):
+    # Sustained write throughput with realistic strip data (pedestal plus noise).
+    # Events are queued as fast as the writer accepts them, so the result is the
+    # rate the background thread can sustain rather than the queueing rate.
+    rng = np.random.default_rng(0)
+    pedestal = rng.normal(1000, 50, (asics, channels, 1))
+    mem = np.rint(pedestal + rng.normal(0, 5, (16, asics, channels, frames))).astype(np.float32)
+    sig = mem.mean(axis=3)
+
+    recorder = FrameRecorder(path, asics=asics, channels=channels, frames=frames, compress=compress,
+                             chunkRecords=chunkRecords)
+    start = time.perf_counter()
+    for n in range(records):
+        recorder.write(n, sig[n % 16], mem[n % 16], block=True)
+    recorder.close()
+    elapsed = time.perf_counter() - start
+
+    stats = recorder.stats()
+    stats['seconds']    = elapsed
+    stats['rate']       = records / elapsed
+    stats['mb_per_s']   = stats['bytes_in'] / elapsed / 1e6
+    stats['ratio']      = stats['bytes_in'] / max(stats['bytes_out'], 1)
+    stats['file_bytes'] = os.path.getsize(path)
+    return stats
@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+#-----------------------------------------------------------------------------
+# Title      : Frame-rate-decoupled refresh scheduler for the displays
+#-----------------------------------------------------------------------------
+
+from qtpy.QtCore import QObject, QTimer
+
+class RefreshScheduler(QObject):
+    def __init__(self, callback, maxFps=10, label=None, parent=None):
+        super().__init__(parent)
+        # Frame notifications only mark the display dirty; the redraw callback runs at
+        # most maxFps times per second and always sees the newest data, so a burst of
+        # frames is merged into a single redraw instead of building up a backlog
+        self._callback = callback
+        self._label    = label
+        self._pending  = 0
+        self.frames_received = 0
+        self.frames_merged   = 0
+        self.redraws         = 0
+
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self._tick)
+        self.setMaxFps(maxFps)
+
+    def setMaxFps(self, maxFps):
+        # maxFps <= 0 redraws as often as the Qt event loop allows
+        maxFps = float(maxFps) if maxFps is not None else 0.0
+        self._timer.start(int(1000/maxFps) if maxFps > 0 else 0)
+
+    @property
+    def pending(self):
+        # Frames received since the last redraw
+        return self._pending
+
+    def notify(self, *args):
+        # Connected to the frame-count signal of a display
+        self._pending += 1
+        self.frames_received += 1
+
+    def stop(self):
+        self._timer.stop()
+
+    def stats(self):
+        return {'frames_received' : self.frames_received,
+                'frames_merged'   : self.frames_merged,
+                'redraws'         : self.redraws}
+
+    def _tick(self):
+        if self._pending == 0:
+            return
+        self.frames_merged += self._pending - 1
+        self._pending = 0
+        self.redraws += 1
+        self._callback()
+        if self._label is not None:
+            self._label.setText(f'{self.redraws} redraws, {self.frames_merged} frames merged')
@@ -0,0 +1,257 @@
+#!/usr/bin/env python
+#-----------------------------------------------------------------------------
+# Title      : Offline replay of recorded ASIC frames
+#-----------------------------------------------------------------------------
+# RecordFileReader memory-maps a file written by assertRecorder, ReplayRoot serves it
+# through an emulated AsicSampleProcessor on the usual Rogue server port, so the live
+# displays run on recorded data without any change.
+
+import os
+import mmap
+import time
+import zlib
+import threading
+import numpy as np
+import pyrogue as pr
+
+from assertViewer.assertSampleProcessor import AsicSampleProcessorEmulator
+from assertViewer.assertRecorder import (FILE_MAGIC, INDEX_MAGIC, CHUNK_MAGIC, FILE_HEADER, CHUNK_HEADER,
+                                         CODEC_RAW, INDEX_DTYPE, record_dtype, index_path)
+
+class RecordFileReader(object):
+    def __init__(self, path):
+        # Raw chunks are read straight from the mapping without a copy, so opening and
+        # seeking cost the same for any file size; zlib chunks are decompressed on access.
+        self._path = path
+        self._file = open(path, 'rb')
+        self._map  = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, asics, channels, frames, _, _ = FILE_HEADER.unpack_from(self._map, 0)
+        if magic != FILE_MAGIC:
+            raise Exception(f"{path} is not an ASSERT record file")
+        self.asics, self.channels, self.frames = asics, channels, frames
+        self._dtype = record_dtype(asics, channels, frames)
+
+        self._cached = (None, None)
+        self._index  = self._load_index()
+        self._starts = self._index['first'].astype(np.int64)
+
+    def _load_index(self):
+        path = index_path(self._path)
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                if f.read(len(INDEX_MAGIC)) == INDEX_MAGIC:
+                    data = f.read()
+                    # A partly written last entry is left by an unclean stop, the data
+                    # file may still hold that chunk so the headers are scanned instead
+                    if len(data) % INDEX_DTYPE.itemsize:
+                        return self._scan()
+                    index = np.frombuffer(data, dtype=INDEX_DTYPE)
+                    # Drop entries of chunks that never made it to the data file
+                    return index[self._chunk_end(index) <= len(self._map)]
+        return self._scan()
+
+    def _chunk_end(self, index):
+        ends = np.zeros(len(index), dtype=np.int64)
+        for n, offset in enumerate(index['offset']):
+            ends[n] = int(offset) + CHUNK_HEADER.size + CHUNK_HEADER.unpack_from(self._map, int(offset))[4]
+        return ends
+
+    def _scan(self):
+        # Rebuild the index from the chunk headers when the .idx file is missing
+        entries = []
+        offset, first = FILE_HEADER.size, 0
+        while offset + CHUNK_HEADER.size <= len(self._map):
+            magic, records, codec, _, length = CHUNK_HEADER.unpack_from(self._map, offset)
+            if magic != CHUNK_MAGIC or offset + CHUNK_HEADER.size + length > len(self._map):
+                break
+            entries.append((offset, first, records, codec, 0, 0.0))
+            offset += CHUNK_HEADER.size + length
+            first  += records
+        index = self._index = np.array(entries, dtype=INDEX_DTYPE)
+        for n in range(len(index)):
+            head = self._chunk(n)[0]
+            index['frame'][n], index['time'][n] = head['frame'], head['time']
+        self._cached = (None, None)
+        return index
+
+    def __len__(self):
+        if len(self._index) == 0:
+            return 0
+        return int(self._starts[-1] + self._index['records'][-1])
+
+    def __getitem__(self, n):
+        if n < 0:
+            n += len(self)
+        if n < 0 or n >= len(self):
+            raise IndexError(n)
+        chunk = int(np.searchsorted(self._starts, n, side='right')) - 1
+        return self._chunk(chunk)[n - self._starts[chunk]]
+
+    @property
+    def dtype(self):
+        return self._dtype
+
+    @property
+    def duration(self):
+        if len(self) == 0:
+            return 0.0
+        return float(self[-1]['time'] - self._index['time'][0])
+
+    def find_frame(self, frame):
+        # Record number of the first event with a frame counter >= frame, using the index
+        chunk = max(int(np.searchsorted(self._index['frame'], frame, side='right')) - 1, 0)
+        records = self._chunk(chunk)
+        return int(self._starts[chunk] + np.searchsorted(records['frame'], frame))
+
+    def find_time(self, seconds):
+        # Record number at <seconds> from the start of the run
+        target = self._index['time'][0] + seconds
+        chunk = max(int(np.searchsorted(self._index['time'], target, side='right')) - 1, 0)
+        records = self._chunk(chunk)
+        return int(self._starts[chunk] + np.searchsorted(records['time'], target))
+
+    def _chunk(self, n):
+        if self._cached[0] == n:
+            return self._cached[1]
+        entry = self._index[n]
+        offset = int(entry['offset']) + CHUNK_HEADER.size
+        length = CHUNK_HEADER.unpack_from(self._map, int(entry['offset']))[4]
+        if entry['codec'] == CODEC_RAW:
+            records = np.frombuffer(self._map, dtype=self._dtype, count=int(entry['records']), offset=offset)
+        else:
+            records = np.frombuffer(zlib.decompress(self._map[offset:offset+length]), dtype=self._dtype)
+        self._cached = (n, records)
+        return records
+
+    def close(self):
+        self._cached = (None, None)
+        try:
+            self._map.close()
+        except BufferError:
+            # Records handed out earlier still view the mapping, it is released with them
+            pass
+        self._file.close()
+
+class PlaybackClock(object):
+    def __init__(self, speed=1.0):
+        # Maps record time stamps to wall clock time. speed is the playback factor,
+        # 0 plays as fast as possible.
+        self.speed = speed
+        self._anchor = None
+
+    def restart(self):
+        self._anchor = None
+
+    def wait(self, stamp, stop=None):
+        # Sleep until the record with time stamp <stamp> is due; returns early if the
+        # optional stop event is set
+        if self.speed <= 0:
+            return
+        now = time.monotonic()
+        if self._anchor is None:
+            self._anchor = (now, stamp)
+            return
+        due = self._anchor[0] + (stamp - self._anchor[1]) / self.speed
+        if due > now:
+            if stop is not None:
+                stop.wait(due - now)
+            else:
+                time.sleep(due - now)
+        elif now - due > 1.0:
+            # Too far behind (slow consumer or long gap), resynchronize instead of bursting
+            self._anchor = (now, stamp)
+
+class ReplayRoot(pr.Root):
+    def __init__(self, path, speed=1.0, start=0, loop=False, histDepth=100, serverPort=9099, **kwargs):
+        super().__init__(name='root', description='ASSERT replay', serverPort=serverPort, pollEn=False, **kwargs)
+        self._reader = RecordFileReader(path)
+        self._clock  = PlaybackClock(speed)
+        self._stop   = threading.Event()
+        self._thread = None
+        self._next   = int(start)
+
+        self.add(AsicSampleProcessorEmulator(asics=self._reader.asics, channels=self._reader.channels,
+                                             frames=self._reader.frames, histDepth=histDepth))
+
+        self.add(pr.LocalVariable(name='File',     mode='RO', value=os.path.abspath(path)))
+        self.add(pr.LocalVariable(name='Records',  mode='RO', value=len(self._reader)))
+        self.add(pr.LocalVariable(name='Position', mode='RO', value=int(start)))
+        self.add(pr.LocalVariable(name='Playing',  mode='RO', value=False))
+        self.add(pr.LocalVariable(name='Loop',     mode='RW', value=bool(loop)))
+        self.add(pr.LocalVariable(name='Speed',    mode='RW', value=float(speed),
+                                  localSet=lambda value: self.set_speed(value)))
+
+        self.add(pr.LocalCommand(name='Play',  function=lambda: self.play()))
+        self.add(pr.LocalCommand(name='Pause', function=lambda: self.pause()))
+        self.add(pr.LocalCommand(name='Seek',  value=0, function=lambda arg: self.seek(arg)))
+        self.add(pr.LocalCommand(name='SeekFrame', value=0, function=lambda arg: self.seek(self._reader.find_frame(arg))))
+
+    def set_speed(self, speed):
+        self._clock.speed = float(speed)
+        self._clock.restart()
+
+    def play(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._clock.restart()
+        self._thread = threading.Thread(target=self._run, name='ReplayRoot', daemon=True)
+        self._thread.start()
+        self.Playing.set(True)
+
+    def pause(self):
+        thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._stop.set()
+        thread.join()
+        self.Playing.set(False)
+
+    def seek(self, position):
+        # Jump to record <position> and show it, playback continues from there
+        self._next = int(min(max(int(position), 0), max(len(self._reader)-1, 0)))
+        self._clock.restart()
+        self.AsicSampleProcessor.reset_history()
+        if self._thread is None or not self._thread.is_alive():
+            self._publish(self._next)
+            self._next += 1
+
+    def _publish(self, n):
+        record = self._reader[n]
+        self.AsicSampleProcessor.publish(record['frame'], record['sig'], record['mem'])
+        self.Position.set(n)
+
+    def _run(self):
+        while not self._stop.is_set():
+            if self._next >= len(self._reader):
+                if not self.Loop.value():
+                    break
+                self._next = 0
+                self._clock.restart()
+            n = self._next
+            self._clock.wait(float(self._reader[n]['time']), self._stop)
+            if self._stop.is_set():
+                break
+            self._publish(n)
+            # seek() from another thread may have moved the position meanwhile
+            if self._next == n:
+                self._next = n + 1
+        self.Playing.set(False)
+
+    def stop(self):
+        self.pause()
+        super().stop()
+        self._reader.close()
+
+def runReplay(path,port='9099',speed=1.0,start=0,loop=False,statsInterval=5.0):
+    # Serve a recorded run on localhost:<port> until Ctrl-C
+    with ReplayRoot(path, speed=speed, start=start, loop=loop, serverPort=int(port)) as root:
+        print(f"Replaying {root.Records.value()} events from {path} on port {port}")
+        root.play()
+        try:
+            while True:
+                time.sleep(statsInterval)
+                print(f"Position {root.Position.value()}/{root.Records.value()}, playing={root.Playing.value()}")
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+#-----------------------------------------------------------------------------
+# Title      : Stand-in for the AsicSampleProcessor device read by the displays
+#-----------------------------------------------------------------------------
+# Serves the variables the displays subscribe to (ASIC{n}Sig and its pedestal/noise
+# corrected variants, ASIC{n}MemFrame, ASIC{n}MemFrameHist, ASIC{n}FrameCnt, the
+# contrast and histogram settings) from frames handed to publish(), so the displays
+# can run against a replayed or simulated source instead of the hardware.
+
+import threading
+import numpy as np
+import pyrogue as pr
+
+from assertViewer.assertFrameBuffer import FrameRingBuffer
+
+class AsicSampleProcessorEmulator(pr.Device):
+    def __init__(self, name='AsicSampleProcessor', asics=8, channels=64, frames=32, histDepth=100, **kwargs):
+        super().__init__(name=name, description='Emulated ASIC sample processor', **kwargs)
+        self._asics    = asics
+        self._channels = channels
+        self._frames   = frames
+        self._lock     = threading.Lock()
+        self._history  = [FrameRingBuffer(histDepth, (channels, frames)) for i in range(asics)]
+        # Running pedestal estimate, used when publish() is not given the pedestal
+        self._pedestal = None
+        self._alpha    = 1.0 / histDepth
+
+        self.add(pr.LocalVariable(name='MinContrast', mode='RW', value=0))
+        self.add(pr.LocalVariable(name='MaxContrast', mode='RW', value=4096))
+        self.add(pr.LocalVariable(name='BinsStart',   mode='RW', value=0))
+        self.add(pr.LocalVariable(name='BinsStop',    mode='RW', value=4096))
+        self.add(pr.LocalVariable(name='NumBins',     mode='RW', value=256))
+        self.add(pr.LocalVariable(name='NumAsics',    mode='RO', value=asics))
+        self.add(pr.LocalVariable(name='NumChannels', mode='RO', value=channels))
+        self.add(pr.LocalVariable(name='NumFrames',   mode='RO', value=frames))
+
+        for i in range(asics):
+            self.add(pr.LocalVariable(name=f'ASIC{i}FrameCnt', mode='RO', value=0))
+            for variant in ['Sig', 'SigPed', 'SigNos', 'SigNosPed']:
+                self.add(pr.LocalVariable(name=f'ASIC{i}{variant}', mode='RO', value=np.zeros(channels, dtype=np.float64)))
+            self.add(pr.LocalVariable(name=f'ASIC{i}MemFrame', mode='RO', value=np.zeros((channels, frames), dtype=np.float32)))
+            # The history cube is only assembled when somebody reads it
+            self.add(pr.LocalVariable(name=f'ASIC{i}MemFrameHist', mode='RO', value=np.zeros((histDepth, channels, frames), dtype=np.float32),
+                                      localGet=lambda asic=i: self._history[asic].ordered()))
+
+        # [:, channel, frame] column of the history of one ASIC, arg is [asic, channel, frame]
+        self.add(pr.LocalCommand(name='MemFrameHistSlice', value=[0, 0, 0],
+                                 function=lambda arg: self.history_slice(*arg)))
+
+    def history_slice(self, asic, channel, frame):
+        with self._lock:
+            return self._history[int(asic)].trace(int(channel), int(frame))
+
+    def publish(self, frame, sig, mem, pedestal=None):
+        # Push one event to all variables. sig is (asics, channels), mem is
+        # (asics, channels, frames). SigPed subtracts the pedestal, SigNos the common
+        # mode (median over the channels of each ASIC) and SigNosPed both.
+        sig = np.asarray(sig, dtype=np.float64)
+        mem = np.asarray(mem, dtype=np.float32)
+        if pedestal is None:
+            if self._pedestal is None:
+                self._pedestal = sig.copy()
+            self._pedestal += self._alpha * (sig - self._pedestal)
+            pedestal = self._pedestal
+        ped    = sig - pedestal
+        common = np.median(sig, axis=1, keepdims=True)
+        nos    = sig - common
+        nosped = ped - np.median(ped, axis=1, keepdims=True)
+
+        with self._lock:
+            for i in range(self._asics):
+                self._history[i].append(mem[i])
+
+        # The frame counter goes first so the Sig updates are tagged with the new frame
+        for i in range(self._asics):
+            getattr(self, f'ASIC{i}FrameCnt').set(int(frame))
+        for i in range(self._asics):
+            getattr(self, f'ASIC{i}MemFrame').set(mem[i])
+            getattr(self, f'ASIC{i}SigPed').set(ped[i])
+            getattr(self, f'ASIC{i}SigNos').set(nos[i])
+            getattr(self, f'ASIC{i}SigNosPed').set(nosped[i])
+            getattr(self, f'ASIC{i}Sig').set(sig[i])
+
+    def reset_history(self):
+        with self._lock:
+            for hist in self._history:
+                hist.clear()
+        self._pedestal = None
@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+#-----------------------------------------------------------------------------
+# Title      : Persistent subscriptions to the per-ASIC signal arrays
+#-----------------------------------------------------------------------------
+
+import threading
+import numpy as np
+from functools import partial
+from pydm import PyDMChannel
+
+# Caches shared by the displays of one process, see shared_signal_cache()
+_shared = {}
+
+class AsicSignalCache(object):
+    def __init__(self, dataReceiver, asics=8, channels=64, variable='Sig', callback=None, eventCallback=None):
+        # Latest ASIC{n}<variable> array of every ASIC, pushed in by PyDM channels that
+        # stay connected for the lifetime of the display. callback(asic) is called for
+        # every array, eventCallback(values, valid, frame) once every ASIC has been updated,
+        # with a private copy of that event shared by all event listeners (read only).
+        self._dataReceiver = dataReceiver
+        self._asics    = asics
+        self._channels = channels
+        self._variable = variable
+        self._callbacks       = [callback] if callback is not None else []
+        self._event_callbacks = [eventCallback] if eventCallback is not None else []
+        # snapshot() may run on a display worker thread while PyDM delivers new arrays
+        self._lock     = threading.Lock()
+        self._values   = np.zeros((asics, channels), dtype=np.float64)
+        self._valid    = np.zeros(asics, dtype=bool)
+        self._pydm_channels = []
+
+        # Last set in which every ASIC has been updated once, so a reader never mixes
+        # planes from different events, tagged with the frame counter at that time
+        self._frame_cnt = None
+        self._updated   = np.zeros(asics, dtype=bool)
+        self._complete  = np.zeros((asics, channels), dtype=np.float64)
+        self._complete_valid = np.zeros(asics, dtype=bool)
+        self._complete_frame = None
+        self._has_complete   = False
+
+    @property
+    def variable(self):
+        return self._variable
+
+    @property
+    def values(self):
+        return self._values
+
+    @property
+    def valid(self):
+        return self._valid
+
+    @property
+    def connected(self):
+        return len(self._pydm_channels) > 0
+
+    def add_listener(self, callback=None, eventCallback=None):
+        # Further callback(asic) / eventCallback(values, valid, frame) receivers
+        if callback is not None:
+            self._callbacks.append(callback)
+        if eventCallback is not None:
+            self._event_callbacks.append(eventCallback)
+
+    def remove_listener(self, callback=None, eventCallback=None):
+        if callback in self._callbacks:
+            self._callbacks.remove(callback)
+        if eventCallback in self._event_callbacks:
+            self._event_callbacks.remove(eventCallback)
+
+    def connect(self):
+        for i in np.arange(self._asics):
+            channel = PyDMChannel(address=f'{self._dataReceiver}.ASIC{i}{self._variable}', value_slot=partial(self._receive, int(i)))
+            channel.connect()
+            self._pydm_channels.append(channel)
+        channel = PyDMChannel(address=f'{self._dataReceiver}.ASIC0FrameCnt', value_slot=self._receive_frame_cnt)
+        channel.connect()
+        self._pydm_channels.append(channel)
+
+    def disconnect(self):
+        for channel in self._pydm_channels:
+            channel.disconnect()
+        self._pydm_channels = []
+
+    def retarget(self, variable):
+        # Only a change of variable touches the connections
+        if variable == self._variable and self._pydm_channels:
+            return
+        self.disconnect()
+        self._variable = variable
+        self._valid[:] = False
+        self._updated[:] = False
+        self._complete_valid[:] = False
+        self._complete_frame = None
+        self._has_complete   = False
+        self.connect()
+
+    def snapshot(self):
+        # All ASIC arrays of the newest complete event as one (asics, channels) array,
+        # read from local memory instead of one server round trip per ASIC.
+        # Returns (values, valid, frame count); before the first complete event the
+        # newest value of each ASIC is returned instead.
+        with self._lock:
+            if not self._has_complete:
+                return self._values.copy(), self._valid.copy(), self._frame_cnt
+            return self._complete.copy(), self._complete_valid.copy(), self._complete_frame
+
+    def _receive_frame_cnt(self, value):
+        self._frame_cnt = value
+
+    def _receive(self, asic, value):
+        value = np.asarray(value, dtype=np.float64).ravel()
+        n = min(len(value), self._channels)
+        event = None
+        with self._lock:
+            self._values[asic,:n] = value[:n]
+            self._values[asic,n:] = 0
+            self._valid[asic] = n > 0
+            self._updated[asic] = True
+            if self._updated.all():
+                self._complete[:] = self._values
+                self._complete_valid[:] = self._valid
+                self._complete_frame = self._frame_cnt
+                self._has_complete   = True
+                self._updated[:] = False
+                # Copied under the lock: listeners (e.g. on a worker thread) keep a
+                # consistent event while the next one is filled in
+                event = (self._complete.copy(), self._complete_valid.copy(), self._complete_frame)
+        if event is not None:
+            for function in self._event_callbacks:
+                function(*event)
+        for function in self._callbacks:
+            function(asic)
+
+def shared_signal_cache(dataReceiver, asics=8, channels=64, variable='Sig'):
+    # One connected cache per data receiver and variable for all displays of the
+    # process, so views of the same ASIC arrays share the subscriptions and the copy.
+    # Shared caches must not be retargeted.
+    key = (dataReceiver, variable, asics, channels)
+    if key not in _shared:
+        cache = AsicSignalCache(dataReceiver, asics=asics, channels=channels, variable=variable)
+        cache.connect()
+        _shared[key] = cache
+    return _shared[key]
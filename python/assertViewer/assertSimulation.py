@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+#-----------------------------------------------------------------------------
+# Title      : Simulated ASIC data source for running the displays without hardware
+#-----------------------------------------------------------------------------
+# StripSimulator generates strip data (per channel pedestal and noise plus straight
+# particle tracks through the x/y plane pairs) in batches, SimulationRoot serves it
+# through the emulated AsicSampleProcessor at a configurable frame rate.
+
+import time
+import threading
+import numpy as np
+import pyrogue as pr
+
+from assertViewer.assertSampleProcessor import AsicSampleProcessorEmulator
+
+class StripSimulator(object):
+    def __init__(self, asics=8, channels=64, frames=32, pedestal=1000.0, pedestalSpread=10.0,
+                 noise=5.0, noiseSpread=1.0, amplitude=200.0, amplitudeWidth=20.0, clusterWidth=0.6,
+                 beamX=None, beamY=None, beamSigma=4.0, divergence=0.5, stationZ=None,
+                 efficiency=0.98, occupancy=1.0, peakSample=8, shaping=3.0, seed=None):
+        # Even ASICs are x planes and odd ASICs y planes of asics/2 stations at stationZ.
+        # Every event holds at most one particle (with probability occupancy), its track
+        # starts at the beam spot (beamX, beamY, in strips, default the centre) with an
+        # RMS size beamSigma and an RMS slope divergence (strips per unit of z).
+        # Each plane sees it with probability efficiency, as a Landau-like amplitude
+        # (most probable value amplitude, ADC counts) shared over the neighbouring strips.
+        # MemFrame holds the CR-RC shaped pulse of every channel over <frames> samples,
+        # Sig is its value at peakSample.
+        self._rng = np.random.default_rng(seed)
+        self.asics    = asics
+        self.channels = channels
+        self.frames   = frames
+        self.stations = asics // 2
+        self.pedestal = self._rng.normal(pedestal, pedestalSpread, (asics, channels))
+        self.noise    = np.abs(self._rng.normal(noise, noiseSpread, (asics, channels)))
+        self.amplitude      = amplitude
+        self.amplitudeWidth = amplitudeWidth
+        self.clusterWidth   = clusterWidth
+        self.beam       = np.array([(channels+1)/2.0 if beamX is None else beamX,
+                                    (channels+1)/2.0 if beamY is None else beamY])
+        self.beamSigma  = beamSigma
+        self.divergence = divergence
+        self.stationZ   = np.arange(self.stations, dtype=np.float64) if stationZ is None else np.asarray(stationZ, dtype=np.float64)
+        self.efficiency = efficiency
+        self.occupancy  = occupancy
+        self.peakSample = peakSample
+
+        # Unit height CR-RC pulse peaking at peakSample
+        t = np.arange(frames) - (peakSample - shaping)
+        pulse = np.where(t > 0, (t/shaping) * np.exp(1.0 - t/shaping), 0.0)
+        self.pulse = pulse / pulse[peakSample]
+        self._strips = np.arange(1, channels+1, dtype=np.float64)
+
+    def tracks(self, events):
+        # Hit positions (events, asics) in strips, NaN where the plane saw nothing
+        start = self._rng.normal(self.beam, self.beamSigma, (events, 2))
+        slope = self._rng.normal(0.0, self.divergence, (events, 2))
+        pos = start[:,None,:] + slope[:,None,:] * self.stationZ[None,:,None]
+        pos = pos.reshape(events, self.asics)
+        seen = (self._rng.random((events, self.asics)) < self.efficiency) & (self._rng.random((events, 1)) < self.occupancy)
+        return np.where(seen, pos, np.nan)
+
+    def generate(self, events):
+        # Returns (sig, mem, hits): (events, asics, channels), (events, asics, channels, frames)
+        # and the true hit positions (events, asics)
+        hits = self.tracks(events)
+        amp  = np.clip(self.amplitude + self.amplitudeWidth * self._rng.gumbel(size=hits.shape), 0.0, None)
+        share = np.exp(-0.5*((self._strips - np.nan_to_num(hits, nan=-1e3)[...,None]) / self.clusterWidth)**2)
+        share /= np.sqrt(2*np.pi) * self.clusterWidth
+        signal = amp[...,None] * share
+
+        mem = self.pedestal[...,None] + signal[...,None] * self.pulse
+        mem += self._rng.standard_normal(mem.shape) * self.noise[...,None]
+        mem = np.rint(mem).astype(np.float32)
+        return mem[...,self.peakSample].astype(np.float64), mem, hits
+
+class SimulationRoot(pr.Root):
+    def __init__(self, rate=100.0, asics=8, channels=64, frames=32, histDepth=100, batch=64,
+                 serverPort=9099, seed=None, **kwargs):
+        super().__init__(name='root', description='ASSERT simulation', serverPort=serverPort, pollEn=False, **kwargs)
+        self._sim    = StripSimulator(asics=asics, channels=channels, frames=frames, seed=seed)
+        self._batch  = batch
+        self._stop   = threading.Event()
+        self._thread = None
+        # perf_counter() at which each frame was published (by frame number modulo the
+        # table size) and the CPU time of the generator thread, for latency measurements
+        self._published = np.full(1 << 16, np.nan)
+        self.cpu_time   = 0.0
+
+        self.add(AsicSampleProcessorEmulator(asics=asics, channels=channels, frames=frames, histDepth=histDepth))
+
+        self.add(pr.LocalVariable(name='Rate',         mode='RW', value=float(rate)))
+        self.add(pr.LocalVariable(name='Running',      mode='RO', value=False))
+        self.add(pr.LocalVariable(name='FrameCount',   mode='RO', value=0))
+        self.add(pr.LocalVariable(name='AchievedRate', mode='RO', value=0.0))
+
+        self.add(pr.LocalCommand(name='StartRun', function=lambda: self.start_run()))
+        self.add(pr.LocalCommand(name='StopRun',  function=lambda: self.stop_run()))
+
+    @property
+    def simulator(self):
+        return self._sim
+
+    def publish_time(self, frame):
+        return self._published[int(frame) % len(self._published)]
+
+    def start_run(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='SimulationRoot', daemon=True)
+        self._thread.start()
+        self.Running.set(True)
+
+    def stop_run(self):
+        thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._stop.set()
+        thread.join()
+        self.Running.set(False)
+
+    def _run(self):
+        # Events are generated a batch at a time and published on a fixed schedule;
+        # when publishing falls behind the schedule is reset instead of bursting
+        frame = self.FrameCount.value()
+        due = time.monotonic()
+        window_start, window_frames = due, 0
+        cpu_start = time.thread_time()
+        while not self._stop.is_set():
+            sig, mem, hits = self._sim.generate(self._batch)
+            for n in range(self._batch):
+                rate = self.Rate.value()
+                if rate > 0:
+                    due += 1.0 / rate
+                    delay = due - time.monotonic()
+                    if delay > 0:
+                        if self._stop.wait(delay):
+                            break
+                    elif delay < -1.0:
+                        due = time.monotonic()
+                self._published[frame % len(self._published)] = time.perf_counter()
+                self.AsicSampleProcessor.publish(frame, sig[n], mem[n], pedestal=self._sim.pedestal)
+                frame += 1
+                window_frames += 1
+            self.FrameCount.set(frame)
+            self.cpu_time += time.thread_time() - cpu_start
+            cpu_start = time.thread_time()
+            now = time.monotonic()
+            if now - window_start >= 1.0:
+                self.AchievedRate.set(window_frames / (now - window_start))
+                window_start, window_frames = now, 0
+        self.Running.set(False)
+
+    def stop(self):
+        self.stop_run()
+        super().stop()
+
+def runSimulation(port='9099',rate=100.0,asics=8,channels=64,seed=None,statsInterval=5.0):
+    # Serve simulated data on localhost:<port> until Ctrl-C
+    with SimulationRoot(rate=rate, asics=asics, channels=channels, serverPort=int(port), seed=seed) as root:
+        print(f"Simulating {asics} ASICs x {channels} channels at {rate} Hz on port {port}")
+        root.start_run()
+        try:
+            while True:
+                time.sleep(statsInterval)
+                print(f"{root.FrameCount.value()} frames, {root.AchievedRate.value():.1f} Hz")
+        except KeyboardInterrupt:
+            pass
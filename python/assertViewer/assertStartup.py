@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+#-----------------------------------------------------------------------------
+# Title      : Cold-start timing of the live displays
+#-----------------------------------------------------------------------------
+# Kept free of heavy imports so it can be imported first. mark() records named
+# milestones relative to the start of the process; report_on_event_loop() prints
+# them (and appends them as a JSON line to an optional log) once the Qt event loop
+# is running, i.e. once the display is on screen.
+
+import os
+import json
+import time
+
+_imported = time.perf_counter()
+_marks    = []
+_log_path = None
+
+def process_age():
+    # Seconds since the process started (Linux), 0 where this is not available
+    try:
+        with open('/proc/self/stat') as f:
+            start_ticks = float(f.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+        return max(uptime - start_ticks / os.sysconf('SC_CLK_TCK'), 0.0)
+    except (OSError, ValueError, IndexError):
+        return 0.0
+
+# Time spent before this module was imported (interpreter start, path setup)
+_offset = process_age()
+
+def elapsed():
+    return _offset + time.perf_counter() - _imported
+
+def enable(path=None):
+    # Also append the milestones to <path> as one JSON line per start
+    global _log_path
+    _log_path = path
+
+def mark(name):
+    _marks.append((name, elapsed()))
+
+def marks():
+    return list(_marks)
+
+def report(label='display'):
+    previous = 0.0
+    steps = []
+    for name, t in _marks:
+        steps.append(f'{name} {t - previous:.2f} s')
+        previous = t
+    print(f"Started {label} in {previous:.2f} s ({', '.join(steps)})")
+    if _log_path:
+        with open(_log_path, 'a') as f:
+            f.write(json.dumps({'label' : label, 'time' : time.time(), 'marks' : dict(_marks)}) + '\n')
+
+def report_on_event_loop(label='display'):
+    # Call right before app.exec(); the report runs on the first pass of the event loop
+    from qtpy.QtCore import QTimer
+    mark('display')
+    def first_pass():
+        mark('event loop')
+        report(label)
+    QTimer.singleShot(0, first_pass)
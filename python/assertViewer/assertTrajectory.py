@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+#-----------------------------------------------------------------------------
+# Title      : Batched straight-line track fitting across the sensor stations
+#-----------------------------------------------------------------------------
+
+import numpy as np
+
+def fit_lines(z, u, valid=None):
+    # Least-squares fit u = offset + slope*z for many events at once.
+    #   z     : (stations,) station positions along the beam
+    #   u     : (events, stations) measured positions, one coordinate
+    #   valid : optional (events, stations) mask of usable hits
+    # Returns (slope, offset, residuals, ok); events with fewer than two hits are not ok
+    # and their slope/offset are NaN.
+    z = np.asarray(z, dtype=np.float64)
+    u = np.atleast_2d(np.asarray(u, dtype=np.float64))
+    if valid is None:
+        valid = np.isfinite(u)
+    w  = (np.asarray(valid, dtype=bool) & np.isfinite(u)).astype(np.float64)
+    u0 = np.where(w > 0, u, 0.0)
+
+    # Normal equations of the weighted fit, summed over the stations of every event
+    s   = w.sum(axis=1)
+    sz  = (w*z).sum(axis=1)
+    szz = (w*z*z).sum(axis=1)
+    su  = (w*u0).sum(axis=1)
+    szu = (w*z*u0).sum(axis=1)
+    det = s*szz - sz*sz
+    ok  = (s >= 2) & (det > 0)
+    det = np.where(ok, det, 1.0)
+
+    slope  = np.where(ok, (s*szu - sz*su) / det, np.nan)
+    offset = np.where(ok, (szz*su - sz*szu) / det, np.nan)
+    residuals = np.where(w > 0, u - (offset[:,None] + slope[:,None]*z), np.nan)
+    return slope, offset, residuals, ok
+
+def fit_tracks(z, x, y, valid=None):
+    # Straight tracks through the x/y stations of many events at once.
+    # x, y are (events, stations); returns a dict of per event results plus the
+    # residuals of every station. Angles are in mrad when z and x/y share a unit.
+    slope_x, offset_x, res_x, ok_x = fit_lines(z, x, valid)
+    slope_y, offset_y, res_y, ok_y = fit_lines(z, y, valid)
+    return {'slope_x'    : slope_x,
+            'slope_y'    : slope_y,
+            'angle_x'    : 1e3*np.arctan(slope_x),
+            'angle_y'    : 1e3*np.arctan(slope_y),
+            'offset_x'   : offset_x,
+            'offset_y'   : offset_y,
+            'residual_x' : res_x,
+            'residual_y' : res_y,
+            'ok'         : ok_x & ok_y}
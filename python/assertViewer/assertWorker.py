@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+#-----------------------------------------------------------------------------
+# Title      : Background fetch/compute thread for the displays
+#-----------------------------------------------------------------------------
+# Rogue reads and NumPy work run on one QThread per display, in submission order, so
+# they never block the GUI thread and the state they touch needs no locking. Finished,
+# plot-ready results come back to the GUI thread through a queued signal.
+
+import threading
+import traceback
+from collections import deque
+
+from qtpy.QtCore import QObject, QThread, QCoreApplication, Signal
+
+class _WorkerThread(QThread):
+    def __init__(self, target, name):
+        super().__init__()
+        self._target = target
+        self.setObjectName(name)
+
+    def run(self):
+        self._target()
+
+class BackgroundWorker(QObject):
+    # (key, result) of every request that was still current when it finished
+    resultReady = Signal(object, object)
+    # (key, exception) of failed requests
+    failed = Signal(object, object)
+    _done = Signal(object, int, object, object, object, object)
+
+    def __init__(self, name='worker', parent=None):
+        super().__init__(parent)
+        # Requests with a key are "latest only": submitting a key again makes the
+        # previous request for it stale, it is skipped if it has not started yet and
+        # its result is dropped if it has. Requests without a key (post) always run.
+        self.name = name
+        self._tasks = deque()
+        self._cond  = threading.Condition()
+        self._generation = {}
+        self._running = True
+        self.submitted = 0
+        self.completed = 0
+        self.skipped   = 0
+        self.stale     = 0
+        self.errors    = 0
+
+        self._done.connect(self._deliver)
+        self._thread = _WorkerThread(self._run, name)
+        self._thread.start()
+        app = QCoreApplication.instance()
+        if app is not None:
+            app.aboutToQuit.connect(self.stop)
+
+    @property
+    def pending(self):
+        # Requests waiting to run
+        return len(self._tasks)
+
+    def submit(self, key, function, *args, callback=None, errback=None, **kwargs):
+        # Run function(*args, **kwargs) on the worker thread and pass its result to
+        # callback(result) on the GUI thread, unless <key> is submitted again meanwhile
+        with self._cond:
+            generation = self._generation.get(key, 0) + 1
+            self._generation[key] = generation
+            self._tasks.append((key, generation, function, args, kwargs, callback, errback))
+            self.submitted += 1
+            self._cond.notify()
+        return generation
+
+    def post(self, function, *args, callback=None, errback=None, **kwargs):
+        # Run function(*args, **kwargs) on the worker thread, never dropped
+        return self.submit(None, function, *args, callback=callback, errback=errback, **kwargs)
+
+    def cancel(self, key):
+        # Make the outstanding request for <key> stale
+        with self._cond:
+            self._generation[key] = self._generation.get(key, 0) + 1
+
+    def current(self, key, generation):
+        return key is None or self._generation.get(key) == generation
+
+    def stats(self):
+        return {'submitted' : self.submitted,
+                'completed' : self.completed,
+                'skipped'   : self.skipped,
+                'stale'     : self.stale,
+                'errors'    : self.errors,
+                'pending'   : self.pending}
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._tasks.clear()
+            self._cond.notify()
+        if self._thread.isRunning():
+            self._thread.wait()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._running and not self._tasks:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                key, generation, function, args, kwargs, callback, errback = self._tasks.popleft()
+                if not self.current(key, generation):
+                    self.skipped += 1
+                    continue
+            try:
+                result, error = function(*args, **kwargs), None
+            except Exception as e:
+                result, error = None, e
+                if errback is None:
+                    traceback.print_exc()
+            self._done.emit(key, generation, result, error, callback, errback)
+
+    def _deliver(self, key, generation, result, error, callback, errback):
+        # Runs on the GUI thread
+        if not self.current(key, generation):
+            self.stale += 1
+            return
+        if error is not None:
+            self.errors += 1
+            if errback is not None:
+                errback(error)
+            self.failed.emit(key, error)
+            return
+        self.completed += 1
+        if callback is not None:
+            callback(result)
+        self.resultReady.emit(key, result)
@@ -5,12 +5,11 @@
 import os
 top_level = f'{os.getcwd()}/'
 import setupLibPaths
+from assertViewer import assertStartup as startup
+startup.mark('interpreter')
 import argparse
-import pyrogue.pydm
-import sys
-
-from assertViewer import *
 
+# Only the modules of the chosen command are imported, after the arguments are parsed
 
 parser = argparse.ArgumentParser('Pyrogue Client')
 
@@ -36,7 +35,7 @@ parser.add_argument('--title',
 
 parser.add_argument('cmd',
                     type=str,
-                    choices=['event','particle','beam','channel','trajectory'],
+                    choices=['event','particle','beam','channel','trajectory','multi','record','replay','simulate','benchmark'],
                     help='Client command to issue')
 
 parser.add_argument('--sizeY',
@@ -49,15 +48,223 @@ parser.add_argument('--sizeX',
                     default=800,
                     help='Columns of image')
 
+parser.add_argument('--historyDepth',
+                    type=int,
+                    default=1000,
+                    help='Number of frames kept in the local channel history')
+
+parser.add_argument('--historyMemory',
+                    type=float,
+                    default=256,
+                    help='Memory budget of the local channel history in MB')
+
+parser.add_argument('--maxFps',
+                    type=float,
+                    default=10,
+                    help='Maximum redraw rate of the display, 0 for unlimited')
+
+parser.add_argument('--showStats',
+                    action='store_true',
+                    help='Show the per phase timing overlay on the display')
+
+parser.add_argument('--statsLog',
+                    type=str,
+                    default=None,
+                    help='Append the per phase timings as JSON lines to this file')
+
+parser.add_argument('--statsInterval',
+                    type=float,
+                    default=1.0,
+                    help='Refresh interval of the timing overlay and log in seconds')
+
+parser.add_argument('--startupLog',
+                    type=str,
+                    default=None,
+                    help='Append the cold-start milestones of the display as JSON lines to this file')
+
+parser.add_argument('--profileWindow',
+                    type=int,
+                    default=1000,
+                    help='Number of frames over which the windowed beam profile fades')
+
+parser.add_argument('--calibration',
+                    type=str,
+                    default=None,
+                    help='Calibration file (.npz) with the per channel gain, pedestal and noise tables')
+
+parser.add_argument('--accumulateFrames',
+                    type=int,
+                    default=100,
+                    help='Number of frames in the particle accumulation window')
+
+parser.add_argument('--accumulateSeconds',
+                    type=float,
+                    default=10.0,
+                    help='Length of the particle accumulation time window in seconds')
+
+parser.add_argument('--geometry',
+                    type=str,
+                    default=None,
+                    help="Detector geometry JSON file, 'default' for 8 ASICs x 64 channels x 32 frames, by default read from the server")
+
+parser.add_argument('--stationZ',
+                    type=str,
+                    default=None,
+                    help='Comma separated positions of the stations along the beam, overrides the geometry')
+
+parser.add_argument('--stripPitch',
+                    type=float,
+                    default=None,
+                    help='Strip pitch, in the unit of the station positions, overrides the geometry')
+
+parser.add_argument('--trackHistory',
+                    type=int,
+                    default=10000,
+                    help='Number of fitted tracks kept for the track distributions')
+
+parser.add_argument('--output',
+                    type=str,
+                    default='assert_run.dat',
+                    help='Output file of the record command, the index is written to <output>.idx')
+
+parser.add_argument('--compress',
+                    action='store_true',
+                    help='Compress the recorded chunks with zlib')
+
+parser.add_argument('--chunkRecords',
+                    type=int,
+                    default=64,
+                    help='Number of events per recorded chunk')
+
+parser.add_argument('--duration',
+                    type=float,
+                    default=None,
+                    help='Stop recording after this many seconds, or length of each benchmark point')
+
+parser.add_argument('--benchmark',
+                    type=int,
+                    default=0,
+                    help='Measure the write throughput with this many synthetic events instead of recording')
+
+parser.add_argument('--input',
+                    type=str,
+                    default='assert_run.dat',
+                    help='Recorded file served by the replay command')
+
+parser.add_argument('--speed',
+                    type=float,
+                    default=1.0,
+                    help='Replay speed factor, 0 replays as fast as possible')
+
+parser.add_argument('--start',
+                    type=int,
+                    default=0,
+                    help='First event of the replay')
+
+parser.add_argument('--loop',
+                    action='store_true',
+                    help='Restart the replay at the end of the file')
+
+parser.add_argument('--rate',
+                    type=float,
+                    default=100.0,
+                    help='Frame rate of the simulate command in Hz, 0 for as fast as possible')
+
+parser.add_argument('--asics',
+                    type=int,
+                    default=8,
+                    help='Number of simulated ASICs of the simulate and benchmark commands')
+
+parser.add_argument('--channels',
+                    type=int,
+                    default=64,
+                    help='Number of simulated channels per ASIC of the simulate and benchmark commands')
+
+parser.add_argument('--seed',
+                    type=int,
+                    default=None,
+                    help='Random seed of the simulation')
+
+parser.add_argument('--displays',
+                    type=str,
+                    default='event,channel,beam,particle',
+                    help='Comma separated displays shown by the multi command or run by the benchmark command')
+
+parser.add_argument('--layout',
+                    type=str,
+                    choices=['tabs','docks'],
+                    default='tabs',
+                    help='Arrangement of the displays of the multi command')
+
+parser.add_argument('--rates',
+                    type=str,
+                    default='10,100,1000',
+                    help='Comma separated source frame rates of the benchmark command in Hz')
+
+parser.add_argument('--benchmarkPort',
+                    type=int,
+                    default=None,
+                    help='First server port of the benchmark command, every point runs its own simulated '
+                         'server from there (default --port + 100, clear of a live server on --port)')
+
+parser.add_argument('--report',
+                    type=str,
+                    default='assert_benchmark.json',
+                    help='JSON file the benchmark results are written to')
+
 args = parser.parse_args()
+startup.enable(args.startupLog)
+startup.mark('arguments')
+
+if args.cmd in ['event','particle','beam','channel','trajectory','multi']:
+    # Registers the rogue:// data plugin with PyDM
+    import pyrogue.pydm
 
 if args.cmd == 'event':
-    runReceiverDisplay(dataReceiver=args.dataReceiver, serverList=args.serverList, title=args.title, sizeY=args.sizeY, sizeX=args.sizeX)
+    from assertViewer.assertGUI import runReceiverDisplay
+    startup.mark('imports')
+    runReceiverDisplay(dataReceiver=args.dataReceiver, serverList=args.serverList, geometry=args.geometry, title=args.title, sizeY=args.sizeY, sizeX=args.sizeX, port=args.port, maxFps=args.maxFps, showStats=args.showStats, statsLog=args.statsLog, statsInterval=args.statsInterval)
 elif args.cmd == 'particle':
-    runParticleDisplay(dataReceiver=args.dataReceiver, serverList=args.serverList, title=args.title, sizeY=args.sizeY, sizeX=args.sizeX, port=args.port)
+    from assertViewer.assertGUIParticleMonitoring import runParticleDisplay
+    startup.mark('imports')
+    runParticleDisplay(dataReceiver=args.dataReceiver, serverList=args.serverList, geometry=args.geometry, title=args.title, sizeY=args.sizeY, sizeX=args.sizeX, port=args.port, maxFps=args.maxFps, calibration=args.calibration, accumulateFrames=args.accumulateFrames, accumulateSeconds=args.accumulateSeconds, showStats=args.showStats, statsLog=args.statsLog, statsInterval=args.statsInterval)
 elif args.cmd == 'beam':
-    runBeamDisplay(dataReceiver=args.dataReceiver, serverList=args.serverList, title=args.title, sizeY=args.sizeY, sizeX=args.sizeX, port=args.port)
+    from assertViewer.assertGUIBeamGeometry import runBeamDisplay
+    startup.mark('imports')
+    runBeamDisplay(dataReceiver=args.dataReceiver, serverList=args.serverList, geometry=args.geometry, title=args.title, sizeY=args.sizeY, sizeX=args.sizeX, port=args.port, maxFps=args.maxFps, profileWindow=args.profileWindow, showStats=args.showStats, statsLog=args.statsLog, statsInterval=args.statsInterval)
 elif args.cmd == 'channel':
-    runChannelDisplay(dataReceiver=args.dataReceiver, serverList=args.serverList, title=args.title, sizeY=args.sizeY, sizeX=args.sizeX, port=args.port)
+    from assertViewer.assertGUIChannelMonitoring import runChannelDisplay
+    startup.mark('imports')
+    runChannelDisplay(dataReceiver=args.dataReceiver, serverList=args.serverList, geometry=args.geometry, title=args.title, sizeY=args.sizeY, sizeX=args.sizeX, port=args.port, historyDepth=args.historyDepth, historyMemory=args.historyMemory, maxFps=args.maxFps, showStats=args.showStats, statsLog=args.statsLog, statsInterval=args.statsInterval)
 elif args.cmd == 'trajectory':
-    pass
+    from assertViewer.assertGUITrajectory import runTrajectoryDisplay
+    startup.mark('imports')
+    runTrajectoryDisplay(dataReceiver=args.dataReceiver, serverList=args.serverList, geometry=args.geometry, title=args.title, sizeY=args.sizeY, sizeX=args.sizeX, port=args.port, maxFps=args.maxFps, stationZ=args.stationZ, stripPitch=args.stripPitch, trackHistory=args.trackHistory, showStats=args.showStats, statsLog=args.statsLog, statsInterval=args.statsInterval)
+elif args.cmd == 'multi':
+    from assertViewer.assertLauncher import runMultiDisplay
+    startup.mark('imports')
+    runMultiDisplay([d for d in args.displays.split(',') if d], dataReceiver=args.dataReceiver, serverList=args.serverList, geometry=args.geometry, title=args.title,
+                    sizeY=args.sizeY, sizeX=args.sizeX, port=args.port, layout=args.layout, maxFps=args.maxFps,
+                    showStats=args.showStats, statsLog=args.statsLog, statsInterval=args.statsInterval,
+                    historyDepth=args.historyDepth, historyMemory=args.historyMemory, profileWindow=args.profileWindow,
+                    calibration=args.calibration, accumulateFrames=args.accumulateFrames, accumulateSeconds=args.accumulateSeconds,
+                    stationZ=args.stationZ, stripPitch=args.stripPitch, trackHistory=args.trackHistory)
+elif args.cmd == 'record':
+    from assertViewer.assertRecorder import runRecorder, benchmark_recorder
+    if args.benchmark > 0:
+        print(benchmark_recorder(args.output, records=args.benchmark, compress=args.compress, chunkRecords=args.chunkRecords))
+    else:
+        runRecorder(args.output, port=args.port, compress=args.compress, chunkRecords=args.chunkRecords, duration=args.duration, serverList=args.serverList)
+elif args.cmd == 'replay':
+    from assertViewer.assertReplay import runReplay
+    runReplay(args.input, port=args.port, speed=args.speed, start=args.start, loop=args.loop)
+elif args.cmd == 'simulate':
+    from assertViewer.assertSimulation import runSimulation
+    runSimulation(port=args.port, rate=args.rate, asics=args.asics, channels=args.channels, seed=args.seed)
+elif args.cmd == 'benchmark':
+    from assertViewer.assertBenchmark import run_benchmark_suite
+    # The simulated servers of the benchmark must not take over the port of a live server
+    benchmarkPort = int(args.port)+100 if args.benchmarkPort is None else args.benchmarkPort
+    run_benchmark_suite(displays=[d for d in args.displays.split(',') if d], rates=[float(r) for r in args.rates.split(',') if r],
+                        duration=10.0 if args.duration is None else args.duration, port=benchmarkPort, maxFps=args.maxFps, report=args.report,
+                        asics=args.asics, channels=args.channels)
@@ -7,11 +7,18 @@
 # copied, modified, propagated, or distributed except according to the terms
 # contained in the LICENSE.txt file.
 #-----------------------------------------------------------------------------
-import pyrogue as pr
 import os
+import sys
 
 top_level_arr = os.path.realpath(__file__).split('/')[:-1]
 top_level = '/'.join(top_level_arr) + '/'
 
-pr.addLibraryPath(top_level+'../')
-#pr.addLibraryPath(top_level+'./ePixViewer/python')
+# Plain sys.path handling instead of pr.addLibraryPath, so the path setup does not
+# import pyrogue before the command line has been parsed
+def addLibraryPath(path):
+    path = os.path.abspath(path)
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+addLibraryPath(top_level+'../')
+#addLibraryPath(top_level+'./ePixViewer/python')
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+#-----------------------------------------------------------------------------
+# Title      : Tests of the beam position and width reconstruction
+#-----------------------------------------------------------------------------
+
+import numpy as np
+
+from assertViewer.assertBeamGeometry import compute_plane_profiles, pair_planes, profile_drift, BeamProfileAccumulator
+
+def gaussian(channels, mean, sigma, amplitude=1000.0):
+    strips = np.arange(1, channels+1)
+    return amplitude*np.exp(-0.5*((strips - mean)/sigma)**2)
+
+def test_gaussian_beam_is_recovered():
+    counts = np.stack([gaussian(64, 20.3, 2.0), gaussian(64, 40.0, 3.0)])
+    profiles = compute_plane_profiles(counts, threshold=0.0)
+    assert profiles['valid'].all()
+    np.testing.assert_allclose(profiles['mean'], [20.3, 40.0], atol=1e-6)
+    np.testing.assert_allclose(profiles['sigma'], [2.0, 3.0], atol=1e-6)
+    np.testing.assert_array_equal(profiles['peak'], [20, 40])
+    np.testing.assert_allclose(profiles['centroid'], [20.3, 40.0], atol=1e-3)
+
+def test_flat_or_masked_planes_are_invalid():
+    counts = np.stack([np.full(64, 100.0), gaussian(64, 10.0, 2.0)])
+    profiles = compute_plane_profiles(counts, valid=[True, False])
+    assert not profiles['valid'].any()
+    assert np.isnan(profiles['mean']).all()
+
+def test_accumulator_fills_pairs():
+    counts = np.stack([gaussian(64, 10.0, 2.0), gaussian(64, 20.0, 2.0),
+                       gaussian(64, 30.0, 2.0), np.zeros(64)])
+    x, y, valid = pair_planes(compute_plane_profiles(counts, threshold=0.0))
+    np.testing.assert_array_equal(valid, [True, False])
+    acc = BeamProfileAccumulator(pairs=2, channels=64)
+    acc.fill(x, y, valid)
+    acc.fill(x, y, valid)
+    assert acc.entries == 2
+    assert acc.image[0, 9, 19] == 2
+    assert acc.image.sum() == 2
+    acc.reset()
+    assert acc.entries == 0 and acc.image.sum() == 0
+
+def test_accumulator_window_decays():
+    acc = BeamProfileAccumulator(pairs=1, channels=4, window=1)
+    acc.fill(np.array([1.0]), np.array([1.0]), np.array([True]))
+    acc.fill(np.array([2.0]), np.array([2.0]), np.array([False]))
+    np.testing.assert_allclose(acc.image[0, 0, 0], np.exp(-1.0))
+
+def test_events_axis_is_kept():
+    counts = np.stack([gaussian(64, m, 2.0) for m in (10.0, 30.0, 50.0)]).reshape(3, 1, 64)
+    profiles = compute_plane_profiles(counts, threshold=0.0)
+    assert profiles['mean'].shape == (3, 1)
+    np.testing.assert_allclose(profiles['mean'][:,0], [10.0, 30.0, 50.0], atol=1e-6)
+
+def test_drift_of_a_moving_beam():
+    total  = BeamProfileAccumulator(pairs=2, channels=4)
+    window = BeamProfileAccumulator(pairs=2, channels=4, window=2)
+    # Pair 0 stays on strip (1, 1), pair 1 moves from (1, 1) to (3, 3)
+    for n in range(50):
+        spot = np.array([1.0, 1.0 if n < 40 else 3.0])
+        for acc in (total, window):
+            acc.fill(spot, spot, np.array([True, True]))
+    drift = profile_drift(window.image, total.image)
+    np.testing.assert_allclose(drift[0], 0.0, atol=1e-12)
+    assert drift[1, 2, 2] > 0 and drift[1, 0, 0] < 0
+    np.testing.assert_allclose(drift[1].sum(), 0.0, atol=1e-12)
+    assert not profile_drift(np.zeros((1, 4, 4)), np.zeros((1, 4, 4))).any()
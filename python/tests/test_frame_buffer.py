@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+#-----------------------------------------------------------------------------
+# Title      : Tests of the client-side frame ring buffer
+#-----------------------------------------------------------------------------
+
+import numpy as np
+
+from assertViewer.assertFrameBuffer import FrameRingBuffer
+
+def test_keeps_newest_frames():
+    buf = FrameRingBuffer(3, (2,))
+    for i in range(5):
+        buf.append(np.full(2, i))
+    assert len(buf) == 3
+    np.testing.assert_array_equal(buf.ordered()[:,0], [2, 3, 4])
+    np.testing.assert_array_equal(buf.latest(), [4, 4])
+
+def test_trace_of_one_cell():
+    buf = FrameRingBuffer(4, (2, 3))
+    for frame in np.arange(5*6).reshape(5, 2, 3):
+        buf.append(frame)
+    np.testing.assert_array_equal(buf.trace(1, 2), [11, 17, 23, 29])
+
+def test_clear():
+    buf = FrameRingBuffer(2, ())
+    buf.append(1.0)
+    buf.clear()
+    assert len(buf) == 0 and buf.latest() is None
+
+def test_memory_budget_clips_depth():
+    buf = FrameRingBuffer.from_memory_budget(1000, 10*64*4, (64,), dtype=np.float32)
+    assert buf.depth == 10
+    assert buf.nbytes == 10*64*4
+
+def test_append_returns_evicted_frame():
+    buf = FrameRingBuffer(2, (2,))
+    evicted = [buf.append(np.full(2, i)) for i in range(4)]
+    assert evicted[:2] == [None, None]
+    np.testing.assert_array_equal(evicted[2], [0, 0])
+    np.testing.assert_array_equal(evicted[3], [1, 1])
+
+def test_popleft_and_oldest():
+    buf = FrameRingBuffer(3, ())
+    assert buf.popleft() is None and buf.oldest() is None
+    buf.append(1.0)
+    buf.append(2.0)
+    assert buf.oldest() == 1.0
+    assert buf.popleft() == 1.0
+    assert len(buf) == 1 and buf.latest() == 2.0
+
+def test_extend_keeps_newest_frames():
+    buf = FrameRingBuffer(4, (2, 3))
+    buf.append(np.zeros((2, 3)))
+    buf.extend(np.arange(5*6).reshape(5, 2, 3))
+    assert len(buf) == 4
+    np.testing.assert_array_equal(buf.trace(1, 2), [11, 17, 23, 29])
+
+def test_resize_keeps_newest_frames():
+    buf = FrameRingBuffer(3, (2,))
+    for i in range(5):
+        buf.append(np.full(2, i))
+    buf.resize(6)
+    assert buf.depth == 6 and len(buf) == 3
+    buf.append(np.full(2, 5))
+    np.testing.assert_array_equal(buf.ordered()[:,0], [2, 3, 4, 5])
+    buf.resize(2)
+    np.testing.assert_array_equal(buf.ordered()[:,0], [4, 5])
+
+def test_sum_over_wrapped_buffer():
+    buf = FrameRingBuffer(4, (2,), dtype=np.float32)
+    assert not buf.sum().any()
+    for i in range(7):
+        buf.append(np.full(2, i))
+    buf.popleft()
+    np.testing.assert_array_equal(buf.sum(), [15, 15])
+    assert buf.sum().dtype == np.float64
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+#-----------------------------------------------------------------------------
+# Title      : Tests of the incremental per-channel histograms
+#-----------------------------------------------------------------------------
+
+import threading
+import numpy as np
+import pytest
+
+from assertViewer.assertHistogram import ChannelHistogramEngine, ChannelHistory, valid_bins
+
+def test_matches_numpy_histogram():
+    rng = np.random.default_rng(1)
+    frames = rng.normal(500, 100, size=(50, 4, 8))
+    engine = ChannelHistogramEngine(asics=1, channels=4, frames=8, binsStart=300, binsStop=700, numBins=21)
+    for frame in frames:
+        engine.update(0, frame)
+    counts, edges = engine.histogram(0, 2, 5)
+    expected, _ = np.histogram(frames[:,2,5], bins=np.linspace(300, 700, 21))
+    np.testing.assert_array_equal(counts, expected)
+    np.testing.assert_allclose(engine.mean(0), frames.mean(axis=0))
+    np.testing.assert_allclose(engine.rms(0), frames.std(axis=0))
+
+def test_evicted_frame_is_removed():
+    engine = ChannelHistogramEngine(asics=1, channels=1, frames=1, binsStart=0, binsStop=10, numBins=11)
+    engine.update(0, np.array([[3.0]]))
+    engine.update(0, np.array([[10.0]]), evicted=np.array([[3.0]]))
+    counts, _ = engine.histogram(0, 0, 0)
+    assert counts[3] == 0
+    assert counts[-1] == 1
+
+def test_rebinning_refills_from_history():
+    history = np.array([[[1.0]], [[2.0]], [[2.5]]])
+    engine = ChannelHistogramEngine(asics=1, channels=1, frames=1, binsStart=0, binsStop=10, numBins=11)
+    engine.set_bins(0, 4, 5, history=lambda asic: history)
+    counts, edges = engine.histogram(0, 0, 0)
+    np.testing.assert_array_equal(counts, [0, 1, 2, 0])
+    np.testing.assert_array_equal(edges, [0, 1, 2, 3, 4])
+
+@pytest.mark.parametrize('start, stop, bins', [(10, 10, 5), (10, 0, 5), (0, 10, 1), (0, None, 5)])
+def test_rejects_bad_bins(start, stop, bins):
+    assert not valid_bins(start, stop, bins)
+    with pytest.raises(Exception):
+        ChannelHistogramEngine(asics=1, channels=1, frames=1, binsStart=start, binsStop=stop, numBins=bins)
+    engine = ChannelHistogramEngine(asics=1, channels=1, frames=1)
+    with pytest.raises(Exception):
+        engine.set_bins(start, stop, bins)
+
+def test_history_keeps_histograms_of_its_window():
+    # As in the channel display: frames of 2 ASICs, more than the history holds
+    rng = np.random.default_rng(3)
+    frames = rng.integers(0, 100, size=(12, 2, 3, 4)).astype(np.float64)
+    history = ChannelHistory(asics=2, channels=3, frames=4, depth=5, binsStart=0, binsStop=100, numBins=11)
+    assert history.trace(1, 0, 0) is None and history.histogram(1, 0, 0) is None
+    for frame in frames:
+        for asic in range(2):
+            history.append(asic, frame[asic])
+    window = frames[-5:, 1]
+    assert history.entries(1) == 5
+    np.testing.assert_array_equal(history.trace(1, 2, 3), window[:,2,3])
+    np.testing.assert_array_equal(history.latest(1), frames[-1, 1])
+    counts, edges = history.histogram(1, 2, 3)
+    np.testing.assert_array_equal(counts, np.histogram(window[:,2,3], bins=np.linspace(0, 100, 11))[0])
+    np.testing.assert_allclose(history.mean(1), window.mean(axis=0))
+    np.testing.assert_allclose(history.rms(1), window.std(axis=0))
+
+    # Rebinning refills from the history window, a bad range leaves the binning alone
+    history.set_bins(0, 50, 6)
+    counts, edges = history.histogram(1, 2, 3)
+    np.testing.assert_array_equal(counts, np.histogram(window[:,2,3], bins=np.linspace(0, 50, 6))[0])
+    with pytest.raises(Exception):
+        history.set_bins(50, 0, 6)
+    np.testing.assert_array_equal(history.histogram(1, 2, 3)[1], edges)
+
+def test_history_memory_budget_is_shared():
+    history = ChannelHistory(asics=4, channels=8, frames=2, depth=1000, budget=4*10*8*2*4)
+    assert history.depth == 10
+
+def test_history_reads_while_frames_arrive():
+    history = ChannelHistory(asics=1, channels=4, frames=2, depth=8, binsStart=0, binsStop=10, numBins=11)
+    def fill():
+        for n in range(2000):
+            history.append(0, np.full((4, 2), n % 10))
+    writer = threading.Thread(target=fill)
+    writer.start()
+    while writer.is_alive():
+        result = history.histogram(0, 1, 1)
+        if result is not None:
+            # Never a half-applied frame: the window holds 1 to 8 entries per cell
+            assert 1 <= result[0].sum() <= 8
+    writer.join()
+    assert history.histogram(0, 1, 1)[0].sum() == 8
+
+def test_history_seeded_from_server():
+    rng = np.random.default_rng(4)
+    server = rng.integers(0, 100, size=(20, 3, 4)).astype(np.float64)
+    history = ChannelHistory(asics=1, channels=3, frames=4, depth=8, binsStart=0, binsStop=100, numBins=11)
+    history.seed(0, server)
+    live = np.full((3, 4), 42.0)
+    history.append(0, live)
+    window = np.concatenate([server[-7:], live[None]])
+    assert history.entries(0) == 8
+    np.testing.assert_array_equal(history.trace(0, 1, 2), window[:,1,2])
+    counts, _ = history.histogram(0, 1, 2)
+    np.testing.assert_array_equal(counts, np.histogram(window[:,1,2], bins=np.linspace(0, 100, 11))[0])
+    np.testing.assert_allclose(history.mean(0), window.mean(axis=0))
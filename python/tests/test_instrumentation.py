@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+#-----------------------------------------------------------------------------
+# Title      : Tests of the phase timers
+#-----------------------------------------------------------------------------
+
+import time
+import threading
+import pytest
+
+# The overlay of the module needs Qt
+pytest.importorskip('qtpy')
+from assertViewer.assertInstrumentation import Instrumentation
+
+def test_same_phase_from_two_threads():
+    # A long compute on one worker overlapped by a short one on another
+    perf = Instrumentation(name='test')
+    started, finished = threading.Event(), threading.Event()
+    def slow():
+        with perf.phase('compute'):
+            started.set()
+            finished.wait()
+            time.sleep(0.05)
+    thread = threading.Thread(target=slow)
+    thread.start()
+    started.wait()
+    with perf.phase('compute'):
+        pass
+    finished.set()
+    thread.join()
+    summary = perf.snapshot()['phases']['compute']
+    assert summary['count'] == 2
+    assert summary['max_ms'] >= 50
+    assert summary['last_ms'] >= 50
+
+def test_nested_phase():
+    perf = Instrumentation(name='test')
+    with perf.phase('fetch'):
+        time.sleep(0.02)
+        with perf.phase('fetch'):
+            pass
+    summary = perf.snapshot()['phases']['fetch']
+    assert summary['count'] == 2
+    assert summary['max_ms'] >= 20
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+#-----------------------------------------------------------------------------
+# Title      : Tests of the particle quantities computed from the ASIC counts
+#-----------------------------------------------------------------------------
+
+import numpy as np
+
+from assertViewer.assertParticles import PAIR_ENERGY, ParticleCalibration, ParticleAccumulator, convert_counts
+
+def test_counts_above_pedestal_are_converted():
+    calibration = ParticleCalibration(asics=1, channels=3, gain=100.0, pedestal=10.0, photonEnergy=PAIR_ENERGY*100)
+    result = convert_counts(np.array([[5.0, 10.0, 30.0]]), calibration)
+    np.testing.assert_allclose(result['charge'], [[0.0, 0.0, 2000.0]])
+    np.testing.assert_allclose(result['photons'], [[0.0, 0.0, 20.0]])
+    np.testing.assert_allclose(result['photons_err'], [[0.0, 0.0, np.sqrt(20.0)]])
+    assert (result['electrons'] >= 0).all() and (result['LET'] >= 0).all()
+
+def test_noise_sets_the_error_floor():
+    calibration = ParticleCalibration(asics=1, channels=1, gain=10.0, pedestal=0.0, noise=2.0)
+    result = convert_counts(np.zeros((1, 1)), calibration)
+    np.testing.assert_allclose(result['charge_err'], [[20.0]])
+
+def test_calibration_round_trip(tmp_path):
+    path = tmp_path / 'calibration.npz'
+    ParticleCalibration(asics=2, channels=4, gain=np.arange(8.0).reshape(2, 4), thickness=0.05).save(path)
+    calibration = ParticleCalibration.load(path)
+    np.testing.assert_array_equal(calibration.gain, np.arange(8.0).reshape(2, 4))
+    assert calibration.thickness == 0.05
+
+def result(counts=10.0):
+    return convert_counts(np.full((1, 2), counts), ParticleCalibration(asics=1, channels=2, gain=100.0))
+
+def test_total_window_sums_every_event():
+    acc = ParticleAccumulator(asics=1, channels=2, frames=3, seconds=100.0)
+    acc.reset(now=0.0)
+    one = result()
+    for n in range(5):
+        acc.add(one, now=float(n+1))
+    val, err, rate, rate_err = acc.accumulated('photons', 'total')
+    np.testing.assert_allclose(val, 5*one['photons'])
+    np.testing.assert_allclose(err, np.sqrt(5)*one['photons_err'])
+    np.testing.assert_allclose(rate, val/5.0)
+    assert acc.entries == 5
+
+def test_frames_window_keeps_last_frames():
+    acc = ParticleAccumulator(asics=1, channels=2, frames=3, seconds=100.0)
+    acc.reset(now=0.0)
+    for n in range(5):
+        acc.add(result(counts=n+1), now=float(n+1))
+    val, _, _, _ = acc.accumulated('electrons', 'frames')
+    expected = sum(result(counts=c)['electrons'] for c in (3, 4, 5))
+    np.testing.assert_allclose(val, expected)
+    assert acc.duration('frames') == 3.0
+
+def test_time_window_expires_old_events():
+    acc = ParticleAccumulator(asics=1, channels=2, frames=100, seconds=2.5)
+    acc.reset(now=0.0)
+    one = result()
+    for n in range(5):
+        acc.add(one, now=float(n+1))
+    val, _, _, _ = acc.accumulated('LET', 'time')
+    np.testing.assert_allclose(val, 3*one['LET'])
+    assert acc.duration('time') == 2.5
+
+def test_reset_clears_every_window():
+    acc = ParticleAccumulator(asics=1, channels=2)
+    acc.add(result(), now=1.0)
+    acc.reset(now=2.0)
+    for window in ParticleAccumulator.WINDOWS:
+        val, err, rate, _ = acc.accumulated('photons', window)
+        assert not val.any() and not err.any() and not rate.any()
+    assert acc.entries == 0
+
+def test_time_window_grows_with_the_rate():
+    acc = ParticleAccumulator(asics=1, channels=2, frames=10, seconds=1.0, capacity=1000)
+    acc.reset(now=0.0)
+    assert acc._time_stamps.depth == ParticleAccumulator.INITIAL_CAPACITY
+    one = result()
+    for n in range(500):
+        acc.add(one, now=n/1000.0)
+    val, _, _, _ = acc.accumulated('photons', 'time')
+    np.testing.assert_allclose(val, 500*one['photons'].astype(np.float32), rtol=1e-6)
+    assert acc._time_stamps.depth == 512
+
+def test_capacity_bounds_the_time_window():
+    acc = ParticleAccumulator(asics=1, channels=2, frames=10, seconds=100.0, capacity=100)
+    acc.reset(now=0.0)
+    one = result()
+    for n in range(300):
+        acc.add(one, now=n/1000.0)
+    val, _, _, _ = acc.accumulated('photons', 'time')
+    np.testing.assert_allclose(val, 100*one['photons'].astype(np.float32), rtol=1e-6)
+    assert acc._time_stamps.depth == 100
+
+def test_window_sums_do_not_drift():
+    # A huge event leaves the windows before many small ones: the running sums must
+    # not keep the rounding error of adding and removing it
+    def event(value):
+        values = np.full((1, 2), value)
+        return {key : values for q in ('photons', 'electrons', 'LET') for key in (q, f'{q}_err')}
+    acc = ParticleAccumulator(asics=1, channels=2, frames=8, seconds=0.1, capacity=1000)
+    acc.reset(now=0.0)
+    acc.add(event(1e12), now=0.0)
+    for n in range(1, 1001):
+        acc.add(event(1e-3), now=n/1000.0)
+    for window, entries in (('frames', 8), ('time', 100)):
+        val, _, _, _ = acc.accumulated('photons', window)
+        np.testing.assert_allclose(val, entries*np.float32(1e-3), rtol=1e-6)
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+#-----------------------------------------------------------------------------
+# Title      : Tests of the chunked frame recording format
+#-----------------------------------------------------------------------------
+
+import zlib
+import numpy as np
+import pytest
+
+from assertViewer.assertRecorder import (FILE_MAGIC, INDEX_MAGIC, CHUNK_MAGIC, FILE_HEADER, CHUNK_HEADER,
+                                         CODEC_ZLIB, INDEX_DTYPE, FrameRecorder, record_dtype, index_path)
+
+def record(path, events, compress, chunkRecords=4):
+    # Writes <events> events of a 2 ASIC x 4 channel x 3 frame detector
+    rng = np.random.default_rng(2)
+    sig = rng.normal(size=(events, 2, 4)).astype(np.float32)
+    mem = rng.normal(size=(events, 2, 4, 3)).astype(np.float32)
+    recorder = FrameRecorder(str(path), asics=2, channels=4, frames=3, compress=compress, chunkRecords=chunkRecords)
+    for n in range(events):
+        assert recorder.write(100+n, sig[n], mem[n], timestamp=10.0+0.5*n, block=True)
+    recorder.close()
+    assert recorder.records == events
+    assert recorder.chunks == -(-events // chunkRecords)
+    return sig, mem
+
+def read_chunks(path):
+    # Records of every chunk, straight from the file layout
+    data = open(path, 'rb').read()
+    magic, _, asics, channels, frames, _, _ = FILE_HEADER.unpack_from(data, 0)
+    assert magic == FILE_MAGIC
+    dtype  = record_dtype(asics, channels, frames)
+    offset = FILE_HEADER.size
+    chunks = []
+    while offset < len(data):
+        magic, records, codec, _, length = CHUNK_HEADER.unpack_from(data, offset)
+        assert magic == CHUNK_MAGIC
+        payload = data[offset+CHUNK_HEADER.size:offset+CHUNK_HEADER.size+length]
+        if codec == CODEC_ZLIB:
+            payload = zlib.decompress(payload)
+        chunks.append((offset, np.frombuffer(payload, dtype=dtype, count=records)))
+        offset += CHUNK_HEADER.size + length
+    return chunks
+
+@pytest.mark.parametrize('compress', [False, True])
+def test_records_are_written_in_chunks(tmp_path, compress):
+    path = tmp_path / 'run.dat'
+    sig, mem = record(path, 10, compress)
+    chunks = read_chunks(path)
+    assert [len(records) for _, records in chunks] == [4, 4, 2]
+    records = np.concatenate([records for _, records in chunks])
+    np.testing.assert_array_equal(records['frame'], 100 + np.arange(10))
+    np.testing.assert_array_equal(records['sig'], sig)
+    np.testing.assert_array_equal(records['mem'], mem)
+
+def test_index_lists_every_chunk(tmp_path):
+    path = tmp_path / 'run.dat'
+    record(path, 10, False)
+    with open(index_path(str(path)), 'rb') as f:
+        assert f.read(len(INDEX_MAGIC)) == INDEX_MAGIC
+        index = np.frombuffer(f.read(), dtype=INDEX_DTYPE)
+    np.testing.assert_array_equal(index['offset'], [offset for offset, _ in read_chunks(path)])
+    np.testing.assert_array_equal(index['first'], [0, 4, 8])
+    np.testing.assert_array_equal(index['frame'], [100, 104, 108])
+    np.testing.assert_array_equal(index['time'], [10.0, 12.0, 14.0])
+
+def test_full_queue_drops_events(tmp_path):
+    recorder = FrameRecorder(str(tmp_path / 'run.dat'), asics=1, channels=1, frames=1, queueSize=1)
+    sig, mem = np.zeros((1, 1)), np.zeros((1, 1, 1))
+    written = sum(recorder.write(n, sig, mem) for n in range(1000))
+    recorder.close()
+    assert written + recorder.dropped == 1000
+    assert recorder.records == written
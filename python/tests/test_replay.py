@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+#-----------------------------------------------------------------------------
+# Title      : Tests of the replay of recorded files
+#-----------------------------------------------------------------------------
+
+import os
+import numpy as np
+import pytest
+
+from assertViewer.assertRecorder import index_path
+
+# The reader lives with the replay server, which needs pyrogue
+pytest.importorskip('pyrogue')
+from assertViewer.assertReplay import RecordFileReader
+
+from test_recorder import record
+
+@pytest.mark.parametrize('compress', [False, True])
+def test_round_trip(tmp_path, compress):
+    path = tmp_path / 'run.dat'
+    sig, mem = record(path, 10, compress)
+    reader = RecordFileReader(str(path))
+    assert (reader.asics, reader.channels, reader.frames) == (2, 4, 3)
+    assert len(reader) == 10
+    for n in range(10):
+        assert reader[n]['frame'] == 100+n
+        np.testing.assert_array_equal(reader[n]['sig'], sig[n])
+        np.testing.assert_array_equal(reader[n]['mem'], mem[n])
+    assert reader[-1]['frame'] == 109
+    assert reader.duration == 4.5
+    assert reader.find_frame(105) == 5
+    assert reader.find_time(2.0) == 4
+    with pytest.raises(IndexError):
+        reader[10]
+    reader.close()
+
+def test_missing_index_is_rebuilt(tmp_path):
+    path = tmp_path / 'run.dat'
+    sig, _ = record(path, 6, False)
+    os.remove(index_path(str(path)))
+    reader = RecordFileReader(str(path))
+    assert len(reader) == 6
+    np.testing.assert_array_equal(reader[5]['sig'], sig[5])
+    assert reader.find_frame(104) == 4
+    reader.close()
+
+@pytest.mark.parametrize('compress', [False, True])
+def test_partial_index_entry(tmp_path, compress):
+    # What an unclean recorder stop leaves behind: the last index entry is cut short
+    path = tmp_path / 'run.dat'
+    sig, _ = record(path, 10, compress)
+    size = os.path.getsize(index_path(str(path)))
+    with open(index_path(str(path)), 'r+b') as f:
+        f.truncate(size - 5)
+    reader = RecordFileReader(str(path))
+    assert len(reader) == 10
+    np.testing.assert_array_equal(reader[9]['sig'], sig[9])
+    assert reader.find_frame(108) == 8
+    reader.close()
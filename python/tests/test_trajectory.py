@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+#-----------------------------------------------------------------------------
+# Title      : Tests of the batched straight-line track fit
+#-----------------------------------------------------------------------------
+
+import numpy as np
+
+from assertViewer.assertTrajectory import fit_lines, fit_tracks
+
+def test_straight_tracks_are_exact():
+    z = np.array([0.0, 10.0, 20.0, 30.0])
+    slope_x, slope_y = np.array([0.01, -0.02]), np.array([0.0, 0.005])
+    x = 5.0 + slope_x[:,None]*z
+    y = -3.0 + slope_y[:,None]*z
+    tracks = fit_tracks(z, x, y)
+    assert tracks['ok'].all()
+    np.testing.assert_allclose(tracks['slope_x'], slope_x)
+    np.testing.assert_allclose(tracks['slope_y'], slope_y, atol=1e-12)
+    np.testing.assert_allclose(tracks['offset_x'], [5.0, 5.0])
+    np.testing.assert_allclose(tracks['angle_x'], 1e3*np.arctan(slope_x))
+    np.testing.assert_allclose(tracks['residual_x'], 0.0, atol=1e-12)
+
+def test_missing_hits():
+    z = np.array([0.0, 1.0, 2.0])
+    u = np.array([[1.0, 2.0, 3.0],
+                  [1.0, np.nan, 5.0],
+                  [1.0, np.nan, np.nan]])
+    slope, offset, residuals, ok = fit_lines(z, u)
+    np.testing.assert_array_equal(ok, [True, True, False])
+    np.testing.assert_allclose(slope[:2], [1.0, 2.0])
+    assert np.isnan(slope[2]) and np.isnan(residuals[1, 1])
+
+def test_valid_mask_drops_hits():
+    z = np.array([0.0, 1.0, 2.0])
+    u = np.array([[0.0, 100.0, 2.0]])
+    slope, offset, _, ok = fit_lines(z, u, valid=np.array([[True, False, True]]))
+    assert ok[0]
+    np.testing.assert_allclose(slope, [1.0])
+    np.testing.assert_allclose(offset, [0.0])